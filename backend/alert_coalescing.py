@@ -0,0 +1,66 @@
+"""
+Alert storm suppression.
+
+Identical alerts (same recipient, type and title, and for escalated copies the
+same original alert) raised within a sliding window are coalesced onto the
+first, still-unread alert: its ``occurrence_count`` is incremented, its message
+refreshed and ``last_seen_at`` set instead of inserting a new row, while its
+``timestamp`` keeps the first occurrence. Recently seen keys live in a bounded
+LRU, so a storm costs one UPDATE per repeat and the recipient's alert list
+stays flat.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ALERT_COALESCE_WINDOW_SECONDS = int(os.getenv("ALERT_COALESCE_WINDOW_SECONDS", "600"))
+ALERT_COALESCE_MAX_KEYS = int(os.getenv("ALERT_COALESCE_MAX_KEYS", "10000"))
+
+
+def coalesce_key(alert, escalated_from: str = None) -> tuple:
+    # Escalated copies of different originals must stay separate: reading one
+    # cancels only its own original's chain
+    return (alert.user_id, alert.alert_type, alert.title.strip().lower(), escalated_from)
+
+
+class AlertCoalescer:
+    def __init__(self, window: int = ALERT_COALESCE_WINDOW_SECONDS, max_keys: int = ALERT_COALESCE_MAX_KEYS):
+        self.window = window
+        self.max_keys = max_keys
+        self._recent = OrderedDict()  # key -> (alert_id, last_seen)
+        self._lock = threading.Lock()
+
+    def lookup(self, key, now: float = None):
+        """Alert id still inside the window for ``key``; refreshes the window on a hit"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry is None:
+                return None
+            alert_id, last_seen = entry
+            if now - last_seen > self.window:
+                del self._recent[key]
+                return None
+            self._recent[key] = (alert_id, now)
+            self._recent.move_to_end(key)
+            return alert_id
+
+    def remember(self, key, alert_id: str, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._recent[key] = (alert_id, now)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_keys:
+                self._recent.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._recent.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+
+coalescer = AlertCoalescer()
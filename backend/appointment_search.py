@@ -0,0 +1,116 @@
+"""
+Multi-criteria appointment search.
+
+Every equality filter has a composite index of the form ``(column, date, time)``
+on ``appointments`` (see ``database.Appointment``). For a given filter
+combination the planner picks the most selective equality column present and
+pins the query to its index with ``INDEXED BY``. That one index then serves the
+equality, the date range and the ``ORDER BY date, time`` without a temp B-tree,
+and any remaining filters are checked while walking it. Pages are keyset
+cursors over ``(date, time, rowid)``, and totals are counted with an upper cap
+so they stay cheap on large tables.
+"""
+from sqlalchemy import text, select, column, Integer
+
+from database import Appointment
+from pagination import InvalidCursor, encode_cursor, decode_cursor
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Totals stop counting here and are reported as an estimate
+TOTAL_CAP = 10000
+
+# Equality filters, most selective first, with the index that leads with each
+INDEX_BY_FILTER = [
+    ("patient_id", "ix_appointments_patient_date"),
+    ("doctor_id", "ix_appointments_doctor_date"),
+    ("appointment_type", "ix_appointments_type_date"),
+    ("priority_id", "ix_appointments_priority_date"),
+    ("status", "ix_appointments_status_date"),
+]
+DATE_INDEX = "ix_appointments_date_time"
+
+SORT_DIRECTIONS = {"date": "ASC", "-date": "DESC"}
+
+
+def plan_index(filters: dict) -> str:
+    """Index that should drive the query for this filter combination"""
+    for field, index in INDEX_BY_FILTER:
+        if filters.get(field) is not None:
+            return index
+    return DATE_INDEX
+
+
+def _where(filters: dict):
+    clauses, params = [], {}
+    for field, _ in INDEX_BY_FILTER:
+        if filters.get(field) is not None:
+            clauses.append(f"appointments.{field} = :{field}")
+            params[field] = filters[field]
+    if filters.get("date_from"):
+        clauses.append("appointments.date >= :date_from")
+        params["date_from"] = filters["date_from"]
+    if filters.get("date_to"):
+        clauses.append("appointments.date <= :date_to")
+        params["date_to"] = filters["date_to"]
+    return clauses, params
+
+
+def search_appointments(db, filters: dict, sort: str = "date", cursor: str = None,
+                        limit: int = DEFAULT_LIMIT) -> dict:
+    """One page of appointments matching ``filters`` plus a capped total"""
+    direction = SORT_DIRECTIONS[sort]
+    limit = max(1, min(limit, MAX_LIMIT))
+    index = plan_index(filters)
+    clauses, params = _where(filters)
+
+    total_sql = f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM appointments INDEXED BY {index}
+            WHERE {' AND '.join(clauses) or '1'}
+            LIMIT {TOTAL_CAP}
+        )
+    """
+    total = db.execute(text(total_sql), params).scalar()
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 3:
+            raise InvalidCursor("Malformed cursor")
+        cursor_date, cursor_time, cursor_rowid = values
+        comparison = ">" if direction == "ASC" else "<"
+        clauses.append(
+            f"(appointments.date, appointments.time, appointments.rowid) {comparison} "
+            "(:cursor_date, :cursor_time, :cursor_rowid)"
+        )
+        params.update(cursor_date=cursor_date, cursor_time=cursor_time, cursor_rowid=cursor_rowid)
+
+    # Name every column: text().columns() maps results by position, and columns added later by
+    # database.add_missing_columns sit at the end of older tables, so "*" would misalign them
+    columns = Appointment.__table__.columns
+    page_sql = f"""
+        SELECT {', '.join(f'appointments.{c.name}' for c in columns)}, appointments.rowid AS row_position
+        FROM appointments INDEXED BY {index}
+        WHERE {' AND '.join(clauses) or '1'}
+        ORDER BY appointments.date {direction}, appointments.time {direction}, appointments.rowid {direction}
+        LIMIT :limit
+    """
+    params["limit"] = limit + 1
+    page = text(page_sql).columns(*columns, column("row_position", Integer))
+    rows = db.execute(
+        select(Appointment, page.selected_columns.row_position).from_statement(page), params
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last, row_position = rows[-1]
+        next_cursor = encode_cursor([last.date, last.time, row_position])
+
+    return {
+        "items": [appointment for appointment, _ in rows],
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_is_estimate": total >= TOTAL_CAP,
+    }
@@ -0,0 +1,352 @@
+"""
+Microbenchmarks for individual ``crud`` functions.
+
+Each benchmark calls one data-access function against databases produced by
+``generate_dataset.py`` at several sizes, in a fresh session per call (as a
+request would), and records:
+
+* wall time per call (median, p95, min),
+* SQL statements executed per call,
+* peak Python memory allocated during the call (tracemalloc, measured in a
+  separate pass so tracing does not distort the timings).
+
+Every benchmark runs inside one outer transaction that is rolled back
+afterwards, and the function's own ``commit()`` only releases a savepoint, so
+write benchmarks leave the dataset untouched and runs are repeatable.
+
+    python bench_crud.py --sizes small,medium --output bench_crud.json
+    python bench_crud.py --sizes small --compare bench_crud.json --tolerance 15
+    python bench_crud.py --diff old.json new.json
+
+Datasets are generated on first use and cached in ``--data-dir``, anchored on
+``DATASET_TODAY`` so the rows do not drift from one day to the next; the cache
+key includes a fingerprint of the schema and the generator, so a model change
+regenerates them rather than benchmarking a stale file. A run fails
+(exit status 1) when compared against a baseline and any benchmark issues more
+queries, or is slower or allocates more than ``--tolerance`` percent.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# Add the backend directory to Python path
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import crud
+import schemas
+from bench_http import _change, _git_commit, percentile
+from database import Base, User, Patient
+
+# Dataset sizes, as generate_dataset.py arguments
+SIZES = {
+    "small": ["--patients", "1000", "--years", "1"],
+    "medium": ["--patients", "20000", "--years", "2"],
+    "large": ["--patients", "200000", "--years", "3"],
+}
+DEFAULT_SIZES = "small,medium"
+# Fixed generate_dataset.py --today, so cached datasets and stored baselines stay comparable
+DATASET_TODAY = "2026-01-05"
+# Modules whose code shapes a generated dataset (the generator and the derived tables it builds)
+DATASET_SOURCES = ("generate_dataset.py", "search.py", "rollups.py", "patient_summaries.py")
+_TRANSACTION_CONTROL = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+
+
+# ---------------------------------------------------------------------------
+# Datasets
+# ---------------------------------------------------------------------------
+
+def dataset_fingerprint() -> str:
+    """Short hash of the declared schema and the code that builds the derived tables"""
+    digest = hashlib.sha1()
+    dialect = sqlite.dialect()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for module in DATASET_SOURCES:
+        with open(os.path.join(BACKEND_DIR, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:10]
+
+
+def dataset_path(size: str, data_dir: str, seed: int) -> str:
+    """Generated database for ``size``, creating it on first use"""
+    path = os.path.join(data_dir, f"{size}-seed{seed}-{DATASET_TODAY}-{dataset_fingerprint()}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {size} dataset at {path} ...")
+        # Generate under a temporary name so an interrupted run never leaves a partial cache entry
+        partial = f"{path}.partial"
+        subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "generate_dataset.py"),
+                        "--output", partial, "--force", "--seed", str(seed), "--today", DATASET_TODAY]
+                       + SIZES[size], check=True)
+        os.replace(partial, path)
+    return path
+
+
+class Database:
+    """Engine for one dataset with a statement counter and savepoint-friendly transactions"""
+
+    def __init__(self, path: str):
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        self.queries = 0
+
+        # pysqlite's implicit transactions break SAVEPOINT; let SQLAlchemy emit BEGIN itself
+        @event.listens_for(self.engine, "connect")
+        def _connect(dbapi_connection, _):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(self.engine, "begin")
+        def _begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith(_TRANSACTION_CONTROL):
+                self.queries += 1
+
+    def context(self, rnd: random.Random, pool: int = 5000) -> dict:
+        """Ids the benchmarks draw their arguments from"""
+        with Session(self.engine) as db:
+            def ids(query):
+                rows = [row[0] for row in query.limit(pool)]
+                rnd.shuffle(rows)
+                return rows
+            return {
+                "patient_ids": ids(db.query(Patient.id)),
+                "patient_user_ids": ids(db.query(User.id).filter(User.role == "patient")),
+                "doctor_user_ids": ids(db.query(User.id).filter(User.role == "doctor")),
+                "nurse_user_ids": ids(db.query(User.id).filter(User.role == "nurse")),
+                "admin_user_ids": ids(db.query(User.id).filter(User.role == "administrator")),
+            }
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks: name -> fn(db, context, iteration)
+# ---------------------------------------------------------------------------
+
+CONDITIONS = ["routine checkup", "persistent cough", "chest pain and dizziness", "sprained ankle",
+              "difficulty breathing at night", "follow-up for infection"]
+
+
+def _pick(context: dict, key: str, i: int):
+    values = context[key]
+    return values[i % len(values)]
+
+
+def _dashboard(role: str, key: str):
+    return lambda db, context, i: crud.get_dashboard_stats(db, role, _pick(context, key, i))
+
+
+def _book(db, context, i):
+    booking = schemas.AppointmentBooking(
+        doctor_id=_pick(context, "doctor_user_ids", i),
+        date=str(date.today() + timedelta(days=1 + i % 30)),
+        time=f"{9 + i % 8:02d}:00",
+        appointment_type="consultation",
+        condition=CONDITIONS[i % len(CONDITIONS)],
+    )
+    return crud.book_appointment(db, booking, _pick(context, "patient_user_ids", i))
+
+
+def _delete_user(db, context, i):
+    # A different patient every call: deletes are rolled back only after the whole benchmark
+    return crud.delete_user(db, _pick(context, "patient_user_ids", i))
+
+
+BENCHMARKS = {
+    "get_dashboard_stats[nurse]": _dashboard("nurse", "nurse_user_ids"),
+    "get_dashboard_stats[doctor]": _dashboard("doctor", "doctor_user_ids"),
+    "get_dashboard_stats[patient]": _dashboard("patient", "patient_user_ids"),
+    "get_dashboard_stats[administrator]": _dashboard("administrator", "admin_user_ids"),
+    "assign_priority_by_condition": lambda db, context, i: crud.assign_priority_by_condition(
+        db, CONDITIONS[i % len(CONDITIONS)]),
+    "get_patients_with_users": lambda db, context, i: crud.get_patients_with_users(db, skip=0, limit=100),
+    "get_doctors_with_users": lambda db, context, i: crud.get_doctors_with_users(db, skip=0, limit=100),
+    "get_patient_with_user": lambda db, context, i: crud.get_patient_with_user(
+        db, _pick(context, "patient_ids", i)),
+    "get_appointments_by_patient": lambda db, context, i: crud.get_appointments_by_patient(
+        db, _pick(context, "patient_user_ids", i)),
+    "get_appointments_by_doctor": lambda db, context, i: crud.get_appointments_by_doctor(
+        db, _pick(context, "doctor_user_ids", i)),
+    "get_triage_records_by_status[pending]": lambda db, context, i: crud.get_triage_records_by_status(
+        db, "pending"),
+    "get_unread_alerts": lambda db, context, i: crud.get_unread_alerts(db, _pick(context, "nurse_user_ids", i)),
+    "book_appointment": _book,
+    "delete_user[patient]": _delete_user,
+}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _call(connection, fn, context: dict, i: int):
+    with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+        return fn(db, context, i)
+
+
+def run_benchmark(database: Database, fn, context: dict, iterations: int, warmup: int,
+                  alloc_iterations: int) -> dict:
+    timings, queries, allocations = [], [], []
+    with database.engine.connect() as connection:
+        outer = connection.begin()
+        try:
+            i = 0
+            for _ in range(warmup):
+                _call(connection, fn, context, i)
+                i += 1
+            for _ in range(iterations):
+                before = database.queries
+                started = time.perf_counter()
+                _call(connection, fn, context, i)
+                timings.append((time.perf_counter() - started) * 1000)
+                queries.append(database.queries - before)
+                i += 1
+            tracemalloc.start()
+            try:
+                for _ in range(alloc_iterations):
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    _call(connection, fn, context, i)
+                    allocations.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+                    i += 1
+            finally:
+                tracemalloc.stop()
+        finally:
+            outer.rollback()
+    timings.sort()
+    queries.sort()
+    allocations.sort()
+    return {
+        "calls": len(timings),
+        "median_ms": round(percentile(timings, 50), 4),
+        "p95_ms": round(percentile(timings, 95), 4),
+        "min_ms": round(timings[0], 4),
+        "queries": percentile(queries, 50),
+        "max_queries": queries[-1],
+        "peak_alloc_kib": round(percentile(allocations, 50), 1) if allocations else None,
+    }
+
+
+def run_size(size: str, path: str, args) -> dict:
+    database = Database(path)
+    context = database.context(random.Random(args.seed))
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = run_benchmark(database, fn, context, args.iterations, args.warmup, args.alloc_iterations)
+        stats = results[name]
+        print(f"{size:8} {name:40} {stats['median_ms']:>9.3f}ms {stats['p95_ms']:>9.3f}ms "
+              f"{stats['queries']:>5} {stats['peak_alloc_kib']:>10.1f}KiB")
+    database.engine.dispose()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+def diff_reports(baseline: dict, current: dict, tolerance: float) -> list:
+    """Print per-benchmark deltas; returns ``(size, name)`` of every regression"""
+    regressions = []
+    print(f"{'size':8} {'benchmark':40} {'median Δ':>9} {'alloc Δ':>9} {'queries':>11}")
+    for size in sorted(set(baseline["results"]) | set(current["results"])):
+        old_size, new_size = baseline["results"].get(size, {}), current["results"].get(size, {})
+        for name in sorted(set(old_size) | set(new_size)):
+            old, new = old_size.get(name), new_size.get(name)
+            if not old or not new:
+                print(f"{size:8} {name:40} {'only in ' + ('current' if new else 'baseline'):>31}")
+                continue
+            time_delta = _change(old["median_ms"], new["median_ms"])
+            alloc_delta = _change(old["peak_alloc_kib"] or 0, new["peak_alloc_kib"] or 0)
+            reasons = []
+            if new["queries"] > old["queries"]:
+                reasons.append("queries")
+            if time_delta > tolerance:
+                reasons.append("time")
+            if alloc_delta > tolerance:
+                reasons.append("alloc")
+            if reasons:
+                regressions.append((size, name))
+            print(f"{size:8} {name:40} {time_delta:>+8.1f}% {alloc_delta:>+8.1f}% "
+                  f"{old['queries']:>4} → {new['queries']:<4}" + (f"  REGRESSION ({', '.join(reasons)})"
+                                                               if reasons else ""))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for crud functions")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "vitals_bench_data"),
+                        help="Where generated datasets are cached")
+    parser.add_argument("--seed", type=int, default=7, help="Dataset and argument seed")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per benchmark")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before measuring")
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="Calls traced for allocations")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON to diff this run against")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"), help="Diff two saved reports and exit")
+    parser.add_argument("--tolerance", type=float, default=15.0,
+                        help="Allowed slowdown / allocation growth in percent before failing")
+    args = parser.parse_args(argv)
+
+    if args.diff:
+        with open(args.diff[0]) as f:
+            baseline = json.load(f)
+        with open(args.diff[1]) as f:
+            current = json.load(f)
+        return 1 if diff_reports(baseline, current, args.tolerance) else 0
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "iterations": args.iterations,
+            "seed": args.seed,
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": {},
+    }
+    paths = {size: dataset_path(size, args.data_dir, args.seed) for size in sizes}
+    print(f"{'size':8} {'benchmark':40} {'median':>11} {'p95':>11} {'qry':>5} {'peak alloc':>13}")
+    for size in sizes:
+        report["results"][size] = run_size(size, paths[size], args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if diff_reports(baseline, report, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,470 @@
+"""
+HTTP load benchmark for the API.
+
+Virtual users log in as nurses, doctors, patients and administrators and loop
+over weighted role scenarios (nurses polling triage, doctors working through
+their appointment lists, patients booking, administrators browsing reports).
+Requests go either straight into the ASGI app in this process (``--mode asgi``)
+or over real sockets to a uvicorn server started for the run
+(``--mode uvicorn``). Per-route p50/p95/p99 latency and throughput are written
+to a JSON baseline that can be diffed against another run.
+
+    python bench_http.py --duration 20 --concurrency 64 --output bench_http.json
+    python bench_http.py --mode uvicorn --workers 1 --compare bench_http.json
+    python bench_http.py --diff old.json new.json
+
+Without ``--db`` a throwaway SQLite database is created and seeded; pass a
+generated dataset with ``--db`` to benchmark at scale (its staff and patient
+accounts must share ``--password``).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+# Add the backend directory to Python path
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+DEFAULT_MIX = "nurse=4,doctor=3,patient=2,administrator=1"
+DEFAULT_PASSWORD = "bench"
+PERCENTILES = (50, 95, 99)
+
+
+# ---------------------------------------------------------------------------
+# Dataset
+# ---------------------------------------------------------------------------
+
+def seed(password: str, patients: int = 200, doctors: int = 20, nurses: int = 20, appointments: int = 2000):
+    """Small self-contained dataset for runs without ``--db``"""
+    import crud
+    import schemas
+    from database import SessionLocal, User
+
+    db = SessionLocal()
+    try:
+        if db.query(User).filter(User.username == "bench_admin").first():
+            return
+        rnd = random.Random(42)
+        crud.create_user(db, schemas.UserCreate(
+            username="bench_admin", email="bench_admin@example.com", name="Bench Admin",
+            role="administrator", password=password,
+        ))
+        departments = ["Cardiology", "Emergency", "Pediatrics", "Neurology"]
+        doctor_ids = []
+        for i in range(doctors):
+            doctor = crud.create_doctor(db, schemas.DoctorCreate(
+                username=f"bench_doctor_{i}", email=f"bench_doctor_{i}@example.com",
+                full_name=f"Doctor {i}", phone=f"+1444{i:07d}", password=password,
+                specialization="General", department=departments[i % len(departments)],
+                license_number=f"LIC-{i}",
+            ))
+            doctor_ids.append(doctor.user_id)
+        for i in range(nurses):
+            crud.create_nurse(db, schemas.NurseCreate(
+                username=f"bench_nurse_{i}", email=f"bench_nurse_{i}@example.com",
+                full_name=f"Nurse {i}", phone=f"+1333{i:07d}", password=password,
+                department=departments[i % len(departments)], shift="day", license_number=f"RN-{i}",
+            ))
+        patient_user_ids = []
+        for i in range(patients):
+            user = crud.register_patient(db, schemas.PatientRegistration(
+                username=f"bench_patient_{i}", email=f"bench_patient_{i}@example.com",
+                name=f"Patient {i}", password=password, age=rnd.randint(1, 95),
+                gender=rnd.choice(["Male", "Female"]), contact_number=f"+1555{i:07d}",
+            ))
+            patient_user_ids.append(user.id)
+        crud.init_priorities(db)
+        today = date.today()
+        for _ in range(appointments):
+            crud.book_appointment(db, schemas.AppointmentBooking(
+                doctor_id=rnd.choice(doctor_ids),
+                date=str(today + timedelta(days=rnd.randint(-30, 30))),
+                time=f"{rnd.randint(8, 17):02d}:{rnd.choice(['00', '30'])}",
+                appointment_type="consultation",
+                condition=rnd.choice(["chest pain", "fever", "routine checkup", "headache"]),
+            ), rnd.choice(patient_user_ids))
+    finally:
+        db.close()
+
+
+def load_context(max_per_role: int = 500) -> dict:
+    """Accounts per role plus the ids scenarios need to build requests"""
+    from database import SessionLocal, User, Patient
+
+    db = SessionLocal()
+    try:
+        context = {"accounts": {}, "patient_ids": [], "doctor_user_ids": []}
+        for role in ("nurse", "doctor", "patient", "administrator"):
+            rows = db.query(User.username).filter(User.role == role, User.is_active == True) \
+                .order_by(User.username).limit(max_per_role).all()
+            context["accounts"][role] = [row[0] for row in rows]
+        context["patient_ids"] = [row[0] for row in db.query(Patient.id).limit(max_per_role)]
+        context["doctor_user_ids"] = [
+            row[0] for row in db.query(User.id).filter(User.role == "doctor").limit(max_per_role)
+        ]
+        return context
+    finally:
+        db.close()
+
+
+# ---------------------------------------------------------------------------
+# Scenarios: (route label, weight, request builder)
+# A builder returns (method, url, json body) or None to skip this turn.
+# ---------------------------------------------------------------------------
+
+def _book(user, context, rnd):
+    return "POST", "/appointments/book", {
+        "doctor_id": rnd.choice(context["doctor_user_ids"]),
+        "date": str(date.today() + timedelta(days=rnd.randint(1, 30))),
+        "time": f"{rnd.randint(8, 17):02d}:00",
+        "appointment_type": "consultation",
+        "condition": rnd.choice(["fever", "cough", "routine checkup", "back pain"]),
+    }
+
+
+def _triage(user, context, rnd):
+    return "POST", "/triage/", {
+        "patient_id": rnd.choice(context["patient_ids"]),
+        "nurse_id": user["id"],
+        "blood_pressure": f"{rnd.randint(100, 160)}/{rnd.randint(60, 100)}",
+        "heart_rate": rnd.randint(55, 130),
+        "temperature": round(rnd.gauss(37.0, 0.7), 1),
+        "oxygen_saturation": rnd.randint(88, 100),
+        "respiratory_rate": rnd.randint(12, 28),
+        "symptoms": rnd.choice(["chest pain", "fever and cough", "dizziness", "abdominal pain"]),
+        "priority": rnd.choice(["critical", "high", "medium", "low"]),
+    }
+
+
+def _consult(user, context, rnd):
+    pending = user["state"].get("pending_appointments")
+    if not pending:
+        return None
+    return "PUT", f"/appointments/{pending.pop()}/consult?doctor_remarks=seen", None
+
+
+def _timeline(user, context, rnd):
+    return "GET", f"/patients/{rnd.choice(context['patient_ids'])}/timeline?limit=20", None
+
+
+SCENARIOS = {
+    "nurse": [
+        ("GET /triage/?status=pending", 5, lambda u, c, r: ("GET", "/triage/?status=pending", None)),
+        ("GET /alerts/unread-count", 3, lambda u, c, r: ("GET", "/alerts/unread-count", None)),
+        ("GET /patients/", 1, lambda u, c, r: ("GET", "/patients/?limit=50", None)),
+        ("POST /triage/", 1, _triage),
+    ],
+    "doctor": [
+        ("GET /appointments/", 4, lambda u, c, r: ("GET", "/appointments/", None)),
+        ("GET /appointments/search", 2, lambda u, c, r: ("GET", "/appointments/search?status=pending&limit=20", None)),
+        ("GET /dashboard/stats", 2, lambda u, c, r: ("GET", "/dashboard/stats", None)),
+        ("GET /patients/{patient_id}/timeline", 1, _timeline),
+        ("PUT /appointments/{appointment_id}/consult", 1, _consult),
+    ],
+    "patient": [
+        ("GET /appointments/", 3, lambda u, c, r: ("GET", "/appointments/", None)),
+        ("GET /dashboard/stats", 2, lambda u, c, r: ("GET", "/dashboard/stats", None)),
+        ("GET /doctors/available", 1, lambda u, c, r: ("GET", "/doctors/available", None)),
+        ("POST /appointments/book", 1, _book),
+    ],
+    "administrator": [
+        ("GET /admin/staff/", 1, lambda u, c, r: ("GET", "/admin/staff/?limit=50", None)),
+        ("GET /analytics/appointments", 1, lambda u, c, r: ("GET", "/analytics/appointments?interval=month", None)),
+        ("GET /search", 1, lambda u, c, r: ("GET", "/search?q=pain&limit=10", None)),
+    ],
+}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        role, _, weight = part.partition("=")
+        if role.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown role in --mix: {role}")
+        weights[role.strip()] = float(weight or 1)
+    return weights
+
+
+def assign_roles(concurrency: int, weights: dict) -> list:
+    """Split virtual users across roles in proportion to the mix"""
+    total = sum(weights.values())
+    roles = []
+    for role, weight in weights.items():
+        roles += [role] * max(1, round(concurrency * weight / total))
+    return roles[:max(concurrency, len(weights))]
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+async def login(client, role: str, username: str, password: str) -> dict:
+    response = await client.post("/auth/login", json={"username": username, "password": password, "role": role})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    me = (await client.get("/auth/me", headers=headers)).json()
+    return {"role": role, "id": me["id"], "headers": headers, "state": {}}
+
+
+async def virtual_user(client, user, context, samples, deadline, warmup_until, seed_value, think_ms):
+    rnd = random.Random(seed_value)
+    scenario = SCENARIOS[user["role"]]
+    weights = [weight for _, weight, _ in scenario]
+    while time.perf_counter() < deadline:
+        label, _, build = rnd.choices(scenario, weights=weights)[0]
+        request = build(user, context, rnd)
+        if request is None:
+            continue
+        method, url, body = request
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body, headers=user["headers"])
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 599
+        elapsed = time.perf_counter() - started
+        if started >= warmup_until:
+            samples[label].append((elapsed, status))
+        if response is not None and label == "GET /appointments/" and user["role"] == "doctor" and status == 200:
+            user["state"]["pending_appointments"] = [
+                item["id"] for item in response.json() if item.get("status") == "pending"
+            ][-20:]
+        if think_ms:
+            await asyncio.sleep(think_ms / 1000)
+
+
+async def run_load(client, args, context) -> tuple:
+    roles = assign_roles(args.concurrency, parse_mix(args.mix))
+    users = []
+    for index, role in enumerate(roles):
+        accounts = context["accounts"].get(role)
+        if not accounts:
+            raise SystemExit(f"No active {role} accounts in the database")
+        users.append(await login(client, role, accounts[index % len(accounts)], args.password))
+
+    samples = defaultdict(list)
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    deadline = warmup_until + args.duration
+    await asyncio.gather(*[
+        virtual_user(client, user, context, samples, deadline, warmup_until, args.seed + index, args.think_ms)
+        for index, user in enumerate(users)
+    ])
+    measured = time.perf_counter() - warmup_until
+    return samples, measured
+
+
+async def run_asgi(args, context):
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_load(client, args, context)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args, context):
+    port = args.port or _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("uvicorn did not start within 30s")
+            return await run_load(client, args, context)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: list, errors: int, seconds: float) -> dict:
+    latencies = sorted(v * 1000 for v in values)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(latencies, p), 3)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(samples: dict, seconds: float, args) -> dict:
+    routes, everything, total_errors = {}, [], 0
+    for label in sorted(samples):
+        latencies = [elapsed for elapsed, _ in samples[label]]
+        errors = sum(1 for _, status in samples[label] if status >= 400)
+        routes[label] = summarize(latencies, errors, seconds)
+        everything += latencies
+        total_errors += errors
+    return {
+        "meta": {
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "workers": args.workers if args.mode == "uvicorn" else None,
+            "duration_s": round(seconds, 2),
+            "mix": args.mix,
+            "seed": args.seed,
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "total": summarize(everything, total_errors, seconds),
+        "routes": routes,
+    }
+
+
+def print_report(report: dict):
+    print(f"{'route':48} {'reqs':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for label, stats in rows:
+        print(f"{label:48} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f}ms {stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms")
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def diff_reports(baseline: dict, current: dict, threshold: float) -> list:
+    """Print per-route deltas; returns the routes whose p95 regressed by more than ``threshold`` percent"""
+    regressions = []
+    print(f"{'route':48} {'p50 Δ':>9} {'p95 Δ':>9} {'p99 Δ':>9} {'rps Δ':>9}")
+    labels = sorted(set(baseline["routes"]) | set(current["routes"]))
+    for label in labels + ["TOTAL"]:
+        old = baseline["total"] if label == "TOTAL" else baseline["routes"].get(label)
+        new = current["total"] if label == "TOTAL" else current["routes"].get(label)
+        if not old or not new:
+            print(f"{label:48} {'only in ' + ('current' if new else 'baseline'):>39}")
+            continue
+        deltas = [_change(old[key], new[key]) for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")]
+        flag = ""
+        if label != "TOTAL" and deltas[1] > threshold:
+            regressions.append(label)
+            flag = "  REGRESSION"
+        print(f"{label:48} " + " ".join(f"{delta:>+8.1f}%" for delta in deltas) + flag)
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load benchmark for the Vitals Hub API")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--db", help="SQLite file to benchmark against (default: fresh seeded temp database)")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Shared password of the benchmark accounts")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of virtual users")
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load discarded before measuring")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a virtual user's requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Role weights, e.g. nurse=4,doctor=3,patient=2")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (uvicorn mode)")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON to diff this run against")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"), help="Diff two saved reports and exit")
+    parser.add_argument("--fail-threshold", type=float, default=None,
+                        help="Exit non-zero if any route's p95 regresses by more than this percent")
+    args = parser.parse_args(argv)
+
+    if args.diff:
+        with open(args.diff[0]) as f:
+            baseline = json.load(f)
+        with open(args.diff[1]) as f:
+            current = json.load(f)
+        regressions = diff_reports(baseline, current, args.fail_threshold or 10.0)
+        return 1 if regressions and args.fail_threshold is not None else 0
+
+    if args.db:
+        path = os.path.abspath(args.db)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="vitals_bench_"), "bench.db")
+    # Must be set before the app's database module is imported (here and in the uvicorn child)
+    os.environ["VITALS_DATABASE_URL"] = f"sqlite:///{path}"
+    # Every virtual user may hold a connection at once; a smaller pool would measure checkout waits
+    os.environ.setdefault("DB_MAX_OVERFLOW", str(args.concurrency))
+
+    from database import create_tables
+    create_tables()
+    if not args.db:
+        seed(args.password)
+    context = load_context()
+
+    runner = run_asgi if args.mode == "asgi" else run_uvicorn
+    samples, seconds = asyncio.run(runner(args, context))
+    report = build_report(samples, seconds, args)
+    report["meta"]["database"] = path if args.db else "seeded temp database"
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        regressions = diff_reports(baseline, report, args.fail_threshold or 10.0)
+        if regressions and args.fail_threshold is not None:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
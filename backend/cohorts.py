@@ -0,0 +1,296 @@
+"""
+Cohort analytics over patients and triage vitals.
+
+The columns these reports need are held in NumPy arrays: one row per patient
+(age, gender) and one row per triage record (vitals, priority, symptoms and the
+row's position in the patient arrays). Arrays are loaded on first use and then
+refreshed incrementally by ``rowid``, so a refresh only reads rows inserted
+since the last one. Grouped statistics are computed with a handful of
+vectorized passes (``bincount``, a single sort for percentiles) and cached
+until the next refresh that brings in new rows.
+
+Incremental refreshes see new rows only: neither table records when a row was
+last modified, so edits to existing patients or triage records (and deletes)
+are picked up by a full reload. Requests trigger one every
+``COHORT_FULL_REFRESH_SECONDS``, so reports lag edits by at most that long;
+``POST /admin/cohorts/refresh?full=true`` reloads at once.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+AGE_BANDS = [0, 18, 30, 45, 60, 75]
+AGE_BAND_LABELS = ["0-17", "18-29", "30-44", "45-59", "60-74", "75+"]
+VITALS = ("heart_rate", "temperature", "oxygen_saturation", "respiratory_rate", "systolic", "diastolic")
+GROUP_FIELDS = ("age_band", "gender")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+PRIORITIES = ["critical", "high", "medium", "low"]
+UNKNOWN = "unknown"
+# Gender is free text; past this many distinct labels new ones are counted as OTHER
+MAX_GENDERS = 32
+OTHER = "other"
+BATCH_SIZE = 50000
+# Requests older than this trigger an incremental refresh before answering
+REFRESH_SECONDS = float(os.getenv("COHORT_REFRESH_SECONDS", "60"))
+# ...and a full reload once the last one is older than this
+FULL_REFRESH_SECONDS = float(os.getenv("COHORT_FULL_REFRESH_SECONDS", "900"))
+MAX_CACHED_RESULTS = 256
+
+
+def _float(value):
+    return np.nan if value is None else value
+
+
+def _blood_pressure(value):
+    try:
+        systolic, diastolic = str(value).split("/", 1)
+        return float(systolic), float(diastolic)
+    except (TypeError, ValueError):
+        return np.nan, np.nan
+
+
+class CohortStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.genders = [UNKNOWN]
+        self._gender_codes = {UNKNOWN: 0}
+        self.patient_rowid = np.empty(0, dtype=np.int64)
+        self.age_band = np.empty(0, dtype=np.int8)
+        self.gender = np.empty(0, dtype=np.int8)
+        self.triage_rowid = np.empty(0, dtype=np.int64)
+        self.patient_index = np.empty(0, dtype=np.int64)
+        self.vitals = {vital: np.empty(0, dtype=np.float32) for vital in VITALS}
+        self.priority = np.empty(0, dtype=np.int8)
+        # Symptom texts are dictionary-encoded, so keyword scans only visit distinct texts
+        self.symptom_code = np.empty(0, dtype=np.int32)
+        self.symptom_texts = []
+        self._symptom_codes = {}
+        self.refreshed_at = 0.0
+        self.reloaded_at = 0.0
+        self._results = {}
+        self._keyword_masks = {}
+
+    def __len__(self):
+        return len(self.patient_rowid)
+
+    def _gender_code(self, gender) -> int:
+        label = (gender or UNKNOWN).strip().lower() or UNKNOWN
+        if label not in self._gender_codes and len(self.genders) >= MAX_GENDERS:
+            label = OTHER
+        if label not in self._gender_codes:
+            self._gender_codes[label] = len(self.genders)
+            self.genders.append(label)
+        return self._gender_codes[label]
+
+    def _symptom_code(self, symptoms) -> int:
+        lowered = (symptoms or "").lower()
+        code = self._symptom_codes.get(lowered)
+        if code is None:
+            code = self._symptom_codes[lowered] = len(self.symptom_texts)
+            self.symptom_texts.append(lowered)
+        return code
+
+    def _load_patients(self, conn, after: int) -> int:
+        rows = conn.execute(text(
+            "SELECT rowid, age, gender FROM patients WHERE rowid > :after ORDER BY rowid"
+        ), {"after": after}).fetchall()
+        if not rows:
+            return 0
+        rowids, ages, genders = zip(*rows)
+        ages = np.array([_float(age) for age in ages], dtype=np.float32)
+        bands = np.digitize(ages, AGE_BANDS) - 1
+        bands[np.isnan(ages)] = -1
+        self.patient_rowid = np.concatenate([self.patient_rowid, np.array(rowids, dtype=np.int64)])
+        self.age_band = np.concatenate([self.age_band, bands.astype(np.int8)])
+        self.gender = np.concatenate([self.gender, np.array([self._gender_code(g) for g in genders], dtype=np.int8)])
+        return len(rows)
+
+    def _load_triage(self, conn, after: int) -> int:
+        result = conn.execute(text("""
+            SELECT t.rowid, p.rowid, t.heart_rate, t.temperature, t.oxygen_saturation,
+                   t.respiratory_rate, t.blood_pressure, t.priority, t.symptoms
+            FROM triage_records t LEFT JOIN patients p ON p.id = t.patient_id
+            WHERE t.rowid > :after ORDER BY t.rowid
+        """), {"after": after})
+        loaded = 0
+        while True:
+            rows = result.fetchmany(BATCH_SIZE)
+            if not rows:
+                return loaded
+            loaded += len(rows)
+            columns = list(zip(*rows))
+            patient_rowids = np.array([-1 if r is None else r for r in columns[1]], dtype=np.int64)
+            # Patient rowids are ascending, so a binary search maps them to array positions
+            if len(self.patient_rowid):
+                position = np.minimum(np.searchsorted(self.patient_rowid, patient_rowids), len(self.patient_rowid) - 1)
+                found = self.patient_rowid[position] == patient_rowids
+            else:
+                position, found = np.zeros(len(rows), dtype=np.int64), np.zeros(len(rows), dtype=bool)
+            pressures = [_blood_pressure(value) for value in columns[6]]
+            batch = {
+                "heart_rate": columns[2],
+                "temperature": columns[3],
+                "oxygen_saturation": columns[4],
+                "respiratory_rate": columns[5],
+                "systolic": [pressure[0] for pressure in pressures],
+                "diastolic": [pressure[1] for pressure in pressures],
+            }
+            self.triage_rowid = np.concatenate([self.triage_rowid, np.array(columns[0], dtype=np.int64)])
+            self.patient_index = np.concatenate([self.patient_index, np.where(found, position, -1)])
+            for vital, values in batch.items():
+                array = np.array([_float(value) for value in values], dtype=np.float32)
+                self.vitals[vital] = np.concatenate([self.vitals[vital], array])
+            codes = [PRIORITIES.index(p) if p in PRIORITIES else -1 for p in columns[7]]
+            self.priority = np.concatenate([self.priority, np.array(codes, dtype=np.int8)])
+            symptom_codes = [self._symptom_code(symptoms) for symptoms in columns[8]]
+            self.symptom_code = np.concatenate([self.symptom_code, np.array(symptom_codes, dtype=np.int32)])
+
+    def refresh(self, engine, full: bool = False) -> dict:
+        """Append rows inserted since the last refresh (or reload everything)"""
+        with self._lock:
+            if full:
+                self._reset()
+            full = full or not len(self.patient_rowid)
+            with engine.connect() as conn:
+                last_patient = int(self.patient_rowid[-1]) if len(self.patient_rowid) else 0
+                last_triage = int(self.triage_rowid[-1]) if len(self.triage_rowid) else 0
+                patients = self._load_patients(conn, last_patient)
+                triage = self._load_triage(conn, last_triage)
+            if patients or triage:
+                self._results.clear()
+                self._keyword_masks.clear()
+            self.refreshed_at = time.time()
+            if full:
+                self.reloaded_at = self.refreshed_at
+            return {"patients": patients, "triage_records": triage}
+
+    def ensure_fresh(self, engine):
+        now = time.time()
+        if now - self.reloaded_at > FULL_REFRESH_SECONDS:
+            self.refresh(engine, full=True)
+        elif now - self.refreshed_at > REFRESH_SECONDS:
+            self.refresh(engine)
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+            result = compute()
+            if len(self._results) >= MAX_CACHED_RESULTS:
+                self._results.pop(next(iter(self._results)))
+            self._results[key] = result
+            return result
+
+    def _groups(self, group_by: tuple, patient_index: np.ndarray):
+        """Integer group key per row, a validity mask and the label tuple for every key"""
+        valid = patient_index >= 0 if group_by else np.ones(len(patient_index), dtype=bool)
+        index = np.where(valid, patient_index, 0)
+        keys = np.zeros(len(patient_index), dtype=np.int64)
+        labels = [()]
+        for field in group_by:
+            column, names = (self.age_band, AGE_BAND_LABELS) if field == "age_band" else (self.gender, self.genders)
+            codes = column[index] if len(column) else np.zeros(len(index), dtype=np.int8)
+            valid &= codes >= 0
+            keys = keys * len(names) + codes
+            labels = [label + (name,) for label in labels for name in names]
+        return keys, valid, labels
+
+    def vitals_distribution(self, vital: str, group_by: tuple = GROUP_FIELDS,
+                            percentiles: tuple = DEFAULT_PERCENTILES) -> list:
+        """Percentiles of one vital sign for every cohort in ``group_by``"""
+        return self._cached(("vitals", vital, group_by, percentiles),
+                            lambda: self._vitals_distribution(vital, group_by, percentiles))
+
+    def _vitals_distribution(self, vital, group_by, percentiles):
+        values = self.vitals[vital]
+        keys, valid, labels = self._groups(group_by, self.patient_index)
+        valid &= ~np.isnan(values)
+        keys, values = keys[valid], values[valid]
+        counts = np.bincount(keys, minlength=len(labels))
+        sums = np.bincount(keys, weights=values, minlength=len(labels))
+        # One sort of (group, value) packed into a float; each group's percentiles are then index arithmetic
+        low_value = float(values.min()) if len(values) else 0.0
+        span = float(values.max()) - low_value + 1.0 if len(values) else 1.0
+        packed = np.sort(keys * span + (values.astype(np.float64) - low_value))
+        ordered = packed - np.repeat(np.arange(len(labels)), counts) * span + low_value
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        populated = counts > 0
+        quantiles = {}
+        for q in percentiles:
+            position = starts + (q / 100.0) * np.maximum(counts - 1, 0)
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(np.ceil(position).astype(np.int64), starts + np.maximum(counts - 1, 0))
+            low, high = np.where(populated, low, 0), np.where(populated, high, 0)
+            if len(ordered):
+                fraction = position - np.floor(position)
+                quantiles[q] = ordered[low] + (ordered[high] - ordered[low]) * fraction
+        return [
+            {
+                **dict(zip(group_by, labels[key])),
+                "count": int(counts[key]),
+                "mean": round(float(sums[key] / counts[key]), 2),
+                "percentiles": {f"{q:g}": round(float(quantiles[q][key]), 2) for q in percentiles},
+            }
+            for key in np.flatnonzero(populated)
+        ]
+
+    def _keyword_mask(self, keyword: str) -> np.ndarray:
+        mask = self._keyword_masks.get(keyword)
+        if mask is None:
+            texts = np.array(self.symptom_texts, dtype=np.dtypes.StringDType())
+            matches = np.strings.find(texts, keyword) >= 0 if len(texts) else np.zeros(0, dtype=bool)
+            mask = matches[self.symptom_code]
+            self._keyword_masks[keyword] = mask
+        return mask
+
+    def critical_rates(self, keywords: tuple, group_by: tuple = ()) -> list:
+        """Share of triage records marked critical among those whose symptoms mention each keyword"""
+        keywords = tuple(keyword.strip().lower() for keyword in keywords if keyword.strip())
+        return self._cached(("critical", keywords, group_by),
+                            lambda: self._critical_rates(keywords, group_by))
+
+    def _critical_rates(self, keywords, group_by):
+        critical = self.priority == PRIORITIES.index("critical")
+        keys, valid, labels = self._groups(group_by, self.patient_index)
+        results = []
+        for keyword in keywords:
+            mask = self._keyword_mask(keyword) & valid
+            records = np.bincount(keys[mask], minlength=len(labels))
+            critical_records = np.bincount(keys[mask & critical], minlength=len(labels))
+            for key in np.flatnonzero(records):
+                results.append({
+                    "keyword": keyword,
+                    **dict(zip(group_by, labels[key])),
+                    "records": int(records[key]),
+                    "critical": int(critical_records[key]),
+                    "critical_rate": round(float(critical_records[key] / records[key]), 4),
+                })
+        return results
+
+    def summary(self) -> dict:
+        """Patient counts per age band and gender"""
+        return self._cached(("summary",), self._summary)
+
+    def _summary(self):
+        index = np.arange(len(self.patient_rowid))
+        keys, valid, labels = self._groups(GROUP_FIELDS, index)
+        counts = np.bincount(keys[valid], minlength=len(labels))
+        return {
+            "patients": len(self.patient_rowid),
+            "triage_records": len(self.triage_rowid),
+            "unknown_age": int(np.count_nonzero(self.age_band < 0)),
+            "cohorts": [
+                {"age_band": labels[key][0], "gender": labels[key][1], "count": int(counts[key])}
+                for key in np.flatnonzero(counts)
+            ],
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+store = CohortStore()
@@ -1,10 +1,18 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from database import User, Patient, Doctor, Nurse, Appointment, TriageRecord, Alert, Priority
+from sqlalchemy.orm import Session, selectinload, contains_eager
+from sqlalchemy import text, or_, update, func
+from database import User, Patient, PatientSummary, Doctor, Nurse, Appointment, TriageRecord, Alert, Priority
 from auth import get_password_hash, verify_password
 import schemas
+import wait_times
+import reminders
+import escalation
+import alert_coalescing
+import unread_counts
+from people_index import people
+import duplicates
+import patient_summaries
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 import json
 
 # User CRUD operations
@@ -35,6 +43,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    people.add(db_user)
     return db_user
 
 def register_patient(db: Session, patient_data: schemas.PatientRegistration):
@@ -59,8 +68,12 @@ def register_patient(db: Session, patient_data: schemas.PatientRegistration):
         contact_number=patient_data.contact_number
     )
     db.add(db_patient)
+    db.flush()
+    patient_summaries.refresh(db, patient_id=db_patient.id)
     db.commit()
     db.refresh(db_user)
+    people.add(db_user, profile_id=db_patient.id)
+    duplicates.index.add(db_patient.id, db_user.id, db_user.name, db_patient.contact_number, db_patient.age)
     return db_user
 
 def authenticate_user(db: Session, username: str, password: str, role: str):
@@ -84,7 +97,15 @@ def get_patient_with_user(db: Session, patient_id: str):
     return db.query(Patient).join(User).filter(Patient.id == patient_id).first()
 
 def get_patients_with_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Patient).join(User).offset(skip).limit(limit).all()
+    return db.query(Patient).join(User).options(
+        contains_eager(Patient.user), selectinload(Patient.summary)
+    ).offset(skip).limit(limit).all()
+
+def get_patient_summary(db: Session, patient_id: str):
+    return db.get(PatientSummary, patient_id)
+
+def get_patient_summary_by_user_id(db: Session, user_id: str):
+    return db.query(PatientSummary).filter(PatientSummary.user_id == user_id).first()
 
 def get_patients(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Patient).offset(skip).limit(limit).all()
@@ -92,8 +113,14 @@ def get_patients(db: Session, skip: int = 0, limit: int = 100):
 def create_patient(db: Session, patient: schemas.PatientCreate):
     db_patient = Patient(**patient.dict())
     db.add(db_patient)
+    db.flush()
+    patient_summaries.refresh(db, patient_id=db_patient.id)
     db.commit()
     db.refresh(db_patient)
+    people.set_profile(db_patient.user_id, db_patient.id)
+    user = get_user(db, db_patient.user_id)
+    if user:
+        duplicates.index.add(db_patient.id, user.id, user.name, db_patient.contact_number, db_patient.age)
     return db_patient
 
 def update_patient(db: Session, patient_id: str, patient_update: schemas.PatientBase):
@@ -103,40 +130,100 @@ def update_patient(db: Session, patient_id: str, patient_update: schemas.Patient
             setattr(db_patient, key, value)
         db.commit()
         db.refresh(db_patient)
+        duplicates.index.update(db_patient.id, contact_number=db_patient.contact_number, age=db_patient.age)
     return db_patient
 
+def find_duplicate_patients(name: str, contact_number: str = None, age: int = None,
+                            exclude_patient_id: str = None, limit: int = 10):
+    """Likely duplicates of a patient identity from the in-memory candidate index"""
+    return duplicates.index.find(name, contact_number, age, exclude=exclude_patient_id, limit=limit)
+
+def flag_duplicate_registration(db: Session, user: User, candidates: list):
+    """Let administrators know a new registration resembles existing patients"""
+    names = ", ".join(f"{c['name']} ({c['score']:.0%})" for c in candidates[:5])
+    for admin in get_users_by_role(db, "administrator"):
+        create_alert(db, schemas.AlertCreate(
+            alert_type="info",
+            title=f"Possible duplicate patient: {user.name}",
+            message=f"New registration '{user.username}' resembles: {names}",
+            user_id=admin.id,
+        ))
+
+def merge_patients(db: Session, primary_patient_id: str, duplicate_patient_id: str):
+    """Fold a duplicate patient into the primary in one transaction and delete the duplicate"""
+    primary = get_patient(db, primary_patient_id)
+    duplicate = get_patient(db, duplicate_patient_id)
+    if not primary or not duplicate or primary.id == duplicate.id:
+        return None
+    primary_user_id, duplicate_user_id = primary.user_id, duplicate.user_id
+    
+    moved = {
+        "appointments": db.execute(
+            update(Appointment).where(Appointment.patient_id == duplicate_user_id)
+            .values(patient_id=primary_user_id).execution_options(synchronize_session=False)
+        ).rowcount,
+        "triage_records": db.execute(
+            update(TriageRecord).where(TriageRecord.patient_id == duplicate.id)
+            .values(patient_id=primary.id).execution_options(synchronize_session=False)
+        ).rowcount,
+        "alerts": db.execute(
+            update(Alert).where(Alert.user_id == duplicate_user_id)
+            .values(user_id=primary_user_id).execution_options(synchronize_session=False)
+        ).rowcount,
+    }
+    
+    # Keep whatever the primary profile is missing
+    for field in ("age", "gender", "contact_number"):
+        if getattr(primary, field) is None and getattr(duplicate, field) is not None:
+            setattr(primary, field, getattr(duplicate, field))
+    if duplicate.medical_history and duplicate.medical_history != primary.medical_history:
+        primary.medical_history = "\n".join(filter(None, [primary.medical_history, duplicate.medical_history]))
+    
+    patient_summaries.remove(db, duplicate.id)
+    db.delete(duplicate)
+    db.flush()
+    patient_summaries.refresh(db, patient_id=primary.id)
+    duplicate_user = get_user(db, duplicate_user_id)
+    if duplicate_user:
+        db.delete(duplicate_user)
+    db.commit()
+    db.refresh(primary)
+    
+    duplicates.index.remove(duplicate.id)
+    duplicates.index.update(primary.id, contact_number=primary.contact_number, age=primary.age)
+    people.remove(duplicate_user_id)
+    escalation.escalator.retarget(duplicate_user_id, primary_user_id)
+    unread_counts.counter.invalidate(primary_user_id)
+    unread_counts.counter.invalidate(duplicate_user_id)
+    return {"patient": primary, "moved": moved}
+
 def delete_user(db: Session, user_id: str):
     """Permanently delete a user from the database"""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         return False
     
-    # Get user role using text query
-    role_result = db.execute(
-        text("SELECT role FROM users WHERE id = :user_id"), 
-        {"user_id": user_id}
-    ).fetchone()
-    
-    if role_result:
-        user_role = role_result[0]
-        
-        # Delete associated doctor/nurse/patient records first
-        if user_role == "doctor":
-            doctor = db.query(Doctor).filter(Doctor.user_id == user_id).first()
-            if doctor:
-                db.delete(doctor)
-        elif user_role == "nurse":
-            nurse = db.query(Nurse).filter(Nurse.user_id == user_id).first()
-            if nurse:
-                db.delete(nurse)
-        elif user_role == "patient":
-            patient = db.query(Patient).filter(Patient.user_id == user_id).first()
-            if patient:
-                db.delete(patient)
+    # Delete associated doctor/nurse/patient records first
+    user_role = user.role
+    if user_role == "doctor":
+        doctor = db.query(Doctor).filter(Doctor.user_id == user_id).first()
+        if doctor:
+            db.delete(doctor)
+    elif user_role == "nurse":
+        nurse = db.query(Nurse).filter(Nurse.user_id == user_id).first()
+        if nurse:
+            db.delete(nurse)
+    elif user_role == "patient":
+        patient = db.query(Patient).filter(Patient.user_id == user_id).first()
+        if patient:
+            patient_summaries.remove(db, patient.id)
+            db.delete(patient)
+            duplicates.index.remove(patient.id)
     
     # Delete the user record
     db.delete(user)
     db.commit()
+    people.remove(user_id)
     return True
 
 def toggle_user_active_status(db: Session, user_id: str):
@@ -153,6 +240,7 @@ def toggle_user_active_status(db: Session, user_id: str):
         # Toggle user active status
         db.query(User).filter(User.id == user_id).update({"is_active": new_status})
         db.commit()
+        people.set_active(user_id, new_status)
         return new_status
     return None
 
@@ -164,11 +252,25 @@ def get_doctor_by_user_id(db: Session, user_id: str):
     return db.query(Doctor).filter(Doctor.user_id == user_id).first()
 
 def get_doctors_with_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Doctor).join(User).offset(skip).limit(limit).all()
+    return db.query(Doctor).join(User).options(contains_eager(Doctor.user)).offset(skip).limit(limit).all()
 
 def get_doctors(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Doctor).offset(skip).limit(limit).all()
 
+def get_doctor_departments(db: Session, doctor_ids: List[str]) -> dict:
+    """Map appointment doctor ids (user ids or doctor profile ids) to departments in one query"""
+    doctor_ids = [doctor_id for doctor_id in set(doctor_ids) if doctor_id]
+    if not doctor_ids:
+        return {}
+    rows = db.query(Doctor.id, Doctor.user_id, Doctor.department).filter(
+        or_(Doctor.user_id.in_(doctor_ids), Doctor.id.in_(doctor_ids))
+    ).all()
+    departments = {}
+    for doctor_id, user_id, department in rows:
+        departments[doctor_id] = department
+        departments[user_id] = department
+    return departments
+
 def create_doctor(db: Session, doctor_data: schemas.DoctorCreate):
     # Create user account first with provided password
     hashed_password = get_password_hash(doctor_data.password)
@@ -194,6 +296,7 @@ def create_doctor(db: Session, doctor_data: schemas.DoctorCreate):
     db.add(db_doctor)
     db.commit()
     db.refresh(db_doctor)
+    people.add(db_user, profile_id=db_doctor.id)
     return db_doctor
 
 def update_doctor(db: Session, doctor_id: str, doctor_update: schemas.DoctorBase):
@@ -217,6 +320,7 @@ def delete_doctor(db: Session, doctor_id: str):
         if user:
             db.delete(user)
         db.commit()
+        people.remove(user_id)
         return True
     return False
 
@@ -238,6 +342,7 @@ def toggle_doctor_active_status(db: Session, doctor_id: str):
             # Also toggle doctor availability
             db.query(Doctor).filter(Doctor.id == doctor_id).update({"is_available": new_status})
             db.commit()
+            people.set_active(str(db_doctor.user_id), new_status)
             return new_status
     return None
 
@@ -249,7 +354,7 @@ def get_nurse_by_user_id(db: Session, user_id: str):
     return db.query(Nurse).filter(Nurse.user_id == user_id).first()
 
 def get_nurses_with_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Nurse).join(User).offset(skip).limit(limit).all()
+    return db.query(Nurse).join(User).options(contains_eager(Nurse.user)).offset(skip).limit(limit).all()
 
 def get_nurses(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Nurse).offset(skip).limit(limit).all()
@@ -278,6 +383,7 @@ def create_nurse(db: Session, nurse_data: schemas.NurseCreate):
     db.add(db_nurse)
     db.commit()
     db.refresh(db_nurse)
+    people.add(db_user, profile_id=db_nurse.id)
     return db_nurse
 
 def update_nurse(db: Session, nurse_id: str, nurse_update: schemas.NurseBase):
@@ -310,6 +416,7 @@ def toggle_nurse_active_status(db: Session, nurse_id: str):
         # Also toggle nurse availability
         db.query(Nurse).filter(Nurse.id == nurse_id).update({"is_available": new_status})
         db.commit()
+        people.set_active(str(nurse.user_id), new_status)
         return new_status
     return None
 
@@ -331,6 +438,7 @@ def delete_nurse(db: Session, nurse_id: str):
         db.delete(user)
     
     db.commit()
+    people.remove(str(nurse.user_id))
     return True
 
 # Appointment CRUD operations
@@ -338,13 +446,17 @@ def get_appointment(db: Session, appointment_id: str):
     return db.query(Appointment).filter(Appointment.id == appointment_id).first()
 
 def get_appointments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Appointment).offset(skip).limit(limit).all()
+    return db.query(Appointment).options(selectinload(Appointment.priority)).offset(skip).limit(limit).all()
 
 def get_appointments_by_patient(db: Session, patient_id: str):
-    return db.query(Appointment).filter(Appointment.patient_id == patient_id).all()
+    return db.query(Appointment).options(selectinload(Appointment.priority)).filter(
+        Appointment.patient_id == patient_id
+    ).all()
 
 def get_appointments_by_doctor(db: Session, doctor_id: str):
-    return db.query(Appointment).filter(Appointment.doctor_id == doctor_id).all()
+    return db.query(Appointment).options(selectinload(Appointment.priority)).filter(
+        Appointment.doctor_id == doctor_id
+    ).all()
 
 def get_appointments_by_date(db: Session, appointment_date: str):
     return db.query(Appointment).filter(Appointment.date == appointment_date).all()
@@ -352,24 +464,39 @@ def get_appointments_by_date(db: Session, appointment_date: str):
 def create_appointment(db: Session, appointment: schemas.AppointmentCreate):
     db_appointment = Appointment(**appointment.dict())
     db.add(db_appointment)
+    db.flush()
+    patient_summaries.refresh(db, user_id=db_appointment.patient_id)
     db.commit()
     db.refresh(db_appointment)
+    reminders.scheduler.schedule(db_appointment)
     return db_appointment
 
 def update_appointment(db: Session, appointment_id: str, appointment_update: schemas.AppointmentUpdate):
     db_appointment = get_appointment(db, appointment_id)
     if db_appointment:
+        was_completed = db_appointment.status == "completed"
+        previous_patient_id = db_appointment.patient_id
         for key, value in appointment_update.dict(exclude_unset=True).items():
             setattr(db_appointment, key, value)
+        db.flush()
+        patient_summaries.refresh(db, user_id=db_appointment.patient_id)
+        if previous_patient_id != db_appointment.patient_id:
+            patient_summaries.refresh(db, user_id=previous_patient_id)
         db.commit()
         db.refresh(db_appointment)
+        reminders.scheduler.schedule(db_appointment)
+        if not was_completed and db_appointment.status == "completed":
+            _record_appointment_wait(db, db_appointment)
     return db_appointment
 
 def delete_appointment(db: Session, appointment_id: str):
     db_appointment = get_appointment(db, appointment_id)
     if db_appointment:
         db.delete(db_appointment)
+        db.flush()
+        patient_summaries.refresh(db, user_id=db_appointment.patient_id)
         db.commit()
+        reminders.scheduler.cancel(appointment_id)
     return db_appointment
 
 # Triage CRUD operations
@@ -388,6 +515,8 @@ def get_triage_records_by_status(db: Session, status: str):
 def create_triage_record(db: Session, triage: schemas.TriageRecordCreate):
     db_triage = TriageRecord(**triage.dict())
     db.add(db_triage)
+    db.flush()
+    patient_summaries.refresh(db, patient_id=db_triage.patient_id)
     db.commit()
     db.refresh(db_triage)
     return db_triage
@@ -395,10 +524,15 @@ def create_triage_record(db: Session, triage: schemas.TriageRecordCreate):
 def update_triage_record(db: Session, triage_id: str, triage_update: dict):
     db_triage = get_triage_record(db, triage_id)
     if db_triage:
+        was_completed = db_triage.status == "completed"
         for key, value in triage_update.items():
             setattr(db_triage, key, value)
+        db.flush()
+        patient_summaries.refresh(db, patient_id=db_triage.patient_id)
         db.commit()
         db.refresh(db_triage)
+        if not was_completed and db_triage.status == "completed":
+            wait_times.record_triage(db_triage)
     return db_triage
 
 # Alert CRUD operations
@@ -414,21 +548,88 @@ def get_alerts_by_user(db: Session, user_id: str):
 def get_unread_alerts(db: Session, user_id: str):
     return db.query(Alert).filter(Alert.user_id == user_id, Alert.is_read == False).all()
 
-def create_alert(db: Session, alert: schemas.AlertCreate):
-    db_alert = Alert(**alert.dict())
-    db.add(db_alert)
+def create_alert(db: Session, alert: schemas.AlertCreate, escalate: bool = True,
+                 escalated_from: Optional[str] = None):
+    key = alert_coalescing.coalesce_key(alert, escalated_from)
+    db_alert = _coalesce_alert(db, key, alert)
+    if db_alert is None:
+        db_alert = Alert(**alert.dict(), escalated_from=escalated_from)
+        with unread_counts.counter.writing(alert.user_id):
+            db.add(db_alert)
+            db.commit()
+            unread_counts.counter.adjust(alert.user_id, 1)
+        db.refresh(db_alert)
+        alert_coalescing.coalescer.remember(key, db_alert.id)
+    if escalate and db_alert.alert_type == "emergency" and not escalation.escalator.is_tracked(db_alert.id):
+        escalation.escalator.track(db_alert)
+    return db_alert
+
+def _coalesce_alert(db: Session, key: tuple, alert: schemas.AlertCreate) -> Optional[Alert]:
+    """Fold a repeat into the recent unread alert with the same key, in one UPDATE"""
+    alert_id = alert_coalescing.coalescer.lookup(key)
+    if alert_id is None:
+        return None
+    db_alert = db.execute(
+        update(Alert)
+        .where(Alert.id == alert_id, Alert.is_read == False)
+        .values(
+            occurrence_count=Alert.occurrence_count + 1,
+            message=alert.message,
+            last_seen_at=func.now(),
+        )
+        .returning(Alert)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if db_alert is None:
+        # Already read (or deleted): start a fresh alert for this key
+        alert_coalescing.coalescer.discard(key)
+        db.rollback()
+        return None
     db.commit()
-    db.refresh(db_alert)
     return db_alert
 
 def mark_alert_read(db: Session, alert_id: str):
     db_alert = get_alert(db, alert_id)
     if db_alert:
-        db_alert.is_read = True
-        db.commit()
+        with unread_counts.counter.writing(db_alert.user_id):
+            # Conditional UPDATE so concurrent reads of one alert decrement the counter once
+            marked = db.execute(
+                update(Alert).where(Alert.id == alert_id, Alert.is_read == False)
+                .values(is_read=True).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if marked:
+                unread_counts.counter.adjust(db_alert.user_id, -1)
         db.refresh(db_alert)
+        escalation.escalator.cancel(db_alert.escalated_from or alert_id)
     return db_alert
 
+def mark_alerts_read(db: Session, user_id: str, alert_ids: Optional[List[str]] = None,
+                     before: Optional[datetime] = None) -> List[str]:
+    """Mark a user's unread alerts as read in a single UPDATE, by ids and/or up to a timestamp"""
+    stmt = update(Alert).where(Alert.user_id == user_id, Alert.is_read == False)
+    if alert_ids is not None:
+        stmt = stmt.where(Alert.id.in_(alert_ids))
+    if before is not None:
+        if before.tzinfo is not None:
+            # Timestamps are stored as naive UTC
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        # A coalesced alert counts as seen only if its latest repeat is
+        stmt = stmt.where(func.coalesce(Alert.last_seen_at, Alert.timestamp) <= before)
+    with unread_counts.counter.writing(user_id):
+        marked = db.execute(
+            stmt.values(is_read=True).returning(Alert.id, Alert.escalated_from)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        unread_counts.counter.adjust(user_id, -len(marked))
+    for alert_id, escalated_from in marked:
+        escalation.escalator.cancel(escalated_from or alert_id)
+    return [alert_id for alert_id, _ in marked]
+
+def get_unread_alert_count(db: Session, user_id: str) -> int:
+    return unread_counts.counter.get(db, user_id)
+
 # Dashboard statistics
 def get_dashboard_stats(db: Session, user_role: str, user_id: str):
     if user_role == "nurse":
@@ -453,24 +654,33 @@ def get_dashboard_stats(db: Session, user_role: str, user_id: str):
         pending_reviews = db.query(TriageRecord).filter(TriageRecord.status == "pending").count()
         critical_alerts = db.query(Alert).filter(Alert.alert_type == "emergency").count()
         
+        department = get_doctor_departments(db, [user_id]).get(user_id)
+        wait_estimate = wait_times.estimate_appointment(doctor_id=user_id, department=department)
+        
         return {
             "appointments_today": appointments_today,
             "pending_reviews": pending_reviews,
             "critical_alerts": critical_alerts,
-            "avg_wait_time": "15m"
+            "avg_wait_time": wait_times.format_minutes(wait_estimate["p50"] if wait_estimate else None),
+            "wait_time_p50": wait_estimate["p50"] if wait_estimate else None,
+            "wait_time_p90": wait_estimate["p90"] if wait_estimate else None
         }
     
     elif user_role == "patient":
-        upcoming_appointments = db.query(Appointment).filter(
-            Appointment.patient_id == user_id,
-            Appointment.status == "scheduled"
-        ).count()
+        summary = get_patient_summary_by_user_id(db, user_id)
+        if not summary:
+            return {
+                "upcoming_appointments": 0,
+                "medical_records": 0,
+                "triage_priority": "None",
+                "last_visit": "Never"
+            }
         
         return {
-            "upcoming_appointments": upcoming_appointments,
-            "medical_records": 8,
-            "triage_priority": "Low",
-            "last_visit": "12d"
+            "upcoming_appointments": summary.upcoming_appointments,
+            "medical_records": summary.appointment_count + summary.triage_count,
+            "triage_priority": (summary.latest_priority or "none").capitalize(),
+            "last_visit": patient_summaries.format_last_visit(summary.last_visit)
         }
     
     elif user_role == "administrator":
@@ -536,22 +746,92 @@ def book_appointment(db: Session, appointment_data: schemas.AppointmentBooking,
         status="pending"
     )
     db.add(db_appointment)
+    db.flush()
+    patient_summaries.refresh(db, user_id=db_appointment.patient_id)
     db.commit()
     db.refresh(db_appointment)
+    reminders.scheduler.schedule(db_appointment)
     return db_appointment
 
 def mark_appointment_consulted(db: Session, appointment_id: str, doctor_remarks: str = None):
     """Mark appointment as completed by doctor"""
     appointment = get_appointment(db, appointment_id)
     if appointment:
+        was_completed = appointment.status == "completed"
         appointment.status = "completed"
         if doctor_remarks:
             appointment.doctor_remarks = doctor_remarks
+        db.flush()
+        patient_summaries.refresh(db, user_id=appointment.patient_id)
         db.commit()
         db.refresh(appointment)
+        reminders.scheduler.cancel(appointment_id)
+        if not was_completed:
+            _record_appointment_wait(db, appointment)
         return appointment
     return None
 
+def _record_appointment_wait(db: Session, appointment: Appointment):
+    """Feed a newly completed appointment into the wait-time sketches"""
+    departments = get_doctor_departments(db, [appointment.doctor_id])
+    priority_name = appointment.priority.name if appointment.priority else None
+    wait_times.record_appointment(
+        appointment,
+        department=departments.get(appointment.doctor_id),
+        priority_name=priority_name,
+        completed_at=appointment.updated_at,
+    )
+
+def attach_appointment_names(db: Session, appointments: List[Appointment]):
+    """Set patient_name/doctor_name on appointments with a single user lookup"""
+    user_ids = {a.patient_id for a in appointments} | {a.doctor_id for a in appointments}
+    user_ids.discard(None)
+    names = dict(db.query(User.id, User.name).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    for appointment in appointments:
+        appointment.patient_name = names.get(appointment.patient_id, "Unknown")
+        appointment.doctor_name = names.get(appointment.doctor_id, "Unknown")
+    return appointments
+
+def attach_triage_names(db: Session, records: List[TriageRecord]):
+    """Set patient_name/nurse_name on triage records with one lookup per side"""
+    patient_ids = {r.patient_id for r in records if r.patient_id}
+    nurse_ids = {r.nurse_id for r in records if r.nurse_id}
+    patient_names = dict(
+        db.query(Patient.id, User.name).join(User, Patient.user_id == User.id)
+        .filter(Patient.id.in_(patient_ids)).all()
+    ) if patient_ids else {}
+    nurse_names = dict(db.query(User.id, User.name).filter(User.id.in_(nurse_ids)).all()) if nurse_ids else {}
+    for record in records:
+        record.patient_name = patient_names.get(record.patient_id, "Unknown")
+        record.nurse_name = nurse_names.get(record.nurse_id, "Unknown")
+    return records
+
+def attach_appointment_wait_estimates(db: Session, appointments: List[Appointment]):
+    """Annotate open appointments with p50/p90 wait estimates (minutes)"""
+    open_appointments = [a for a in appointments if a.status in ("pending", "scheduled")]
+    departments = get_doctor_departments(db, [a.doctor_id for a in open_appointments])
+    for appointment in open_appointments:
+        estimate = wait_times.estimate_appointment(
+            doctor_id=appointment.doctor_id,
+            department=departments.get(appointment.doctor_id),
+            priority_name=appointment.priority.name if appointment.priority else None,
+        )
+        if estimate:
+            appointment.estimated_wait_p50 = estimate["p50"]
+            appointment.estimated_wait_p90 = estimate["p90"]
+    return appointments
+
+def attach_triage_wait_estimates(records: List[TriageRecord]):
+    """Annotate open triage records with p50/p90 wait estimates (minutes)"""
+    for record in records:
+        if record.status == "completed":
+            continue
+        estimate = wait_times.estimate_triage(record.priority)
+        if estimate:
+            record.estimated_wait_p50 = estimate["p50"]
+            record.estimated_wait_p90 = estimate["p90"]
+    return records
+
 def get_appointments_with_priority(db: Session, skip: int = 0, limit: int = 100):
     """Get appointments with priority information"""
     return db.query(Appointment).offset(skip).limit(limit).all()
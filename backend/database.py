@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, Float, Boolean, ForeignKey
+from sqlalchemy import create_engine, inspect, text, Index, Column, String, Integer, DateTime, Text, Float, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
@@ -7,10 +7,18 @@ from datetime import datetime
 
 import os
 
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.dirname(os.path.abspath(__file__))}/vitals_hub.db"
+# VITALS_DATABASE_URL points the app at another database (benchmarks, generated datasets)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "VITALS_DATABASE_URL", f"sqlite:///{os.path.dirname(os.path.abspath(__file__))}/vitals_hub.db"
+)
 
+# Async endpoints check connections out on the event loop, where an exhausted pool stalls
+# every request until the checkout times out; size the overflow above peak concurrency.
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "64")),
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10")),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -32,6 +40,11 @@ class User(Base):
     
     # Relationships
     patient_profile = relationship("Patient", back_populates="user", uselist=False)
+    
+    __table_args__ = (
+        Index("ix_users_role_name", "role", "name", "id"),
+        Index("ix_users_role_active_name", "role", "is_active", "name", "id"),
+    )
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -47,6 +60,27 @@ class Patient(Base):
     # Relationships
     user = relationship("User", back_populates="patient_profile")
     triage_records = relationship("TriageRecord", back_populates="patient")
+    summary = relationship("PatientSummary", uselist=False, viewonly=True)
+
+class PatientSummary(Base):
+    """Denormalized per-patient totals, rewritten by crud on every appointment/triage write"""
+    __tablename__ = "patient_summaries"
+    
+    patient_id = Column(String, ForeignKey("patients.id"), primary_key=True)
+    user_id = Column(String, index=True)
+    appointment_count = Column(Integer, default=0, server_default="0")
+    completed_appointments = Column(Integer, default=0, server_default="0")
+    upcoming_appointments = Column(Integer, default=0, server_default="0")
+    triage_count = Column(Integer, default=0, server_default="0")
+    last_visit = Column(String)  # YYYY-MM-DD of the latest completed appointment or triage
+    latest_priority = Column(String)
+    latest_triage_at = Column(DateTime(timezone=True))
+    blood_pressure = Column(String)
+    heart_rate = Column(Integer)
+    temperature = Column(Float)
+    oxygen_saturation = Column(Integer)
+    respiratory_rate = Column(Integer)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Doctor(Base):
     __tablename__ = "doctors"
@@ -63,6 +97,13 @@ class Doctor(Base):
     # Relationships
     user = relationship("User", foreign_keys=[user_id])
     appointments = relationship("Appointment", back_populates="doctor")
+    
+    __table_args__ = (
+        Index("ix_doctors_department_specialization", "department", "specialization"),
+        Index("ix_doctors_specialization", "specialization"),
+        Index("ix_doctors_department_user", "department", "user_id"),
+        Index("ix_doctors_created_user", "created_at", "user_id"),
+    )
 
 class Nurse(Base):
     __tablename__ = "nurses"
@@ -78,6 +119,13 @@ class Nurse(Base):
     # Relationships
     user = relationship("User", foreign_keys=[user_id])
     triage_records = relationship("TriageRecord", back_populates="nurse")
+    
+    __table_args__ = (
+        Index("ix_nurses_department_shift", "department", "shift"),
+        Index("ix_nurses_shift", "shift"),
+        Index("ix_nurses_department_user", "department", "user_id"),
+        Index("ix_nurses_created_user", "created_at", "user_id"),
+    )
 
 class Priority(Base):
     __tablename__ = "priorities"
@@ -112,6 +160,17 @@ class Appointment(Base):
     patient = relationship("User", foreign_keys=[patient_id])
     doctor = relationship("Doctor", back_populates="appointments")
     priority = relationship("Priority", back_populates="appointments")
+    
+    # Composite indexes used by appointment_search: one per equality filter, each continuing with (date, time)
+    __table_args__ = (
+        Index("ix_appointments_date_time", "date", "time"),
+        Index("ix_appointments_patient_date", "patient_id", "date", "time"),
+        Index("ix_appointments_doctor_date", "doctor_id", "date", "time"),
+        Index("ix_appointments_type_date", "appointment_type", "date", "time"),
+        Index("ix_appointments_priority_date", "priority_id", "date", "time"),
+        Index("ix_appointments_status_date", "status", "date", "time"),
+        Index("ix_appointments_patient_created", "patient_id", "created_at"),
+    )
 
 class TriageRecord(Base):
     __tablename__ = "triage_records"
@@ -132,6 +191,13 @@ class TriageRecord(Base):
     # Relationships
     patient = relationship("Patient", back_populates="triage_records")
     nurse = relationship("Nurse", back_populates="triage_records")
+    
+    __table_args__ = (
+        Index("ix_triage_records_timestamp", "timestamp"),
+        Index("ix_triage_records_patient_timestamp", "patient_id", "timestamp"),
+        Index("ix_triage_records_status_timestamp", "status", "timestamp"),
+        Index("ix_triage_records_priority_timestamp", "priority", "timestamp"),
+    )
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -143,10 +209,45 @@ class Alert(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     is_read = Column(Boolean, default=False)
     user_id = Column(String, ForeignKey("users.id"))
+    occurrence_count = Column(Integer, default=1, server_default="1")  # Bumped when repeats are coalesced
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)  # Latest coalesced repeat; timestamp keeps the first
+    escalated_from = Column(String, nullable=True)  # Original alert id on escalated copies
+    
+    __table_args__ = (
+        Index("ix_alerts_user_unread", "user_id", "is_read", "timestamp"),
+        Index("ix_alerts_timestamp", "timestamp"),
+        Index("ix_alerts_user_timestamp", "user_id", "timestamp"),
+        Index("ix_alerts_type_timestamp", "alert_type", "timestamp"),
+    )
 
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+
+def add_missing_columns():
+    """Add columns introduced after an existing database was created (create_all never alters tables)"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+
+def add_missing_indexes():
+    """Create indexes declared after an existing table was created"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
 # Dependency to get DB session
 def get_db():
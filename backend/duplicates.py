@@ -0,0 +1,202 @@
+"""
+Duplicate patient detection.
+
+Patients are indexed in memory under three kinds of blocking keys: character
+trigrams of the normalized name, Soundex codes of each name word, and the last
+seven digits of the contact number. A lookup only touches the posting lists of
+the query's own keys (skipping trigrams so common they carry no signal), then
+scores that small candidate set, so it does not grow with the patient table.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_LIMIT = 10
+# Trigrams shared by more patients than this are ignored as candidate generators
+MAX_POSTING = 5000
+# Candidates scored per lookup, ranked by number of shared trigrams
+MAX_CANDIDATES = 200
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation, and sort words so order doesn't matter"""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    return " ".join(sorted(re.findall(r"[a-z]+", name)))
+
+
+def trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+def soundex(word: str) -> str:
+    if not word:
+        return ""
+    code, previous = word[0].upper(), _SOUNDEX_CODES.get(word[0], "")
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+        if ch not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def contact_key(contact_number: str):
+    digits = re.sub(r"\D", "", contact_number or "")
+    return digits[-7:] if len(digits) >= 7 else None
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self._patients = {}  # patient_id -> record
+        self._trigrams = {}
+        self._phonetic = {}
+        self._contacts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._patients)
+
+    @staticmethod
+    def _record(patient_id, user_id, name, contact_number, age):
+        normalized = normalize_name(name)
+        return {
+            "patient_id": patient_id,
+            "user_id": user_id,
+            "name": name,
+            "contact_number": contact_number,
+            "age": age,
+            "trigrams": trigrams(normalized) if normalized else set(),
+            "phonetic": {soundex(word) for word in normalized.split()},
+            "contact": contact_key(contact_number),
+        }
+
+    def add(self, patient_id: str, user_id: str, name: str, contact_number: str = None, age: int = None):
+        """Insert or replace a patient's entry"""
+        record = self._record(patient_id, user_id, name, contact_number, age)
+        with self._lock:
+            self._add_locked(record)
+
+    def update(self, patient_id: str, **changes):
+        """Change some fields of an indexed patient; unknown patients are ignored"""
+        with self._lock:
+            current = self._patients.get(patient_id)
+            if current:
+                fields = {key: current[key] for key in ("user_id", "name", "contact_number", "age")}
+                fields.update(changes)
+                self._add_locked(self._record(patient_id, **fields))
+
+    def _add_locked(self, record: dict):
+        patient_id = record["patient_id"]
+        self._remove_locked(patient_id)
+        self._patients[patient_id] = record
+        for gram in record["trigrams"]:
+            self._trigrams.setdefault(gram, set()).add(patient_id)
+        for code in record["phonetic"]:
+            self._phonetic.setdefault(code, set()).add(patient_id)
+        if record["contact"]:
+            self._contacts.setdefault(record["contact"], set()).add(patient_id)
+
+    def remove(self, patient_id: str):
+        with self._lock:
+            self._remove_locked(patient_id)
+
+    def _remove_locked(self, patient_id: str):
+        record = self._patients.pop(patient_id, None)
+        if not record:
+            return
+        for postings, keys in (
+            (self._trigrams, record["trigrams"]),
+            (self._phonetic, record["phonetic"]),
+            (self._contacts, [record["contact"]] if record["contact"] else []),
+        ):
+            for key in keys:
+                members = postings.get(key)
+                if members is not None:
+                    members.discard(patient_id)
+                    if not members:
+                        del postings[key]
+
+    def find(self, name: str, contact_number: str = None, age: int = None, exclude: str = None,
+             threshold: float = DEFAULT_THRESHOLD, limit: int = DEFAULT_LIMIT) -> list:
+        """Likely duplicates of the given identity, highest score first"""
+        query = self._record(None, None, name, contact_number, age)
+        with self._lock:
+            shared = Counter()
+            for gram in query["trigrams"]:
+                members = self._trigrams.get(gram, ())
+                if len(members) <= MAX_POSTING:
+                    shared.update(members)
+            candidates = {patient_id for patient_id, _ in shared.most_common(MAX_CANDIDATES)}
+            for code in query["phonetic"]:
+                members = self._phonetic.get(code, ())
+                if len(members) <= MAX_POSTING:
+                    candidates.update(members)
+            if query["contact"]:
+                candidates.update(self._contacts.get(query["contact"], ()))
+            candidates.discard(exclude)
+
+            matches = []
+            for patient_id in candidates:
+                record = self._patients[patient_id]
+                score, reasons = self._score(query, record, shared[patient_id])
+                if score >= threshold:
+                    matches.append({
+                        "patient_id": patient_id,
+                        "user_id": record["user_id"],
+                        "name": record["name"],
+                        "contact_number": record["contact_number"],
+                        "age": record["age"],
+                        "score": round(score, 3),
+                        "reasons": reasons,
+                    })
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:limit]
+
+    @staticmethod
+    def _score(query: dict, record: dict, shared_trigrams: int):
+        reasons = []
+        union = len(query["trigrams"]) + len(record["trigrams"]) - shared_trigrams
+        similarity = shared_trigrams / union if union else 0.0
+        score = 0.7 * similarity
+        if similarity >= 0.5:
+            reasons.append("similar name")
+        if query["phonetic"] and query["phonetic"] == record["phonetic"]:
+            score += 0.15
+            reasons.append("same-sounding name")
+        if query["contact"] and query["contact"] == record["contact"]:
+            score += 0.3
+            reasons.append("same contact number")
+        if query["age"] is not None and record["age"] is not None:
+            difference = abs(query["age"] - record["age"])
+            if difference <= 1:
+                score += 0.1
+                reasons.append("same age")
+            elif difference > 5:
+                score -= 0.3
+        return min(max(score, 0.0), 1.0), reasons
+
+    def load(self, db):
+        """Rebuild the index from the patients table (run once at startup)"""
+        from database import Patient, User
+
+        with self._lock:
+            self._patients, self._trigrams, self._phonetic, self._contacts = {}, {}, {}, {}
+        rows = db.query(
+            Patient.id, Patient.user_id, User.name, Patient.contact_number, Patient.age
+        ).outerjoin(User, User.id == Patient.user_id).yield_per(1000)
+        for patient_id, user_id, name, contact_number, age in rows:
+            self.add(patient_id, user_id, name, contact_number, age)
+
+
+index = DuplicateIndex()
@@ -0,0 +1,158 @@
+"""
+Escalation of unacknowledged emergency alerts.
+
+Every unread ``emergency`` alert is tracked in a ``TimerQueue`` deadline heap.
+When a deadline passes without the alert being read, the next escalation step
+fires and widens the audience: first the original recipient is re-notified,
+then the staff of the recipient's department, then all administrators. Reading
+the alert (or any escalated copy of it) cancels the chain: copies store the
+original alert id in ``escalated_from``, so this survives restarts. Each step
+is a heap operation, so nothing polls the alerts table.
+"""
+import logging
+import os
+import time
+from datetime import timezone
+
+import schemas
+from timers import TimerQueue
+
+logger = logging.getLogger(__name__)
+
+# Minutes to wait before each escalation step
+ESCALATION_INTERVALS_MINUTES = [
+    int(step) for step in os.getenv("ESCALATION_INTERVALS_MINUTES", "5,10,15").split(",") if step.strip()
+]
+ESCALATION_LEVELS = ("recipient", "department", "administrators")
+ESCALATED_TITLE_PREFIX = "[Escalated] "
+
+
+def _epoch(timestamp) -> float:
+    if timestamp is None:
+        return time.time()
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _department_of(db, user_id: str):
+    from database import Doctor, Nurse
+
+    for model in (Doctor, Nurse):
+        department = db.query(model.department).filter(model.user_id == user_id).scalar()
+        if department:
+            return department
+    return None
+
+
+def resolve_recipients(db, level: str, user_id: str) -> list:
+    """User ids to notify for an escalation level"""
+    from database import User, Doctor, Nurse
+
+    if level == "recipient":
+        return [user_id]
+    if level == "department":
+        department = _department_of(db, user_id)
+        if not department:
+            return []
+        staff = db.query(User.id).join(Doctor, Doctor.user_id == User.id).filter(
+            Doctor.department == department, User.is_active == True
+        ).union(
+            db.query(User.id).join(Nurse, Nurse.user_id == User.id).filter(
+                Nurse.department == department, User.is_active == True
+            )
+        )
+        return [row[0] for row in staff if row[0] != user_id]
+    if level == "administrators":
+        admins = db.query(User.id).filter(User.role == "administrator", User.is_active == True)
+        return [row[0] for row in admins]
+    return []
+
+
+class EscalationEngine:
+    def __init__(self, intervals=None):
+        self.intervals = intervals or ESCALATION_INTERVALS_MINUTES
+        self.session_factory = None
+        self.queue = TimerQueue("escalations", self._fire)
+
+    def track(self, alert, level: int = 0, since: float = None):
+        """Start (or continue) the escalation chain for an unread emergency alert"""
+        if alert.is_read or level >= min(len(self.intervals), len(ESCALATION_LEVELS)):
+            return
+        since = _epoch(alert.timestamp) if since is None else since
+        deadline = since + self.intervals[level] * 60
+        self.queue.schedule(alert.id, deadline, {
+            "level": level,
+            "user_id": alert.user_id,
+            "title": alert.title,
+            "message": alert.message,
+        })
+
+    def cancel(self, alert_id: str):
+        """Stop the chain of an original alert (callers pass ``escalated_from`` for copies)"""
+        self.queue.cancel(alert_id)
+
+    def retarget(self, old_user_id: str, new_user_id: str) -> int:
+        """Send pending escalations of ``old_user_id``'s alerts to ``new_user_id`` (after a patient merge)"""
+        def update(alert_id, payload):
+            if payload["user_id"] != old_user_id:
+                return False
+            payload["user_id"] = new_user_id
+            return True
+
+        return self.queue.update_payloads(update)
+
+    def is_tracked(self, alert_id: str) -> bool:
+        return self.queue.contains(alert_id)
+
+    def load(self, db):
+        """Track every unread emergency alert (run once at startup)"""
+        from database import Alert
+
+        alerts = db.query(Alert).filter(
+            Alert.alert_type == "emergency",
+            Alert.is_read == False,
+            Alert.escalated_from.is_(None),
+            ~Alert.title.startswith(ESCALATED_TITLE_PREFIX),
+        ).yield_per(1000)
+        for alert in alerts:
+            self.track(alert)
+
+    def _fire(self, alert_id, payload):
+        import crud
+
+        db = self.session_factory()
+        try:
+            alert = crud.get_alert(db, alert_id)
+            if not alert or alert.is_read:
+                return
+            level = payload["level"]
+            recipients = resolve_recipients(db, ESCALATION_LEVELS[level], payload["user_id"])
+            for user_id in recipients:
+                crud.create_alert(db, schemas.AlertCreate(
+                    alert_type="emergency",
+                    title=ESCALATED_TITLE_PREFIX + payload["title"],
+                    message=payload["message"],
+                    user_id=user_id,
+                ), escalate=False, escalated_from=alert_id)
+            logger.info("Escalated alert %s to %s (%d recipients)",
+                        alert_id, ESCALATION_LEVELS[level], len(recipients))
+            self.track(alert, level=level + 1, since=time.time())
+        finally:
+            db.close()
+
+    def start(self, session_factory):
+        self.session_factory = session_factory
+        db = session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+        self.queue.start()
+
+    def stop(self):
+        self.queue.stop()
+        self.queue.clear()
+
+
+escalator = EscalationEngine()
@@ -0,0 +1,88 @@
+"""
+Streaming exports of appointments, triage records and alerts.
+
+Rows are read with ``yield_per`` so the driver hands them over in fixed-size
+batches, and each batch is serialized and yielded to the ``StreamingResponse``
+before the next one is fetched. Memory use is bounded by the batch size no
+matter how many rows match. The generator owns its session because the
+response body is produced after the request's dependencies have finished.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from database import SessionLocal, Appointment, TriageRecord, Alert
+
+BATCH_SIZE = 1000
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# dataset -> (table, column used for date-range filtering and ordering)
+DATASETS = {
+    "appointments": (Appointment.__table__, "date"),
+    "triage": (TriageRecord.__table__, "timestamp"),
+    "alerts": (Alert.__table__, "timestamp"),
+}
+
+
+def _next_day(day: str) -> str:
+    return str(datetime.strptime(day, "%Y-%m-%d").date() + timedelta(days=1))
+
+
+def build_query(dataset: str, date_from: str = None, date_to: str = None, status: str = None):
+    """Select for an export; dates are inclusive YYYY-MM-DD bounds"""
+    table, date_column = DATASETS[dataset]
+    column = table.c[date_column]
+    query = select(*table.c)
+    if date_from:
+        query = query.where(column >= date_from)
+    if date_to:
+        # ``date`` is a plain day string; timestamps need an exclusive next-day bound
+        query = query.where(column <= date_to if date_column == "date" else column < _next_day(date_to))
+    if status:
+        if dataset == "alerts":
+            query = query.where(table.c.is_read == (status == "read"))
+        else:
+            query = query.where(table.c.status == status)
+    if dataset == "appointments":
+        return query.order_by(table.c.date, table.c.time)
+    return query.order_by(column)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_export(dataset: str, fmt: str, date_from: str = None, date_to: str = None,
+                  status: str = None, session_factory=SessionLocal):
+    """Yield the export in text chunks of at most ``BATCH_SIZE`` rows"""
+    table, _ = DATASETS[dataset]
+    columns = [column.name for column in table.c]
+    query = build_query(dataset, date_from, date_to, status).execution_options(yield_per=BATCH_SIZE)
+
+    db = session_factory()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        for partition in db.execute(query).partitions():
+            for row in partition:
+                values = [_value(value) for value in row]
+                if writer:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values)), default=str))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
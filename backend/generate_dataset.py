@@ -0,0 +1,386 @@
+"""
+Generate a realistic, hospital-scale Vitals Hub database.
+
+Everything is derived from ``--seed``, so the same arguments always produce the
+same rows (ids included). Rows are produced in batches and written with Core
+``executemany`` inserts inside large transactions; secondary indexes, search
+triggers and rollup triggers are only built once the raw tables are loaded,
+which is much faster than maintaining them row by row.
+
+    python generate_dataset.py --output big.db --patients 500000 --alerts-per-staff-year 150   # ~10M rows
+    python generate_dataset.py --output small.db --patients 2000 --years 1
+
+Every generated account uses ``--password`` (default ``bench``), so the
+database can be passed straight to ``bench_http.py --db``. Usernames follow
+``admin_N``, ``doctor_N``, ``nurse_N`` and ``patient_N``.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BATCH_SIZE = 20000
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Amina", "Wei", "Priya", "Carlos", "Fatima", "Hiroshi", "Olga", "Kwame", "Sofia", "Mateo",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Okafor", "Chen", "Patel", "Nguyen", "Kowalski", "Tanaka", "Ivanova", "Mensah", "Rossi", "Silva",
+]
+DEPARTMENTS = {
+    "Cardiology": ["Cardiologist", "Interventional Cardiologist"],
+    "Emergency": ["Emergency Physician", "Trauma Surgeon"],
+    "Pediatrics": ["Pediatrician", "Neonatologist"],
+    "Neurology": ["Neurologist", "Neurosurgeon"],
+    "Orthopedics": ["Orthopedic Surgeon", "Sports Medicine"],
+    "General Medicine": ["General Practitioner", "Internist"],
+    "Oncology": ["Oncologist", "Radiation Oncologist"],
+    "Pulmonology": ["Pulmonologist"],
+}
+SHIFTS = ["morning", "afternoon", "night"]
+HISTORY = ["Hypertension", "Type 2 diabetes", "Asthma", "COPD", "Arthritis", "Migraine",
+           "Hypothyroidism", "Coronary artery disease", "Allergies", "None"]
+# (condition, priority name, relative frequency)
+CONDITIONS = [
+    ("routine checkup", "low", 30), ("consultation", "low", 15), ("fever", "low", 10), ("headache", "low", 8),
+    ("flu", "low", 8), ("skin issue", "low", 4), ("allergy", "low", 4),
+    ("infection", "medium", 6), ("high blood pressure", "medium", 5), ("asthma", "medium", 3),
+    ("fracture", "medium", 2), ("severe pain", "medium", 2),
+    ("chest pain", "high", 1.5), ("difficulty breathing", "high", 1), ("bleeding", "high", 0.5),
+]
+SYMPTOMS = {
+    "critical": ["crushing chest pain radiating to left arm", "unresponsive, shallow breathing",
+                 "severe bleeding from head wound", "sudden facial droop and slurred speech"],
+    "high": ["chest pain and shortness of breath", "high fever with confusion", "severe abdominal pain",
+             "difficulty breathing, wheezing"],
+    "medium": ["persistent cough and fever", "suspected wrist fracture", "moderate abdominal pain",
+               "dizziness and nausea"],
+    "low": ["mild headache", "sore throat", "minor cut on hand", "rash on forearm", "runny nose and sneezing"],
+}
+ALERT_TYPES = [("info", 70), ("warning", 25), ("emergency", 5)]
+ALERT_TEXT = {
+    "info": [("Shift update", "Your shift roster has been updated"),
+             ("New appointment", "A new appointment has been scheduled"),
+             ("Lab results ready", "Lab results are available for review")],
+    "warning": [("Vitals trending down", "Patient vitals have deteriorated since last reading"),
+                ("Medication due", "Scheduled medication has not been recorded")],
+    "emergency": [("Critical triage", "A critical patient is waiting in triage"),
+                  ("Code blue", "Cardiac arrest reported, respond immediately")],
+}
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.today = date.today() if args.today is None else date.fromisoformat(args.today)
+        self.start = datetime.combine(self.today - timedelta(days=int(365 * args.years)), datetime.min.time())
+        self.end = datetime.combine(self.today, datetime.min.time())
+        self.counts = {}
+
+    def uid(self) -> str:
+        return str(uuid.UUID(int=self.rnd.getrandbits(128), version=4))
+
+    def name(self) -> str:
+        return f"{self.rnd.choice(FIRST_NAMES)} {self.rnd.choice(LAST_NAMES)}"
+
+    def moment(self, start: datetime = None, end: datetime = None) -> datetime:
+        start, end = start or self.start, end or self.end
+        return start + timedelta(seconds=self.rnd.randrange(max(1, int((end - start).total_seconds()))))
+
+    # -- helpers --------------------------------------------------------
+
+    def insert(self, conn, table, rows):
+        if rows:
+            conn.execute(table.insert(), rows)
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def batched(self, conn, table, generator):
+        batch = []
+        for row in generator:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                self.insert(conn, table, batch)
+                batch = []
+        self.insert(conn, table, batch)
+
+    def user(self, role: str, index: int, password_hash: str) -> dict:
+        username = f"{'admin' if role == 'administrator' else role}_{index}"
+        return {
+            "id": self.uid(), "username": username, "email": f"{username}@vitalshub.example",
+            "name": self.name(), "phone": f"+1{self.rnd.randrange(2000000000, 9999999999)}",
+            "hashed_password": password_hash, "role": role, "is_active": self.rnd.random() > 0.01,
+            "created_at": self.moment(),
+        }
+
+    # -- tables ---------------------------------------------------------
+
+    def staff(self, conn, password_hash: str):
+        from database import User, Doctor, Nurse
+
+        users, doctors, nurses = [], [], []
+        self.doctor_user_ids, self.nurse_user_ids, self.staff_user_ids = [], [], []
+        for index in range(self.args.admins):
+            users.append(self.user("administrator", index, password_hash))
+            users[-1]["is_active"] = True
+            self.staff_user_ids.append(users[-1]["id"])
+        for index in range(self.args.doctors):
+            user = self.user("doctor", index, password_hash)
+            department = self.rnd.choice(list(DEPARTMENTS))
+            users.append(user)
+            doctors.append({
+                "id": self.uid(), "user_id": user["id"], "department": department,
+                "specialization": self.rnd.choice(DEPARTMENTS[department]),
+                "license_number": f"MD-{index:07d}", "years_of_experience": self.rnd.randint(1, 35),
+                "is_available": self.rnd.random() > 0.1, "created_at": user["created_at"],
+            })
+            self.doctor_user_ids.append(user["id"])
+        for index in range(self.args.nurses):
+            user = self.user("nurse", index, password_hash)
+            users.append(user)
+            nurses.append({
+                "id": self.uid(), "user_id": user["id"], "department": self.rnd.choice(list(DEPARTMENTS)),
+                "shift": self.rnd.choice(SHIFTS), "license_number": f"RN-{index:07d}",
+                "is_available": self.rnd.random() > 0.1, "created_at": user["created_at"],
+            })
+            self.nurse_user_ids.append(user["id"])
+        self.staff_user_ids += self.doctor_user_ids + self.nurse_user_ids
+        self.batched(conn, User.__table__, users)
+        self.batched(conn, Doctor.__table__, doctors)
+        self.batched(conn, Nurse.__table__, nurses)
+
+    def patients(self, conn, password_hash: str):
+        from database import User, Patient
+
+        self.patient_user_ids, self.patient_ids, self.patient_ages = [], [], []
+        for start in range(0, self.args.patients, BATCH_SIZE):
+            users, patients = [], []
+            for index in range(start, min(start + BATCH_SIZE, self.args.patients)):
+                user = self.user("patient", index, password_hash)
+                # Skewed towards adults, with a long elderly tail
+                age = min(100, max(0, int(self.rnd.gammavariate(4.0, 11.0))))
+                history = sorted(set(self.rnd.choices(HISTORY, k=self.rnd.randint(0, 3)))) or ["None"]
+                patient = {
+                    "id": self.uid(), "user_id": user["id"], "age": age,
+                    "gender": self.rnd.choice(["Male", "Female"]) if self.rnd.random() > 0.02 else "Other",
+                    "medical_history": ", ".join(history),
+                    "contact_number": f"+1{self.rnd.randrange(2000000000, 9999999999)}",
+                    "registration_date": user["created_at"],
+                }
+                users.append(user)
+                patients.append(patient)
+                self.patient_user_ids.append(user["id"])
+                self.patient_ids.append(patient["id"])
+                self.patient_ages.append(age)
+            self.insert(conn, User.__table__, users)
+            self.insert(conn, Patient.__table__, patients)
+
+    def appointments(self, conn, priority_ids: dict):
+        from database import Appointment
+
+        conditions = [condition for condition, _, _ in CONDITIONS]
+        weights = [weight for _, _, weight in CONDITIONS]
+        priority_of = {condition: priority for condition, priority, _ in CONDITIONS}
+        horizon = self.end + timedelta(days=30)
+        total = int(self.args.patients * self.args.years * self.args.appointments_per_year)
+
+        def rows():
+            for _ in range(total):
+                patient = self.rnd.randrange(len(self.patient_user_ids))
+                when = self.moment(self.start, horizon)
+                created = when - timedelta(days=self.rnd.randint(0, 30), minutes=self.rnd.randint(0, 600))
+                condition = self.rnd.choices(conditions, weights)[0]
+                if when >= self.end:
+                    status = "pending"
+                else:
+                    status = self.rnd.choices(["completed", "cancelled", "pending"], [85, 10, 5])[0]
+                yield {
+                    "id": self.uid(),
+                    "patient_id": self.patient_user_ids[patient],
+                    "doctor_id": self.rnd.choice(self.doctor_user_ids),
+                    "priority_id": priority_ids.get(priority_of[condition]),
+                    "date": when.strftime("%Y-%m-%d"),
+                    "time": f"{self.rnd.randint(8, 17):02d}:{self.rnd.choice(['00', '15', '30', '45'])}",
+                    "appointment_type": self.rnd.choices(["consultation", "follow-up", "procedure"], [60, 30, 10])[0],
+                    "condition": condition,
+                    "status": status,
+                    "notes": None,
+                    "doctor_remarks": "Reviewed, follow up as needed" if status == "completed" else None,
+                    "created_at": created,
+                    "updated_at": when if status != "pending" else None,
+                }
+
+        self.batched(conn, Appointment.__table__, rows())
+
+    def vitals(self, age: int, priority: str) -> dict:
+        gauss = self.rnd.gauss
+        severity = {"low": 0.0, "medium": 1.0, "high": 2.0, "critical": 3.2}[priority]
+        systolic = gauss(112 + 0.5 * age, 14) + severity * gauss(6, 6)
+        diastolic = gauss(72 + 0.15 * age, 9) + severity * gauss(2, 3)
+        return {
+            "blood_pressure": f"{int(systolic)}/{int(min(diastolic, systolic - 20))}",
+            "heart_rate": int(min(200, max(35, gauss(76, 11) + severity * gauss(12, 6)))),
+            "temperature": round(min(42.0, max(34.5, gauss(36.8, 0.35) + severity * abs(gauss(0.3, 0.4)))), 1),
+            "oxygen_saturation": int(min(100, max(70, gauss(98, 1.2) - severity * abs(gauss(2.0, 1.5))))),
+            "respiratory_rate": int(min(45, max(8, gauss(15, 2) + severity * gauss(3, 1.5)))),
+        }
+
+    def triage(self, conn):
+        from database import TriageRecord
+
+        priorities = ["low", "medium", "high", "critical"]
+        total = int(self.args.patients * self.args.years * self.args.triage_per_year)
+        recent = self.end - timedelta(hours=12)
+
+        def rows():
+            for _ in range(total):
+                patient = self.rnd.randrange(len(self.patient_ids))
+                priority = self.rnd.choices(priorities, [55, 28, 13, 4])[0]
+                when = self.moment()
+                if when >= recent:
+                    status = self.rnd.choice(["pending", "in-progress"])
+                else:
+                    status = "completed"
+                yield {
+                    "id": self.uid(),
+                    "patient_id": self.patient_ids[patient],
+                    "nurse_id": self.rnd.choice(self.nurse_user_ids),
+                    "symptoms": self.rnd.choice(SYMPTOMS[priority]),
+                    "priority": priority,
+                    "status": status,
+                    "timestamp": when,
+                    **self.vitals(self.patient_ages[patient], priority),
+                }
+
+        self.batched(conn, TriageRecord.__table__, rows())
+
+    def alerts(self, conn):
+        from database import Alert
+
+        types = [alert_type for alert_type, _ in ALERT_TYPES]
+        weights = [weight for _, weight in ALERT_TYPES]
+        recipients = self.staff_user_ids + self.patient_user_ids[:len(self.staff_user_ids) * 4]
+        total = int(len(self.staff_user_ids) * self.args.years * self.args.alerts_per_staff_year)
+        recent = self.end - timedelta(days=2)
+
+        def rows():
+            for _ in range(total):
+                alert_type = self.rnd.choices(types, weights)[0]
+                title, message = self.rnd.choice(ALERT_TEXT[alert_type])
+                when = self.moment()
+                yield {
+                    "id": self.uid(), "alert_type": alert_type, "title": title, "message": message,
+                    "timestamp": when, "is_read": when < recent or self.rnd.random() < 0.3,
+                    "user_id": self.rnd.choice(recipients), "occurrence_count": 1,
+                }
+
+        self.batched(conn, Alert.__table__, rows())
+
+
+def _secondary_indexes():
+    from database import Base
+
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Vitals Hub database")
+    parser.add_argument("--output", required=True, help="SQLite file to create")
+    parser.add_argument("--force", action="store_true", help="Overwrite --output if it exists")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=None, help="Default: one per 400 patients")
+    parser.add_argument("--nurses", type=int, default=None, help="Default: one per 250 patients")
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--years", type=float, default=3.0, help="Span of history to generate")
+    parser.add_argument("--appointments-per-year", type=float, default=3.0, help="Per patient")
+    parser.add_argument("--triage-per-year", type=float, default=2.0, help="Per patient")
+    parser.add_argument("--alerts-per-staff-year", type=float, default=100.0)
+    parser.add_argument("--password", default="bench", help="Password of every generated account")
+    parser.add_argument("--today", default=None, help="Anchor date (YYYY-MM-DD) for fully reproducible output")
+    args = parser.parse_args(argv)
+    args.doctors = args.doctors or max(2, math.ceil(args.patients / 400))
+    args.nurses = args.nurses or max(2, math.ceil(args.patients / 250))
+
+    path = os.path.abspath(args.output)
+    if os.path.exists(path):
+        if not args.force:
+            raise SystemExit(f"{path} exists (use --force to overwrite)")
+        os.remove(path)
+    # Must be set before the app's database module is imported
+    os.environ["VITALS_DATABASE_URL"] = f"sqlite:///{path}"
+
+    import database
+    import crud
+    import search
+    import rollups
+    import patient_summaries
+    from auth import get_password_hash
+    from database import Priority
+
+    started = time.perf_counter()
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as conn:
+        for index in _secondary_indexes():
+            index.drop(conn)
+
+    db = database.SessionLocal()
+    crud.init_priorities(db)
+    priority_ids = {priority.name: priority.id for priority in db.query(Priority)}
+    db.close()
+
+    generator = Generator(args)
+    password_hash = get_password_hash(args.password)
+    with database.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = OFF")
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        conn.exec_driver_sql("PRAGMA cache_size = -262144")
+        for step, label in (
+            (lambda: generator.staff(conn, password_hash), "staff"),
+            (lambda: generator.patients(conn, password_hash), "patients"),
+            (lambda: generator.appointments(conn, priority_ids), "appointments"),
+            (lambda: generator.triage(conn), "triage records"),
+            (lambda: generator.alerts(conn), "alerts"),
+        ):
+            step_started = time.perf_counter()
+            step()
+            conn.commit()
+            print(f"  {label:<15} {time.perf_counter() - step_started:7.1f}s")
+        conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+
+    step_started = time.perf_counter()
+    with database.engine.begin() as conn:
+        for index in _secondary_indexes():
+            index.create(conn)
+    database.create_tables()
+    search.init_search_index()
+    rollups.init_rollups()
+    # Without statistics the backfill's correlated subqueries can pick the status index
+    # and scan every completed appointment once per patient
+    with database.engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    db = database.SessionLocal()
+    patient_summaries.backfill(db)
+    db.close()
+    with database.engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print(f"  {'indexes':<15} {time.perf_counter() - step_started:7.1f}s")
+
+    total = sum(generator.counts.values())
+    print(", ".join(f"{table}: {count:,}" for table, count in generator.counts.items()))
+    print(f"Generated {total:,} rows into {path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,40 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 import crud
 import schemas
-from database import get_db, create_tables, User
+import wait_times
+import reminders
+import escalation
+import search
+from people_index import people
+import duplicates
+import appointment_search
+import staff_directory
+import export
+import rollups
+import cohorts
+import patient_summaries
+import timeline
+import database
+import metrics
+import query_budget
+import tracing
+import profiling
+import memory
+from pagination import InvalidCursor
+from database import get_db, create_tables, SessionLocal, User
 from auth import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Create FastAPI app
 app = FastAPI(title="Vitals First Hub API", version="1.0.0")
+app.router.route_class = tracing.TracedRoute
 
 # Add CORS middleware
 app.add_middleware(
@@ -22,6 +45,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, status and DB query metrics, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(database.engine)
+
+# Statement budgets and N+1 detection (QUERY_BUDGET_MODE=log|raise|off)
+app.add_middleware(query_budget.QueryBudgetMiddleware)
+
+# On-demand CPU profiling of the next N requests or of X-Profile requests from administrators
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Sampled request traces (TRACE_SAMPLE_RATE); added last so it wraps every other middleware
+app.add_middleware(tracing.TracingMiddleware)
+
 # Security
 security = HTTPBearer()
 
@@ -29,10 +65,23 @@ security = HTTPBearer()
 @app.on_event("startup")
 async def startup_event():
     create_tables()
+    search.init_search_index()
+    rollups.init_rollups()
     # Initialize database with default data
     db = next(get_db())
     crud.init_priorities(db)
+    patient_summaries.backfill(db)
+    wait_times.warm_start(db)
+    people.load(db)
+    duplicates.index.load(db)
     db.close()
+    reminders.scheduler.start(SessionLocal)
+    escalation.escalator.start(SessionLocal)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    reminders.scheduler.stop()
+    escalation.escalator.stop()
 
 # Dependency to get current user
 async def get_current_user(
@@ -45,11 +94,13 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    username = verify_token(credentials.credentials)
+    with tracing.span("auth.verify_token"):
+        username = verify_token(credentials.credentials)
     if username is None:
         raise credentials_exception
     
-    user = crud.get_user_by_username(db, username=username)
+    with tracing.span("auth.load_user"):
+        user = crud.get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
     
@@ -60,6 +111,10 @@ async def get_current_user(
 async def root():
     return {"message": "Vitals First Hub API"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Authentication endpoints
 @app.post("/auth/login", response_model=schemas.Token)
 async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
@@ -111,7 +166,12 @@ async def register_patient(patient_data: schemas.PatientRegistration, db: Sessio
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    candidates = crud.find_duplicate_patients(
+        patient_data.name, patient_data.contact_number, patient_data.age
+    )
     created_user = crud.register_patient(db=db, patient_data=patient_data)
+    if candidates:
+        crud.flag_duplicate_registration(db, created_user, candidates)
     return created_user
 
 @app.get("/auth/me", response_model=schemas.User)
@@ -289,6 +349,120 @@ async def toggle_nurse_status(
     else:
         raise HTTPException(status_code=500, detail="Failed to toggle nurse status")
 
+# Admin endpoints for duplicate patients
+@app.get("/admin/patients/duplicates", response_model=List[schemas.DuplicateCandidate])
+async def find_duplicate_patients(
+    name: str,
+    contact_number: str = None,
+    age: int = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can search for duplicates")
+    
+    return crud.find_duplicate_patients(name, contact_number, age, limit=limit)
+
+@app.get("/admin/patients/{patient_id}/duplicates", response_model=List[schemas.DuplicateCandidate])
+async def get_patient_duplicates(
+    patient_id: str,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can search for duplicates")
+    
+    patient = crud.get_patient_with_user(db, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    return crud.find_duplicate_patients(
+        patient.user.name, patient.contact_number, patient.age,
+        exclude_patient_id=patient.id, limit=limit
+    )
+
+@app.post("/admin/patients/merge", response_model=schemas.PatientMergeResult)
+async def merge_patients(
+    merge: schemas.PatientMerge,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can merge patients")
+    
+    if merge.primary_patient_id == merge.duplicate_patient_id:
+        raise HTTPException(status_code=400, detail="Cannot merge a patient into itself")
+    
+    result = crud.merge_patients(db, merge.primary_patient_id, merge.duplicate_patient_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return result
+
+# Admin staff directory (doctors and nurses)
+@app.get("/admin/staff/", response_model=schemas.StaffDirectoryPage)
+async def get_staff_directory(
+    kind: str = None,
+    department: str = None,
+    shift: str = None,
+    specialization: str = None,
+    is_active: bool = None,
+    sort: str = "name",
+    cursor: str = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view staff")
+    
+    if kind and kind not in staff_directory.STAFF_KINDS:
+        raise HTTPException(status_code=400, detail="kind must be 'doctor' or 'nurse'")
+    if sort.lstrip("-") not in staff_directory.SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(staff_directory.SORT_FIELDS)}")
+    
+    filters = {
+        "department": department,
+        "shift": shift,
+        "specialization": specialization,
+        "is_active": is_active,
+    }
+    try:
+        return staff_directory.list_staff(db, filters, kind=kind, sort=sort, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Admin exports
+@app.get("/admin/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = "csv",
+    date_from: str = None,
+    date_to: str = None,
+    status: str = None,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can export data")
+    
+    if dataset not in export.DATASETS:
+        raise HTTPException(status_code=404, detail="Unknown dataset")
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    for day in (date_from, date_to):
+        if day:
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    filename = f"{dataset}.{format}"
+    return StreamingResponse(
+        export.stream_export(dataset, format, date_from=date_from, date_to=date_to, status=status),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # Admin endpoints for User management
 @app.get("/admin/users/", response_model=List[schemas.User])
 async def get_users(
@@ -350,14 +524,32 @@ async def toggle_user_status(
 
 # Get available doctors (for appointment booking)
 @app.get("/doctors/available", response_model=List[schemas.Doctor])
+@query_budget.limit(3)
 async def get_available_doctors(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     return crud.get_doctors_with_users(db)
 
+# Typeahead lookup for patient/staff pickers
+@app.get("/lookup/people", response_model=List[schemas.PersonLookup])
+async def lookup_people(
+    q: str,
+    role: str = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role == "patient":
+        # Patients only need to pick doctors when booking
+        if role not in (None, "doctor"):
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        role = "doctor"
+    
+    return people.search(q, roles=[role] if role else None, limit=limit)
+
 # Patient endpoints
 @app.get("/patients/", response_model=List[schemas.PatientDetails])
+@query_budget.limit(4)
 async def read_patients(
     skip: int = 0, 
     limit: int = 100, 
@@ -378,12 +570,14 @@ async def read_patients(
             "medical_history": patient.medical_history,
             "contact_number": patient.contact_number,
             "registration_date": patient.registration_date,
-            "user": patient.user
+            "user": patient.user,
+            "summary": patient.summary
         }
         result.append(patient_dict)
     return result
 
 @app.get("/patients/{patient_id}", response_model=schemas.PatientDetails)
+@query_budget.limit(6)
 async def read_patient(
     patient_id: str, 
     db: Session = Depends(get_db),
@@ -407,9 +601,37 @@ async def read_patient(
         "medical_history": db_patient.medical_history,
         "contact_number": db_patient.contact_number,
         "registration_date": db_patient.registration_date,
-        "user": db_patient.user
+        "user": db_patient.user,
+        "summary": crud.get_patient_summary(db, db_patient.id)
     }
 
+@app.get("/patients/{patient_id}/timeline", response_model=schemas.TimelinePage)
+@query_budget.limit(6)
+async def read_patient_timeline(
+    patient_id: str,
+    cursor: str = None,
+    limit: int = 50,
+    order: str = "desc",
+    kind: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    patient = crud.get_patient(db, patient_id=patient_id)
+    if patient is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if current_user.role not in ["nurse", "doctor", "administrator"] and patient.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if order not in timeline.ORDERS:
+        raise HTTPException(status_code=400, detail="order must be 'desc' or 'asc'")
+    kinds = [k.strip() for k in kind.split(",") if k.strip()] if kind else None
+    if kinds and any(k not in timeline.SOURCES for k in kinds):
+        raise HTTPException(status_code=400, detail=f"kind must be drawn from {', '.join(timeline.SOURCES)}")
+    
+    try:
+        return timeline.patient_timeline(db, patient, cursor=cursor, limit=limit, order=order, kinds=kinds)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.put("/patients/{patient_id}", response_model=schemas.Patient)
 async def update_patient(
     patient_id: str,
@@ -429,6 +651,7 @@ async def update_patient(
 
 # Appointment endpoints
 @app.post("/appointments/book", response_model=schemas.Appointment)
+@query_budget.limit(10)
 async def book_appointment(
     appointment_data: schemas.AppointmentBooking,
     db: Session = Depends(get_db),
@@ -437,17 +660,9 @@ async def book_appointment(
     if current_user.role != "patient":
         raise HTTPException(status_code=403, detail="Only patients can book appointments")
     
-    # Initialize priorities if not already done
-    crud.init_priorities(db)
-    
+    # Priorities are created at startup (crud.init_priorities)
     created_appointment = crud.book_appointment(db, appointment_data, current_user.id)
-    
-    # Add patient and doctor names
-    patient = crud.get_user(db, created_appointment.patient_id)
-    doctor = crud.get_user(db, created_appointment.doctor_id)
-    created_appointment.patient_name = patient.name if patient else "Unknown"
-    created_appointment.doctor_name = doctor.name if doctor else "Unknown"
-    
+    crud.attach_appointment_names(db, [created_appointment])
     return created_appointment
 
 @app.put("/appointments/{appointment_id}/consult")
@@ -485,7 +700,63 @@ async def get_doctors(
 ):
     return crud.get_users_by_role(db, "doctor")
 
+@app.get("/appointments/search", response_model=schemas.AppointmentSearchPage)
+@query_budget.limit(8)
+async def search_appointments(
+    status: str = None,
+    priority: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    doctor_id: str = None,
+    patient_id: str = None,
+    appointment_type: str = None,
+    sort: str = "date",
+    cursor: str = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if sort not in appointment_search.SORT_DIRECTIONS:
+        raise HTTPException(status_code=400, detail="sort must be 'date' or '-date'")
+    for day in (date_from, date_to):
+        if day:
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    # Patients and doctors are confined to their own appointments
+    if current_user.role == "patient":
+        patient_id = current_user.id
+    elif current_user.role == "doctor":
+        doctor_id = current_user.id
+    
+    priority_id = None
+    if priority:
+        db_priority = crud.get_priority_by_name(db, priority)
+        if not db_priority:
+            raise HTTPException(status_code=400, detail="Unknown priority")
+        priority_id = db_priority.id
+    
+    filters = {
+        "status": status,
+        "priority_id": priority_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "appointment_type": appointment_type,
+    }
+    try:
+        page = appointment_search.search_appointments(db, filters, sort=sort, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    crud.attach_appointment_names(db, page["items"])
+    return page
+
 @app.get("/appointments/", response_model=List[schemas.Appointment])
+@query_budget.limit(6)
 async def read_appointments(
     skip: int = 0,
     limit: int = 100,
@@ -499,13 +770,8 @@ async def read_appointments(
     else:
         appointments = crud.get_appointments(db, skip=skip, limit=limit)
     
-    # Add patient and doctor names
-    for appointment in appointments:
-        patient = crud.get_user(db, appointment.patient_id)
-        doctor = crud.get_user(db, appointment.doctor_id)
-        appointment.patient_name = patient.name if patient else "Unknown"
-        appointment.doctor_name = doctor.name if doctor else "Unknown"
-    
+    crud.attach_appointment_names(db, appointments)
+    crud.attach_appointment_wait_estimates(db, appointments)
     return appointments
 
 @app.post("/appointments/", response_model=schemas.Appointment)
@@ -519,13 +785,7 @@ async def create_appointment(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     created_appointment = crud.create_appointment(db=db, appointment=appointment)
-    
-    # Add patient and doctor names
-    patient = crud.get_user(db, created_appointment.patient_id)
-    doctor = crud.get_user(db, created_appointment.doctor_id)
-    created_appointment.patient_name = patient.name if patient else "Unknown"
-    created_appointment.doctor_name = doctor.name if doctor else "Unknown"
-    
+    crud.attach_appointment_names(db, [created_appointment])
     return created_appointment
 
 @app.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
@@ -569,6 +829,7 @@ async def delete_appointment(
 
 # Triage endpoints
 @app.get("/triage/", response_model=List[schemas.TriageRecord])
+@query_budget.limit(5)
 async def read_triage_records(
     skip: int = 0,
     limit: int = 100,
@@ -587,16 +848,12 @@ async def read_triage_records(
     else:
         triage_records = crud.get_triage_records(db, skip=skip, limit=limit)
     
-    # Add patient and nurse names
-    for record in triage_records:
-        patient = crud.get_patient(db, record.patient_id)
-        nurse = crud.get_user(db, record.nurse_id)
-        record.patient_name = patient.user.name if patient and patient.user else "Unknown"
-        record.nurse_name = nurse.name if nurse else "Unknown"
-    
+    crud.attach_triage_names(db, triage_records)
+    crud.attach_triage_wait_estimates(triage_records)
     return triage_records
 
 @app.post("/triage/", response_model=schemas.TriageRecord)
+@query_budget.limit(9)
 async def create_triage_record(
     triage: schemas.TriageRecordCreate,
     db: Session = Depends(get_db),
@@ -610,13 +867,7 @@ async def create_triage_record(
         triage.nurse_id = current_user.id
     
     created_triage = crud.create_triage_record(db=db, triage=triage)
-    
-    # Add patient and nurse names
-    patient = crud.get_patient(db, created_triage.patient_id)
-    nurse = crud.get_user(db, created_triage.nurse_id)
-    created_triage.patient_name = patient.user.name if patient and patient.user else "Unknown"
-    created_triage.nurse_name = nurse.name if nurse else "Unknown"
-    
+    crud.attach_triage_names(db, [created_triage])
     return created_triage
 
 @app.put("/triage/{triage_id}")
@@ -663,6 +914,26 @@ async def create_alert(
     created_alert = crud.create_alert(db=db, alert=alert)
     return created_alert
 
+@app.get("/alerts/unread-count")
+@query_budget.limit(3)
+async def get_unread_alert_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return {"unread_count": crud.get_unread_alert_count(db, current_user.id)}
+
+@app.put("/alerts/read")
+async def mark_alerts_read(
+    bulk: schemas.AlertBulkRead,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if bulk.alert_ids is None and bulk.before is None:
+        raise HTTPException(status_code=400, detail="Provide alert_ids and/or before")
+    
+    marked = crud.mark_alerts_read(db, current_user.id, alert_ids=bulk.alert_ids, before=bulk.before)
+    return {"message": f"{len(marked)} alerts marked as read", "marked": len(marked)}
+
 @app.put("/alerts/{alert_id}/read")
 async def mark_alert_read(
     alert_id: str,
@@ -676,8 +947,261 @@ async def mark_alert_read(
     crud.mark_alert_read(db, alert_id)
     return {"message": "Alert marked as read"}
 
+# Search endpoints
+@app.get("/search", response_model=schemas.SearchResults)
+async def search_records(
+    q: str,
+    kind: str = None,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if kind and kind not in search.SEARCH_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(search.SEARCH_KINDS)}")
+    
+    results = search.search(db, q, current_user, kinds=[kind] if kind else None, limit=limit)
+    return {"query": q, **results}
+
+# Analytics endpoints (served from rollup tables)
+def _check_analytics_params(current_user: User, interval: str, intervals: tuple, date_from: str, date_to: str):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view analytics")
+    if interval not in intervals:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(intervals)}")
+    for day in (date_from, date_to):
+        if day:
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+
+@app.get("/analytics/appointments", response_model=List[schemas.RollupBucket], response_model_exclude_none=True)
+async def analytics_appointments(
+    date_from: str = None,
+    date_to: str = None,
+    interval: str = "day",
+    doctor_id: str = None,
+    status: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _check_analytics_params(current_user, interval, ("day", "month"), date_from, date_to)
+    return rollups.appointments_by_day(db, date_from, date_to, interval, doctor_id=doctor_id, status=status)
+
+@app.get("/analytics/triage", response_model=List[schemas.RollupBucket], response_model_exclude_none=True)
+async def analytics_triage(
+    date_from: str = None,
+    date_to: str = None,
+    interval: str = "hour",
+    priority: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _check_analytics_params(current_user, interval, ("hour", "day", "month"), date_from, date_to)
+    return rollups.triage_by_hour(db, date_from, date_to, interval, priority=priority)
+
+@app.get("/analytics/alerts", response_model=List[schemas.RollupBucket], response_model_exclude_none=True)
+async def analytics_alerts(
+    date_from: str = None,
+    date_to: str = None,
+    interval: str = "day",
+    alert_type: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _check_analytics_params(current_user, interval, ("day", "month"), date_from, date_to)
+    return rollups.alerts_by_day(db, date_from, date_to, interval, alert_type=alert_type)
+
+# Cohort analytics (admin only)
+def _parse_list(value: str) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+def _cohort_group_by(group_by: str) -> tuple:
+    fields = tuple(_parse_list(group_by))
+    if any(field not in cohorts.GROUP_FIELDS for field in fields) or len(set(fields)) != len(fields):
+        raise HTTPException(status_code=400, detail=f"group_by must be drawn from {', '.join(cohorts.GROUP_FIELDS)}")
+    return fields
+
+@app.get("/admin/cohorts/summary")
+async def cohort_summary(current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view cohort analytics")
+    await run_in_threadpool(cohorts.store.ensure_fresh, database.engine)
+    return cohorts.store.summary()
+
+@app.get("/admin/cohorts/vitals")
+async def cohort_vitals(
+    vital: str = "heart_rate",
+    group_by: str = "age_band,gender",
+    percentiles: str = "5,25,50,75,95",
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view cohort analytics")
+    if vital not in cohorts.VITALS:
+        raise HTTPException(status_code=400, detail=f"vital must be one of {', '.join(cohorts.VITALS)}")
+    try:
+        points = tuple(float(p) for p in _parse_list(percentiles))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be numbers")
+    if not points or any(p < 0 or p > 100 for p in points):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    
+    await run_in_threadpool(cohorts.store.ensure_fresh, database.engine)
+    return {"vital": vital, "groups": cohorts.store.vitals_distribution(vital, _cohort_group_by(group_by), points)}
+
+@app.get("/admin/cohorts/critical-rates")
+async def cohort_critical_rates(
+    keywords: str,
+    group_by: str = "",
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view cohort analytics")
+    keyword_list = _parse_list(keywords)
+    if not keyword_list:
+        raise HTTPException(status_code=400, detail="At least one keyword is required")
+    
+    await run_in_threadpool(cohorts.store.ensure_fresh, database.engine)
+    return {"rates": cohorts.store.critical_rates(tuple(keyword_list), _cohort_group_by(group_by))}
+
+@app.post("/admin/cohorts/refresh")
+async def refresh_cohorts(full: bool = False, current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can refresh cohort analytics")
+    return await run_in_threadpool(cohorts.store.refresh, database.engine, full=full)
+
+# Tracing endpoints
+@app.get("/admin/traces")
+async def read_slowest_traces(
+    limit: int = 20,
+    route: str = None,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view traces")
+    return tracing.store.slowest(limit=max(1, min(limit, 200)), name=route)
+
+@app.get("/admin/traces/{trace_id}")
+async def read_trace(trace_id: str, current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can view traces")
+    trace = tracing.store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (unsampled or evicted)")
+    return trace
+
+@app.get("/admin/profiling")
+async def read_profiling_state(current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can profile requests")
+    return profiling.profiler.state()
+
+@app.post("/admin/profiling")
+async def arm_profiler(
+    settings: schemas.ProfilingSettings,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can profile requests")
+    if not 1 <= settings.requests <= 1000:
+        raise HTTPException(status_code=400, detail="requests must be between 1 and 1000")
+    profiling.profiler.arm(settings.requests, settings.route)
+    return profiling.profiler.state()
+
+@app.delete("/admin/profiling")
+async def disarm_profiler(current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can profile requests")
+    profiling.profiler.arm(0)
+    return profiling.profiler.state()
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def read_profile(profile_id: str, current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can profile requests")
+    profile = profiling.profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (evicted or never recorded)")
+    return PlainTextResponse(profile.collapsed())
+
+@app.get("/admin/memory")
+async def read_memory_tracing(current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    return memory.tracker.state()
+
+@app.post("/admin/memory")
+async def start_memory_tracing(
+    settings: schemas.MemoryTracingSettings,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    frames = settings.frames or memory.MEMORY_TRACE_FRAMES
+    if not 1 <= frames <= 100:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 100")
+    if (settings.minutes or 0) < 0 or (settings.interval_minutes or 0) < 0:
+        raise HTTPException(status_code=400, detail="minutes and interval_minutes must be positive")
+    await run_in_threadpool(memory.tracker.start, frames, settings.minutes, settings.interval_minutes)
+    return memory.tracker.state()
+
+@app.delete("/admin/memory")
+async def stop_memory_tracing(current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    memory.tracker.stop()
+    return memory.tracker.state()
+
+@app.post("/admin/memory/snapshots")
+async def take_memory_snapshot(label: str = None, current_user: User = Depends(get_current_user)):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    snapshot = await run_in_threadpool(memory.tracker.take_snapshot, label)
+    if snapshot is None:
+        raise HTTPException(status_code=400, detail="Memory tracing is not running")
+    return snapshot.summary()
+
+@app.get("/admin/memory/snapshots/{snapshot_id}")
+async def read_memory_snapshot(
+    snapshot_id: int,
+    group_by: str = "module",
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    if group_by not in memory.GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(memory.GROUPINGS)}")
+    snapshot = memory.tracker.get(snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return snapshot.report(group_by, max(1, min(limit, 200)))
+
+@app.get("/admin/memory/diff")
+async def diff_memory_snapshots(
+    from_id: int = None,
+    to_id: int = None,
+    group_by: str = "module",
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    if str(current_user.role) != "administrator":
+        raise HTTPException(status_code=403, detail="Only administrators can trace memory")
+    if group_by not in memory.GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(memory.GROUPINGS)}")
+    snapshots = memory.tracker.snapshots
+    if len(snapshots) < 2 and (from_id is None or to_id is None):
+        raise HTTPException(status_code=400, detail="At least two snapshots are needed for a diff")
+    before = memory.tracker.get(from_id) if from_id is not None else snapshots[0]
+    after = memory.tracker.get(to_id) if to_id is not None else snapshots[-1]
+    if before is None or after is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return after.report(group_by, max(1, min(limit, 200)), since=before)
+
 # Dashboard endpoints
 @app.get("/dashboard/stats")
+@query_budget.limit(6)
 async def get_dashboard_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
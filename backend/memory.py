@@ -0,0 +1,262 @@
+"""
+Runtime memory tracing for long-running workers.
+
+``tracemalloc`` is off by default because it slows every allocation down. An
+administrator switches it on (``POST /admin/memory``), optionally for a fixed
+time and with periodic snapshots, and it switches itself off again when the
+time is up. A snapshot is reduced to totals per allocation site, per module
+and per calling application module as soon as it is taken, so keeping the
+last ``MEMORY_SNAPSHOT_LIMIT`` snapshots costs far less than holding on to
+every live trace. Two snapshots are compared by subtracting
+those totals, which shows what grew between them.
+
+Allocations are grouped two ways:
+
+* ``module`` - the module of the line that allocated: ``crud``, ``main``,
+  ``schemas`` for application code, the top-level package (``sqlalchemy``,
+  ``pydantic``, ``pydantic_core``, ``starlette``...) for libraries;
+* ``caller`` - the innermost application module on the allocating stack, so
+  ORM rows loaded for ``crud.get_appointments`` count towards ``crud`` even
+  though SQLAlchemy allocated them. Stacks with no application frame keep
+  their ``module`` group. The depth searched is ``MEMORY_TRACE_FRAMES``.
+
+Each snapshot also counts live objects per type via the garbage collector,
+which makes identity maps and caches that keep ORM instances alive visible
+directly (``database.Appointment``, ``sqlalchemy.orm.state.InstanceState``...).
+Snapshots walk the whole heap and take a fraction of a second per hundred
+thousand live objects while tracing, so the endpoints run them in the
+threadpool rather than on the event loop.
+"""
+import gc
+import itertools
+import os
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from functools import lru_cache
+
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+MEMORY_SNAPSHOT_LIMIT = int(os.getenv("MEMORY_SNAPSHOT_LIMIT", "24"))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+GROUPINGS = ("module", "caller")
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@lru_cache(maxsize=4096)
+def module_of(filename: str) -> str:
+    """Application module, or top-level library/stdlib package, that ``filename`` belongs to"""
+    if filename.startswith(APP_DIR + os.sep):
+        return os.path.splitext(os.path.relpath(filename, APP_DIR))[0].replace(os.sep, ".")
+    parts = filename.split(os.sep)
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            index = len(parts) - 1 - parts[::-1].index(marker)
+            if index + 1 < len(parts):
+                return os.path.splitext(parts[index + 1])[0]
+    if filename.startswith(STDLIB_DIR + os.sep):
+        return os.path.splitext(os.path.relpath(filename, STDLIB_DIR).split(os.sep)[0])[0]
+    return os.path.basename(filename)
+
+
+def _site(frame) -> str:
+    filename = frame.filename
+    if filename.startswith(APP_DIR + os.sep):
+        filename = os.path.relpath(filename, APP_DIR)
+    return f"{filename}:{frame.lineno}"
+
+
+def _type_name(kind: type) -> str:
+    if kind.__module__ == "builtins":
+        return kind.__qualname__
+    return f"{kind.__module__}.{kind.__qualname__}"
+
+
+def _caller_of(traceback) -> str:
+    for frame in reversed(traceback):
+        if frame.filename.startswith(APP_DIR + os.sep):
+            return module_of(frame.filename)
+    return module_of(traceback[-1].filename)
+
+
+class MemorySnapshot:
+    """Per-site, per-group and per-type totals of one ``tracemalloc`` snapshot"""
+
+    def __init__(self, label: str, snapshot):
+        self.snapshot_id = None
+        self.label = label
+        self.taken_at = time.time()
+        self.traced_current, self.traced_peak = tracemalloc.get_traced_memory()
+        self.sites = Counter()  # "file:line" -> bytes
+        self.site_counts = Counter()
+        self.groups = {grouping: Counter() for grouping in GROUPINGS}
+        self.group_counts = {grouping: Counter() for grouping in GROUPINGS}
+        self.site_modules = {}
+        for stat in snapshot.statistics("traceback"):
+            frame = stat.traceback[-1]
+            site = _site(frame)
+            self.sites[site] += stat.size
+            self.site_counts[site] += stat.count
+            module = self.site_modules[site] = module_of(frame.filename)
+            for grouping, group in (("module", module), ("caller", _caller_of(stat.traceback))):
+                self.groups[grouping][group] += stat.size
+                self.group_counts[grouping][group] += stat.count
+        self.types = Counter()
+        for kind, count in Counter(map(type, gc.get_objects())).items():
+            self.types[_type_name(kind)] += count
+
+    @property
+    def total(self) -> int:
+        return sum(self.sites.values())
+
+    def summary(self) -> dict:
+        return {
+            "snapshot_id": self.snapshot_id,
+            "label": self.label,
+            "taken_at": self.taken_at,
+            "traced_kib": _kib(self.traced_current),
+            "peak_kib": _kib(self.traced_peak),
+        }
+
+    def report(self, group_by: str = "module", limit: int = 20, since: "MemorySnapshot" = None) -> dict:
+        """Top groups, allocation sites and object types; ranked by growth when ``since`` is given"""
+        report = {"snapshot": self.summary(), "group_by": group_by}
+        if since is not None:
+            report["since"] = since.summary()
+            report["seconds"] = round(self.taken_at - since.taken_at, 1)
+            report["size_diff_kib"] = _kib(self.total - since.total)
+        report["groups"] = _rows("group", self.groups[group_by], self.group_counts[group_by],
+                                 since and since.groups[group_by], since and since.group_counts[group_by], limit)
+        report["sites"] = _rows("site", self.sites, self.site_counts,
+                                since and since.sites, since and since.site_counts, limit)
+        for row in report["sites"]:
+            row["module"] = self.site_modules.get(row["site"]) or since.site_modules.get(row["site"])
+        report["types"] = _rows("type", None, self.types, None, since and since.types, limit)
+        return report
+
+
+def _kib(size: int) -> float:
+    return round(size / 1024, 1)
+
+
+def _rows(key: str, sizes, counts, old_sizes, old_counts, limit: int) -> list:
+    """Largest entries, or the largest changes when the older totals are given"""
+    ranking, old_ranking = (sizes, old_sizes) if sizes is not None else (counts, old_counts)
+    if old_ranking is None:
+        names = [name for name, _ in ranking.most_common(limit)]
+    else:
+        growth = Counter(ranking)
+        growth.subtract(old_ranking)
+        names = [name for name, change in sorted(growth.items(), key=lambda item: item[1], reverse=True)
+                 if change][:limit]
+    rows = []
+    for name in names:
+        row = {key: name}
+        if sizes is not None:
+            row["size_kib"] = _kib(sizes[name])
+        row["count"] = counts[name]
+        if old_counts is not None:
+            if sizes is not None:
+                row["size_diff_kib"] = _kib(sizes[name] - old_sizes[name])
+            row["count_diff"] = counts[name] - old_counts[name]
+        rows.append(row)
+    return rows
+
+
+class MemoryTracker:
+    def __init__(self, limit: int = MEMORY_SNAPSHOT_LIMIT):
+        self.snapshots = deque(maxlen=limit)
+        self.frames = None
+        self.started_at = None
+        self.stops_at = None
+        self.interval = None
+        self._ids = itertools.count(1)
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = MEMORY_TRACE_FRAMES, minutes: float = None, interval_minutes: float = None):
+        """Start tracing (restarting with new settings if already on) and take a baseline snapshot"""
+        self.stop()
+        with self._lock:
+            tracemalloc.start(frames)
+            self.frames = frames
+            self.started_at = time.time()
+            self.stops_at = self.started_at + minutes * 60 if minutes else None
+            self.interval = interval_minutes * 60 if interval_minutes else None
+            if self.stops_at or self.interval:
+                self._wake.clear()
+                self._thread = threading.Thread(target=self._run, name="memory-tracker", daemon=True)
+                self._thread.start()
+        return self.take_snapshot("baseline")
+
+    def stop(self):
+        """Stop tracing; snapshots taken so far are kept"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._wake.set()
+            self.stops_at = None
+            tracemalloc.stop()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def take_snapshot(self, label: str = None):
+        """Record a snapshot, or return None when tracing is off"""
+        if not self.tracing:
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        summary = MemorySnapshot(label, snapshot)
+        with self._lock:
+            summary.snapshot_id = next(self._ids)
+            self.snapshots.append(summary)
+        return summary
+
+    def get(self, snapshot_id: int):
+        with self._lock:
+            return next((s for s in self.snapshots if s.snapshot_id == snapshot_id), None)
+
+    def state(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            return {
+                "tracing": self.tracing,
+                "frames": self.frames,
+                "started_at": self.started_at,
+                "stops_at": self.stops_at,
+                "interval_minutes": self.interval / 60 if self.interval else None,
+                "traced_kib": _kib(traced),
+                "peak_kib": _kib(peak),
+                "snapshots": [s.summary() for s in self.snapshots],
+            }
+
+    def _run(self):
+        next_snapshot = time.time() + self.interval if self.interval else None
+        while True:
+            deadlines = [t for t in (self.stops_at, next_snapshot) if t]
+            if self._wake.wait(max(0, min(deadlines, default=0) - time.time())):
+                return
+            now = time.time()
+            if self.stops_at and now >= self.stops_at:
+                self.take_snapshot("final")
+                self.stop()
+                return
+            if next_snapshot and now >= next_snapshot:
+                self.take_snapshot("interval")
+                next_snapshot = now + self.interval
+
+
+tracker = MemoryTracker()
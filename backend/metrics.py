@@ -0,0 +1,228 @@
+"""
+Request and database metrics in Prometheus text format (``GET /metrics``).
+
+``MetricsMiddleware`` is a plain ASGI middleware: it times every HTTP request
+until its last body chunk is sent (so streamed exports are measured in full),
+tracks requests in flight, and labels everything with the matched route
+template (``/patients/{patient_id}``) rather than the raw path, which keeps
+label cardinality bounded. Unmatched paths share the ``<unmatched>`` label.
+
+``instrument_engine`` hooks SQLAlchemy cursor events to count statements and
+DB time. Each request carries a ``RequestStats`` in a context variable, which
+FastAPI copies into the threadpool running sync dependencies, so queries are
+attributed to the route that issued them; queries from the reminder and
+escalation threads are reported under ``<background>``.
+
+Histograms use fixed buckets (``METRICS_LATENCY_BUCKETS_MS``); everything is
+kept in process memory, so with several workers each exposes its own series.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = tuple(
+    float(ms) / 1000 for ms in os.getenv(
+        "METRICS_LATENCY_BUCKETS_MS", "5,10,25,50,100,250,500,1000,2500,5000,10000").split(",")
+)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+UNMATCHED = "<unmatched>"
+BACKGROUND = "<background>"
+
+
+class RequestStats:
+    """Per-request counters shared between the middleware and the engine hooks"""
+    __slots__ = ("method", "route", "queries", "db_seconds")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.route = UNMATCHED
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, query_buckets=QUERY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = 0
+            self.requests = defaultdict(int)  # (method, route, status) -> count
+            self.latency = {}  # (method, route) -> Histogram
+            self.db_queries = defaultdict(int)  # (method, route) -> statements
+            self.db_seconds = defaultdict(float)  # (method, route) -> seconds
+            self.query_latency = Histogram(self.query_buckets)
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, stats: RequestStats, status: int, seconds: float):
+        key = (stats.method, stats.route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[key + (str(status),)] += 1
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+            self.db_queries[key] += stats.queries
+            self.db_seconds[key] += stats.db_seconds
+
+    def query_finished(self, seconds: float):
+        stats = current_request.get()
+        if stats is not None:
+            # Only this request's tasks touch its stats object
+            stats.queries += 1
+            stats.db_seconds += seconds
+            with self._lock:
+                self.query_latency.observe(seconds)
+            return
+        with self._lock:
+            self.query_latency.observe(seconds)
+            self.db_queries[("", BACKGROUND)] += 1
+            self.db_seconds[("", BACKGROUND)] += seconds
+
+    # -- exposition -----------------------------------------------------
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP vitals_http_requests_in_flight HTTP requests currently being served",
+                "# TYPE vitals_http_requests_in_flight gauge",
+                f"vitals_http_requests_in_flight {self.in_flight}",
+                "# HELP vitals_http_requests_total HTTP responses by route and status code",
+                "# TYPE vitals_http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"vitals_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+            lines += [
+                "# HELP vitals_http_request_duration_seconds Time to the last response byte",
+                "# TYPE vitals_http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines += _histogram("vitals_http_request_duration_seconds", histogram, method=method, route=route)
+
+            lines += [
+                "# HELP vitals_db_queries_total SQL statements executed, by the route that issued them",
+                "# TYPE vitals_db_queries_total counter",
+            ]
+            for (method, route), count in sorted(self.db_queries.items()):
+                lines.append(f"vitals_db_queries_total{_labels(method=method, route=route)} {count}")
+            lines += [
+                "# HELP vitals_db_query_seconds_total Time spent executing SQL, by the route that issued it",
+                "# TYPE vitals_db_query_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f"vitals_db_query_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+
+            lines += [
+                "# HELP vitals_db_query_duration_seconds Latency of individual SQL statements",
+                "# TYPE vitals_db_query_duration_seconds histogram",
+            ]
+            lines += _histogram("vitals_db_query_duration_seconds", self.query_latency)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram(name: str, histogram: Histogram, **labels) -> list:
+    lines, cumulative = [], 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=f'{bound:g}')} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: Metrics = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"])
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+        self.registry.request_started()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                stats.route = route.path
+            self.registry.request_finished(stats, status, time.perf_counter() - started)
+            current_request.reset(token)
+
+
+def instrument_engine(engine, registry: "Metrics" = None):
+    """Count statements and DB time on ``engine`` (safe to call once per engine)"""
+    registry = registry or metrics
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        registry.query_finished(time.perf_counter() - conn.info["metrics_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            registry.query_finished(time.perf_counter() - started.pop())
+
+
+metrics = Metrics()
@@ -0,0 +1,89 @@
+"""
+Per-patient summary rows (``patient_summaries``).
+
+Each row holds what patient views need at a glance: appointment and triage
+counts, the last visit, and the latest triage priority and vitals. ``refresh``
+recomputes one patient's row with a single statement of indexed correlated
+subqueries and runs inside the caller's transaction, so ``crud`` calls it from
+every appointment and triage write before committing. Readers then fetch the
+row by primary key instead of aggregating ``appointments`` and
+``triage_records``.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+_SUMMARY_SELECT = """
+    SELECT p.id, p.user_id,
+        (SELECT count(*) FROM appointments a WHERE a.patient_id = p.user_id),
+        (SELECT count(*) FROM appointments a WHERE a.patient_id = p.user_id AND a.status = 'completed'),
+        (SELECT count(*) FROM appointments a WHERE a.patient_id = p.user_id AND a.status IN ('pending', 'scheduled')),
+        (SELECT count(*) FROM triage_records t WHERE t.patient_id = p.id),
+        nullif(max(
+            coalesce((SELECT max(a.date) FROM appointments a
+                      WHERE a.patient_id = p.user_id AND a.status = 'completed'), ''),
+            coalesce(date(latest.timestamp), '')
+        ), ''),
+        latest.priority, latest.timestamp, latest.blood_pressure, latest.heart_rate,
+        latest.temperature, latest.oxygen_saturation, latest.respiratory_rate,
+        CURRENT_TIMESTAMP
+    FROM patients p
+    LEFT JOIN triage_records latest ON latest.rowid = (
+        SELECT t.rowid FROM triage_records t WHERE t.patient_id = p.id
+        ORDER BY t.timestamp DESC, t.rowid DESC LIMIT 1
+    )
+"""
+
+_UPSERT = f"""
+    INSERT OR REPLACE INTO patient_summaries (
+        patient_id, user_id, appointment_count, completed_appointments, upcoming_appointments,
+        triage_count, last_visit, latest_priority, latest_triage_at, blood_pressure, heart_rate,
+        temperature, oxygen_saturation, respiratory_rate, updated_at
+    )
+    {_SUMMARY_SELECT}
+"""
+
+
+def refresh(db, patient_id: str = None, user_id: str = None):
+    """Recompute one patient's summary (by patient id or by user id) without committing"""
+    if patient_id:
+        db.execute(text(_UPSERT + " WHERE p.id = :patient_id"), {"patient_id": patient_id})
+    elif user_id:
+        db.execute(text(_UPSERT + " WHERE p.user_id = :user_id"), {"user_id": user_id})
+
+
+def remove(db, patient_id: str):
+    db.execute(text("DELETE FROM patient_summaries WHERE patient_id = :patient_id"), {"patient_id": patient_id})
+
+
+def backfill(db, rebuild: bool = False) -> int:
+    """Create summaries for patients that have none (or for everyone when ``rebuild``)"""
+    where = "" if rebuild else " WHERE p.id NOT IN (SELECT patient_id FROM patient_summaries)"
+    result = db.execute(text(_UPSERT + where))
+    db.commit()
+    return result.rowcount
+
+
+def days_since(day: str, today: date = None):
+    if not day:
+        return None
+    return ((today or date.today()) - datetime.strptime(day[:10], "%Y-%m-%d").date()).days
+
+
+def format_last_visit(day: str) -> str:
+    """Compact age of the last visit for dashboard tiles ("today", "12d")"""
+    days = days_since(day)
+    if days is None:
+        return "Never"
+    return "today" if days <= 0 else f"{days}d"
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {backfill(db, rebuild=True)} patient summaries")
+    finally:
+        db.close()
@@ -0,0 +1,152 @@
+"""
+In-memory typeahead index over people.
+
+For every role a sorted list of ``(term, user_id)`` pairs is kept, where the
+terms are the lowercased name words, full name, username and email. A prefix
+lookup is a ``bisect`` into the role's list for the query's most selective word
+followed by a short forward scan, so top-k results come back in microseconds
+without touching the database.
+
+The index is built once at startup and kept current by the user create,
+delete and activation paths in ``crud``.
+"""
+import bisect
+import threading
+
+ROLES = ("patient", "doctor", "nurse", "administrator")
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Upper bound on index entries inspected per lookup (keeps common prefixes cheap)
+MAX_SCAN = 2000
+# Sorts after any character a term can continue a prefix with
+_LAST_CHAR = "\U0010ffff"
+
+
+def _terms(name: str, username: str, email: str) -> set:
+    terms = set()
+    if name:
+        lowered = name.lower().strip()
+        terms.add(lowered)
+        terms.update(lowered.split())
+    if username:
+        terms.add(username.lower())
+    if email:
+        terms.add(email.lower())
+    return terms
+
+
+def _entry(user, profile_id: str = None) -> dict:
+    return {
+        "id": user.id,
+        "name": user.name,
+        "username": user.username,
+        "email": user.email,
+        "role": str(user.role),
+        "profile_id": profile_id,
+        "is_active": user.is_active is not False,
+        "terms": _terms(user.name, user.username, user.email),
+    }
+
+
+class PeopleIndex:
+    def __init__(self):
+        self._terms = {role: [] for role in ROLES}
+        self._people = {}  # user_id -> entry
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._people)
+
+    def add(self, user, profile_id: str = None):
+        """Insert or refresh a user (``profile_id`` is the patient/doctor/nurse row id)"""
+        with self._lock:
+            existing = self._people.get(user.id)
+            if existing:
+                self._remove_locked(user.id)
+                profile_id = profile_id or existing["profile_id"]
+            entry = _entry(user, profile_id)
+            self._people[user.id] = entry
+            terms = self._terms.setdefault(entry["role"], [])
+            for term in entry["terms"]:
+                bisect.insort(terms, (term, user.id))
+
+    def set_profile(self, user_id: str, profile_id: str):
+        with self._lock:
+            if user_id in self._people:
+                self._people[user_id]["profile_id"] = profile_id
+
+    def set_active(self, user_id: str, is_active: bool):
+        with self._lock:
+            if user_id in self._people:
+                self._people[user_id]["is_active"] = bool(is_active)
+
+    def remove(self, user_id: str):
+        with self._lock:
+            self._remove_locked(user_id)
+
+    def _remove_locked(self, user_id: str):
+        entry = self._people.pop(user_id, None)
+        if not entry:
+            return
+        terms = self._terms.get(entry["role"], [])
+        for term in entry["terms"]:
+            position = bisect.bisect_left(terms, (term, user_id))
+            if position < len(terms) and terms[position] == (term, user_id):
+                del terms[position]
+
+    def search(self, q: str, roles=None, limit: int = DEFAULT_LIMIT) -> list:
+        """Active people whose terms start with every word of ``q``, best matches first"""
+        words = (q or "").lower().split()
+        if not words:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+        first = words[0]
+        matches = {}
+        with self._lock:
+            for role in roles or ROLES:
+                terms = self._terms.get(role, [])
+                # Walk the narrowest word's prefix range so a common first word
+                # ("john") does not use up MAX_SCAN before a rarer one is checked
+                ranges = [
+                    (bisect.bisect_left(terms, (word,)), bisect.bisect_left(terms, (word + _LAST_CHAR,)), word)
+                    for word in words
+                ]
+                start, end, word = min(ranges, key=lambda span: span[1] - span[0])
+                rest = [other for other in words if other != word]
+                for position in range(start, min(end, start + MAX_SCAN)):
+                    user_id = terms[position][1]
+                    entry = self._people[user_id]
+                    if user_id in matches or not entry["is_active"]:
+                        continue
+                    if all(any(t.startswith(other) for t in entry["terms"]) for other in rest):
+                        # Exact term hits rank ahead of prefix hits, then shorter names
+                        matches[user_id] = (first not in entry["terms"], len(entry["name"] or ""), entry)
+            ranked = sorted(matches.values(), key=lambda match: (match[0], match[1], match[2]["name"] or ""))
+            return [
+                {key: value for key, value in match[2].items() if key != "terms"}
+                for match in ranked[:limit]
+            ]
+
+    def load(self, db):
+        """Rebuild the index from the users table (run once at startup)"""
+        from database import User, Patient, Doctor, Nurse
+
+        rows = (
+            db.query(User, Patient.id, Doctor.id, Nurse.id)
+            .outerjoin(Patient, Patient.user_id == User.id)
+            .outerjoin(Doctor, Doctor.user_id == User.id)
+            .outerjoin(Nurse, Nurse.user_id == User.id)
+            .yield_per(1000)
+        )
+        people, terms = {}, {role: [] for role in ROLES}
+        for user, patient_id, doctor_id, nurse_id in rows:
+            entry = _entry(user, profile_id=patient_id or doctor_id or nurse_id)
+            people[user.id] = entry
+            terms.setdefault(entry["role"], []).extend((term, user.id) for term in entry["terms"])
+        for role_terms in terms.values():
+            role_terms.sort()
+        with self._lock:
+            self._people, self._terms = people, terms
+
+
+people = PeopleIndex()
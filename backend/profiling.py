@@ -0,0 +1,224 @@
+"""
+On-demand sampling CPU profiler for live requests.
+
+Nothing is profiled until an administrator asks for it, either by arming the
+profiler for the next N requests (``POST /admin/profiling``, optionally for
+one route such as ``GET /triage/``) or by sending ``X-Profile: 1`` together
+with an administrator's bearer token on a single request. Until then the
+middleware costs an integer check and a header scan per request and no
+profiler thread exists.
+
+While at least one profiled request is in flight, a sampler thread reads
+``sys._current_frames()`` every ``PROFILE_INTERVAL_MS`` and adds every stack
+that is running application code to each profile in progress; threads blocked
+in a wait (idle workers, the timer threads) are skipped. Stacks are kept in the
+collapsed format (``frame;frame;frame count``) read by flamegraph.pl, inferno
+and speedscope, so ``GET /admin/profiles/{profile_id}`` can be fed to them
+directly. Requests served at the same time as a profiled one share its
+samples, so profile on a quiet worker for clean results. The last
+``PROFILE_BUFFER_SIZE`` profiles are kept in memory.
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from starlette.concurrency import run_in_threadpool
+
+import crud
+from auth import verify_token
+from database import SessionLocal
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_MAX_DEPTH = 128
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Requests to these routes never use up an armed profiler
+ADMIN_PREFIX = "/admin/profil"
+# Innermost frames of threads that are blocked waiting rather than working
+IDLE_FRAMES = {"threading:wait", "queue:get", "selectors:select"}
+
+
+def _label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}".replace(";", ",")
+
+
+def collapse(frame):
+    """Root-first ``a;b;c`` stack of ``frame``, or None when no application code is on it"""
+    if _label(frame) in IDLE_FRAMES:
+        return None
+    labels, in_app = [], False
+    while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        if code.co_filename.startswith(APP_DIR) and code.co_name != "<module>":
+            in_app = True
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels)) if in_app else None
+
+
+class Profile:
+    def __init__(self, method: str, path: str, reason: str):
+        self.profile_id = secrets.token_hex(8)
+        self.method = method
+        self.path = path
+        self.route = None
+        self.reason = reason
+        self.status = None
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.samples = 0
+        self.stacks = Counter()
+
+    def finish(self, status: int, route: str):
+        self.status = status
+        self.route = route
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "profile_id": self.profile_id,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+        }
+
+
+class Profiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, size: int = PROFILE_BUFFER_SIZE):
+        self.interval = interval_ms / 1000
+        self.remaining = 0
+        self.route = None
+        self.profiles = deque(maxlen=size)
+        self._active = set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def arm(self, requests: int, route: str = None):
+        """Profile the next ``requests`` requests, only those matching ``route`` when given"""
+        with self._lock:
+            self.remaining = max(0, requests)
+            self.route = route if requests > 0 else None
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "remaining": self.remaining,
+                "route": self.route,
+                "interval_ms": self.interval * 1000,
+                "in_progress": len(self._active),
+                "profiles": [profile.summary() for profile in reversed(self.profiles)],
+            }
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return next((p for p in self.profiles if p.profile_id == profile_id), None)
+
+    def claim(self, route: str) -> bool:
+        """Count a finished request against the armed budget if it matches"""
+        with self._lock:
+            if self.remaining <= 0 or (self.route and route != self.route):
+                return False
+            self.remaining -= 1
+            return True
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile, keep: bool):
+        with self._lock:
+            self._active.discard(profile)
+            if keep:
+                self.profiles.append(profile)
+
+    def _sample(self):
+        own = threading.get_ident()
+        while True:
+            stacks = [stack for ident, frame in sys._current_frames().items()
+                      if ident != own and (stack := collapse(frame))]
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for profile in self._active:
+                    profile.samples += 1
+                    profile.stacks.update(stacks)
+            time.sleep(self.interval)
+
+
+profiler = Profiler()
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _is_administrator(authorization: str) -> bool:
+    scheme, _, token = (authorization or "").partition(" ")
+    username = verify_token(token) if scheme.lower() == "bearer" else None
+    if username is None:
+        return False
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username=username)
+        return user is not None and str(user.role) == "administrator"
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, registry: Profiler = None):
+        self.app = app
+        self.profiler = registry or profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = (_header(scope, b"x-profile") or "").lower() in ("1", "true", "yes")
+        if requested:
+            requested = await run_in_threadpool(_is_administrator, _header(scope, b"authorization"))
+        if not (requested or self.profiler.remaining):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], "header" if requested else "armed")
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile.profile_id.encode()),
+                    ]
+            await send(message)
+
+        self.profiler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = getattr(scope.get("route"), "path", None) or scope["path"]
+            profile.finish(status, f"{scope['method']} {path}")
+            keep = requested or (not path.startswith(ADMIN_PREFIX) and self.profiler.claim(profile.route))
+            self.profiler.stop(profile, keep)
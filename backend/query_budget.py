@@ -0,0 +1,129 @@
+"""
+Per-request SQL budgets and N+1 detection.
+
+Every statement executed while serving a request is fingerprinted (whitespace
+collapsed, literals and ``IN (...)`` lists reduced to ``?``) and counted in a
+per-request log held in a context variable. Two things are checked as the
+statements arrive:
+
+* **budget** - the route's declared maximum number of statements, set with
+  ``@query_budget.limit(n)`` under the route decorator, or
+  ``QUERY_BUDGET_DEFAULT`` for undeclared routes;
+* **N+1** - the same fingerprint executed ``QUERY_BUDGET_REPEATS`` times or
+  more in one request, which is what per-row lookups in a loop look like.
+
+``QUERY_BUDGET_MODE`` decides what a violation does: ``log`` (the default)
+emits one warning per request listing the worst fingerprints, ``raise`` fails
+the offending statement with ``QueryBudgetExceeded`` so tests and local runs
+break loudly, and ``off`` skips the bookkeeping entirely.
+"""
+import contextvars
+import logging
+import os
+import re
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "25"))
+QUERY_BUDGET_REPEATS = int(os.getenv("QUERY_BUDGET_REPEATS", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN \((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape with values removed, so repeats differing only in parameters match"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _IN_LIST.sub("IN (?)", statement)
+
+
+def limit(queries: int = None, repeats: int = None):
+    """Declare a route's statement budget and/or tolerated repeats of one fingerprint"""
+    def decorate(endpoint):
+        endpoint.query_budget = queries
+        endpoint.query_budget_repeats = repeats
+        return endpoint
+    return decorate
+
+
+class QueryLog:
+    __slots__ = ("scope", "counts", "total", "violations")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.counts = Counter()
+        self.total = 0
+        self.violations = []
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', None) or self.scope['path']}"
+
+    def limits(self) -> tuple:
+        endpoint = self.scope.get("endpoint")
+        budget = getattr(endpoint, "query_budget", None)
+        repeats = getattr(endpoint, "query_budget_repeats", None)
+        return budget or QUERY_BUDGET_DEFAULT, repeats or QUERY_BUDGET_REPEATS
+
+    def record(self, statement: str):
+        shape = fingerprint(statement)
+        self.counts[shape] += 1
+        self.total += 1
+        budget, repeats = self.limits()
+        if self.total == budget + 1:
+            self.violate(f"{self.route} exceeded its budget of {budget} queries")
+        if self.counts[shape] == repeats:
+            self.violate(f"{self.route} repeated one statement {repeats} times (likely N+1): {shape[:200]}")
+
+    def violate(self, message: str):
+        self.violations.append(message)
+        if QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded(message)
+
+    def report(self):
+        if not self.violations:
+            return
+        worst = ", ".join(f"{count}x {shape[:120]}" for shape, count in self.counts.most_common(3))
+        logger.warning("%s; %d queries in request; most repeated: %s",
+                       "; ".join(self.violations), self.total, worst)
+
+
+current_log = contextvars.ContextVar("query_budget_log", default=None)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or QUERY_BUDGET_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog(scope)
+        token = current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_log.reset(token)
+            log.report()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record(conn, cursor, statement, parameters, context, executemany):
+    log = current_log.get()
+    if log is not None:
+        log.record(statement)
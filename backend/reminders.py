@@ -0,0 +1,143 @@
+"""
+Appointment reminder scheduler.
+
+Upcoming appointments are loaded once at startup into a ``TimerQueue`` and kept
+in sync by the appointment write paths in ``crud``. Each appointment gets one
+timer per configured offset; when a timer fires the reminder is handed to the
+notifier (by default an ``Alert`` for the patient).
+
+Only reminders falling inside a rolling horizon are held in memory. A single
+refill query runs every half horizon to admit the next window, so there is no
+per-minute polling of the appointments table.
+"""
+import logging
+import os
+import time
+from datetime import datetime, date
+
+import schemas
+from timers import TimerQueue
+
+logger = logging.getLogger(__name__)
+
+REMINDER_OFFSETS_MINUTES = [
+    int(offset) for offset in os.getenv("REMINDER_OFFSETS_MINUTES", "1440,60").split(",") if offset.strip()
+]
+REMINDER_HORIZON_HOURS = int(os.getenv("REMINDER_HORIZON_HOURS", "48"))
+REMINDER_MAX_PENDING = int(os.getenv("REMINDER_MAX_PENDING", "100000"))
+
+OPEN_STATUSES = ("pending", "scheduled")
+_REFILL_KEY = ("__refill__", None)
+_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p")
+
+
+def appointment_start(appointment_date: str, appointment_time: str):
+    """Parse the stored date/time strings into a local datetime"""
+    try:
+        day = datetime.strptime(appointment_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.combine(day, datetime.strptime(appointment_time.strip(), fmt).time())
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+def alert_notifier(reminder: dict):
+    """Default notifier: raise an info alert for the patient"""
+    import crud
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        appointment = crud.get_appointment(db, reminder["appointment_id"])
+        if not appointment or appointment.status not in OPEN_STATUSES:
+            return
+        crud.create_alert(db, schemas.AlertCreate(
+            alert_type="info",
+            title="Appointment reminder",
+            message=f"You have an appointment on {appointment.date} at {appointment.time}.",
+            user_id=appointment.patient_id,
+        ))
+    finally:
+        db.close()
+
+
+class ReminderScheduler:
+    def __init__(self, offsets=None, horizon_hours: int = REMINDER_HORIZON_HOURS,
+                 max_pending: int = REMINDER_MAX_PENDING, notifier=alert_notifier):
+        self.offsets = offsets or REMINDER_OFFSETS_MINUTES
+        self.horizon = horizon_hours * 3600
+        self.notifier = notifier
+        self.session_factory = None
+        self.queue = TimerQueue("reminders", self._fire, max_entries=max_pending)
+
+    def set_notifier(self, notifier):
+        self.notifier = notifier
+
+    def schedule(self, appointment, now: float = None):
+        """(Re)schedule every reminder for an appointment, or cancel if it is no longer open"""
+        self.cancel(appointment.id)
+        if appointment.status not in OPEN_STATUSES:
+            return
+        start = appointment_start(appointment.date, appointment.time)
+        if start is None:
+            return
+        now = time.time() if now is None else now
+        start_ts = start.timestamp()
+        for offset in self.offsets:
+            fire_at = start_ts - offset * 60
+            if now <= fire_at <= now + self.horizon:
+                self.queue.schedule((appointment.id, offset), fire_at, {
+                    "appointment_id": appointment.id,
+                    "patient_id": appointment.patient_id,
+                    "offset_minutes": offset,
+                })
+
+    def cancel(self, appointment_id: str):
+        for offset in self.offsets:
+            self.queue.cancel((appointment_id, offset))
+
+    def load(self, db, now: float = None):
+        """Schedule reminders for open appointments that fall inside the horizon"""
+        from database import Appointment
+
+        now = time.time() if now is None else now
+        max_offset = max(self.offsets) if self.offsets else 0
+        first_day = date.fromtimestamp(now)
+        last_day = date.fromtimestamp(now + self.horizon + max_offset * 60)
+        appointments = db.query(Appointment).filter(
+            Appointment.status.in_(OPEN_STATUSES),
+            Appointment.date >= str(first_day),
+            Appointment.date <= str(last_day),
+        ).yield_per(1000)
+        for appointment in appointments:
+            self.schedule(appointment, now=now)
+        self.queue.schedule(_REFILL_KEY, now + self.horizon / 2)
+
+    def _fire(self, key, payload):
+        if key == _REFILL_KEY:
+            self._refill()
+            return
+        self.notifier(payload)
+
+    def _refill(self):
+        db = self.session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def start(self, session_factory):
+        self.session_factory = session_factory
+        self._refill()
+        self.queue.start()
+
+    def stop(self):
+        self.queue.stop()
+        self.queue.clear()
+
+
+scheduler = ReminderScheduler()
@@ -0,0 +1,219 @@
+"""
+Pre-aggregated rollups for historical charts.
+
+Three small tables hold running counts:
+
+- ``rollup_appointments_daily``: appointments per scheduled day, doctor and status
+- ``rollup_triage_hourly``: triage records per hour and priority
+- ``rollup_alerts_daily``: alerts (and coalesced occurrences) per day and type
+
+SQLite triggers on the source tables apply each insert, update and delete to
+the rollups in the same transaction, the same way the search index is kept in
+sync, so every writer is covered and nothing ever rescans the raw tables. The
+``/analytics`` endpoints sum rollup rows over a date range, which costs time
+proportional to the number of buckets in the range, not the number of events.
+
+Run ``python rollups.py --rebuild`` after bulk-loading data with triggers
+disabled or restoring a backup.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import database
+
+INTERVALS = {
+    # interval -> length of the period prefix taken from the bucket key
+    "hour": 16,
+    "day": 10,
+    "month": 7,
+}
+
+_APPOINTMENT_KEY = "{row}.date, coalesce({row}.doctor_id, ''), coalesce({row}.status, '')"
+_TRIAGE_KEY = "strftime('%Y-%m-%d %H:00', {row}.timestamp), coalesce({row}.priority, '')"
+_ALERT_KEY = "date({row}.timestamp), {row}.alert_type"
+
+
+def _bump_appointment(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO rollup_appointments_daily(day, doctor_id, status, count)
+        SELECT {_APPOINTMENT_KEY.format(row=row)}, {delta} WHERE {row}.date IS NOT NULL
+        ON CONFLICT(day, doctor_id, status) DO UPDATE SET count = count + excluded.count;
+    """
+
+
+def _bump_triage(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO rollup_triage_hourly(hour, priority, count)
+        SELECT {_TRIAGE_KEY.format(row=row)}, {delta} WHERE {row}.timestamp IS NOT NULL
+        ON CONFLICT(hour, priority) DO UPDATE SET count = count + excluded.count;
+    """
+
+
+def _bump_alert(row: str, delta: int, occurrences: str) -> str:
+    return f"""
+        INSERT INTO rollup_alerts_daily(day, alert_type, count, occurrences)
+        SELECT {_ALERT_KEY.format(row=row)}, {delta}, {occurrences} WHERE {row}.timestamp IS NOT NULL
+        ON CONFLICT(day, alert_type) DO UPDATE SET
+            count = count + excluded.count, occurrences = occurrences + excluded.occurrences;
+    """
+
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS rollup_appointments_daily (
+        day TEXT NOT NULL, doctor_id TEXT NOT NULL, status TEXT NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (day, doctor_id, status)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS rollup_triage_hourly (
+        hour TEXT NOT NULL, priority TEXT NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (hour, priority)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS rollup_alerts_daily (
+        day TEXT NOT NULL, alert_type TEXT NOT NULL, count INTEGER NOT NULL, occurrences INTEGER NOT NULL,
+        PRIMARY KEY (day, alert_type)
+    ) WITHOUT ROWID""",
+
+    # appointments
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_appointments_ai AFTER INSERT ON appointments BEGIN
+        {_bump_appointment('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_appointments_au AFTER UPDATE OF date, doctor_id, status ON appointments BEGIN
+        {_bump_appointment('old', -1)}
+        {_bump_appointment('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_appointments_ad AFTER DELETE ON appointments BEGIN
+        {_bump_appointment('old', -1)}
+    END""",
+
+    # triage records
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_triage_ai AFTER INSERT ON triage_records BEGIN
+        {_bump_triage('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_triage_au AFTER UPDATE OF timestamp, priority ON triage_records BEGIN
+        {_bump_triage('old', -1)}
+        {_bump_triage('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_triage_ad AFTER DELETE ON triage_records BEGIN
+        {_bump_triage('old', -1)}
+    END""",
+
+    # alerts
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_alerts_ai AFTER INSERT ON alerts BEGIN
+        {_bump_alert('new', 1, 'coalesce(new.occurrence_count, 1)')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_alerts_au AFTER UPDATE OF timestamp, alert_type, occurrence_count ON alerts BEGIN
+        {_bump_alert('old', -1, '-coalesce(old.occurrence_count, 1)')}
+        {_bump_alert('new', 1, 'coalesce(new.occurrence_count, 1)')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rollup_alerts_ad AFTER DELETE ON alerts BEGIN
+        {_bump_alert('old', -1, '-coalesce(old.occurrence_count, 1)')}
+    END""",
+]
+
+BACKFILL = {
+    "rollup_appointments_daily": f"""
+        INSERT INTO rollup_appointments_daily(day, doctor_id, status, count)
+        SELECT {_APPOINTMENT_KEY.format(row='appointments')}, count(*)
+        FROM appointments GROUP BY 1, 2, 3
+    """,
+    "rollup_triage_hourly": f"""
+        INSERT INTO rollup_triage_hourly(hour, priority, count)
+        SELECT {_TRIAGE_KEY.format(row='triage_records')}, count(*)
+        FROM triage_records WHERE timestamp IS NOT NULL GROUP BY 1, 2
+    """,
+    "rollup_alerts_daily": f"""
+        INSERT INTO rollup_alerts_daily(day, alert_type, count, occurrences)
+        SELECT {_ALERT_KEY.format(row='alerts')}, count(*), sum(coalesce(occurrence_count, 1))
+        FROM alerts WHERE timestamp IS NOT NULL GROUP BY 1, 2
+    """,
+}
+
+
+def init_rollups():
+    """Create the rollup tables and triggers, backfilling any table created just now"""
+    with database.engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'rollup_%'"
+            ))
+        }
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        for table, backfill in BACKFILL.items():
+            if table not in existing:
+                conn.execute(text(backfill))
+
+
+def rebuild_rollups():
+    """Recompute every rollup from its source table"""
+    with database.engine.begin() as conn:
+        for table, backfill in BACKFILL.items():
+            conn.execute(text(f"DELETE FROM {table}"))
+            conn.execute(text(backfill))
+
+
+def _range(column: str, date_from: str, date_to: str, params: dict) -> list:
+    clauses = []
+    if date_from:
+        clauses.append(f"{column} >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        # Bucket keys may carry a time part, so compare against the start of the next day
+        clauses.append(f"{column} < :date_end")
+        params["date_end"] = str(datetime.strptime(date_to, "%Y-%m-%d").date() + timedelta(days=1))
+    return clauses
+
+
+def _query(db, table: str, key: str, interval: str, dimensions: list, filters: dict,
+           date_from: str, date_to: str, sums=("count",)) -> list:
+    params = {}
+    clauses = _range(key, date_from, date_to, params)
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"{column} = :{column}")
+            params[column] = value
+    period = f"substr({key}, 1, {INTERVALS[interval]})"
+    group = ", ".join(["period", *dimensions])
+    totals = ", ".join(f"sum({column}) AS {column}" for column in sums)
+    rows = db.execute(text(f"""
+        SELECT {period} AS period, {', '.join(dimensions)}, {totals}
+        FROM {table}
+        WHERE {' AND '.join(clauses) or '1'}
+        GROUP BY {group}
+        HAVING sum(count) > 0
+        ORDER BY {group}
+    """), params)
+    # Missing dimension values are stored as '' to keep the bucket keys NOT NULL
+    return [
+        {key: (None if key in dimensions and value == "" else value) for key, value in row._mapping.items()}
+        for row in rows
+    ]
+
+
+def appointments_by_day(db, date_from: str = None, date_to: str = None, interval: str = "day",
+                        doctor_id: str = None, status: str = None) -> list:
+    return _query(db, "rollup_appointments_daily", "day", interval, ["doctor_id", "status"],
+                  {"doctor_id": doctor_id, "status": status}, date_from, date_to)
+
+
+def triage_by_hour(db, date_from: str = None, date_to: str = None, interval: str = "hour",
+                   priority: str = None) -> list:
+    return _query(db, "rollup_triage_hourly", "hour", interval, ["priority"],
+                  {"priority": priority}, date_from, date_to)
+
+
+def alerts_by_day(db, date_from: str = None, date_to: str = None, interval: str = "day",
+                  alert_type: str = None) -> list:
+    return _query(db, "rollup_alerts_daily", "day", interval, ["alert_type"],
+                  {"alert_type": alert_type}, date_from, date_to, sums=("count", "occurrences"))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--rebuild" in sys.argv:
+        init_rollups()
+        rebuild_rollups()
+        print("Rollups rebuilt")
+    else:
+        print("Usage: python rollups.py --rebuild")
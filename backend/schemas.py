@@ -45,11 +45,29 @@ class PatientBase(BaseModel):
 class PatientCreate(PatientBase):
     user_id: str
 
+class PatientSummary(BaseModel):
+    appointment_count: int = 0
+    completed_appointments: int = 0
+    upcoming_appointments: int = 0
+    triage_count: int = 0
+    last_visit: Optional[str] = None
+    latest_priority: Optional[str] = None
+    latest_triage_at: Optional[datetime] = None
+    blood_pressure: Optional[str] = None
+    heart_rate: Optional[int] = None
+    temperature: Optional[float] = None
+    oxygen_saturation: Optional[int] = None
+    respiratory_rate: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
 class PatientDetails(PatientBase):
     id: str
     user_id: str
     registration_date: datetime
     user: Optional[User] = None
+    summary: Optional[PatientSummary] = None
     
     class Config:
         from_attributes = True
@@ -62,6 +80,23 @@ class Patient(PatientBase):
     class Config:
         from_attributes = True
 
+class DuplicateCandidate(BaseModel):
+    patient_id: str
+    user_id: Optional[str] = None
+    name: Optional[str] = None
+    contact_number: Optional[str] = None
+    age: Optional[int] = None
+    score: float
+    reasons: List[str] = []
+
+class PatientMerge(BaseModel):
+    primary_patient_id: str
+    duplicate_patient_id: str
+
+class PatientMergeResult(BaseModel):
+    patient: Patient
+    moved: dict
+
 # Doctor schemas
 class DoctorBase(BaseModel):
     specialization: Optional[str] = None
@@ -117,6 +152,27 @@ class Nurse(NurseBase):
     class Config:
         from_attributes = True
 
+# Staff directory schemas
+class StaffMember(BaseModel):
+    id: str
+    user_id: str
+    kind: str
+    name: str
+    username: str
+    email: str
+    phone: Optional[str] = None
+    department: Optional[str] = None
+    shift: Optional[str] = None
+    specialization: Optional[str] = None
+    license_number: Optional[str] = None
+    is_available: Optional[bool] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+
+class StaffDirectoryPage(BaseModel):
+    items: List[StaffMember]
+    next_cursor: Optional[str] = None
+
 # Priority schemas
 class PriorityBase(BaseModel):
     name: str
@@ -173,10 +229,29 @@ class Appointment(AppointmentBase):
     doctor_name: Optional[str] = None
     doctor_remarks: Optional[str] = None
     priority: Optional[Priority] = None
+    estimated_wait_p50: Optional[float] = None
+    estimated_wait_p90: Optional[float] = None
     
     class Config:
         from_attributes = True
 
+class AppointmentSearchPage(BaseModel):
+    items: List[Appointment]
+    next_cursor: Optional[str] = None
+    total: int
+    total_is_estimate: bool
+
+class TimelineEvent(BaseModel):
+    kind: str
+    id: str
+    timestamp: Optional[datetime] = None
+    title: str
+    details: dict
+
+class TimelinePage(BaseModel):
+    items: List[TimelineEvent]
+    next_cursor: Optional[str] = None
+
 # Triage schemas
 class VitalsBase(BaseModel):
     blood_pressure: str
@@ -201,6 +276,8 @@ class TriageRecord(TriageRecordBase, VitalsBase):
     timestamp: datetime
     patient_name: Optional[str] = None
     nurse_name: Optional[str] = None
+    estimated_wait_p50: Optional[float] = None
+    estimated_wait_p90: Optional[float] = None
     
     class Config:
         from_attributes = True
@@ -214,11 +291,17 @@ class AlertBase(BaseModel):
 class AlertCreate(AlertBase):
     user_id: str
 
+class AlertBulkRead(BaseModel):
+    alert_ids: Optional[List[str]] = None
+    before: Optional[datetime] = None
+
 class Alert(AlertBase):
     id: str
     timestamp: datetime
     is_read: bool
     user_id: str
+    occurrence_count: int = 1
+    last_seen_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -258,4 +341,48 @@ class AdminStats(BaseModel):
     total_patients: int
     active_staff: int
     system_alerts: int
-    monthly_appointments: int
\ No newline at end of file
+    monthly_appointments: int
+
+# Lookup schemas
+class PersonLookup(BaseModel):
+    id: str
+    name: str
+    username: str
+    email: str
+    role: str
+    profile_id: Optional[str] = None
+
+# Search schemas
+class SearchHit(BaseModel):
+    kind: str
+    id: str
+    patient_id: Optional[str] = None
+    title: str
+    snippet: Optional[str] = None
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    patients: Optional[List[SearchHit]] = None
+    appointments: Optional[List[SearchHit]] = None
+    triage: Optional[List[SearchHit]] = None
+
+# Analytics schemas
+class RollupBucket(BaseModel):
+    period: str
+    count: int
+    doctor_id: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    alert_type: Optional[str] = None
+    occurrences: Optional[int] = None
+
+# Profiling schemas
+class ProfilingSettings(BaseModel):
+    requests: int = 10
+    route: Optional[str] = None
+
+class MemoryTracingSettings(BaseModel):
+    frames: Optional[int] = None
+    minutes: Optional[float] = 60
+    interval_minutes: Optional[float] = None
@@ -0,0 +1,286 @@
+"""
+Full-text search over patients and clinical text (SQLite FTS5).
+
+Three FTS5 tables mirror the searchable text of ``patients`` (joined with the
+owning user's name, username and email), ``appointments`` and
+``triage_records``, and are kept in sync by SQLite triggers, so every writer
+(the API, seed scripts, manual SQL) updates the index in the same transaction.
+
+Each FTS row stores its source row's id (``id UNINDEXED``) and search results
+join on that. FTS5 cannot look rows up by an unindexed column, so each index
+also has a ``*_keys`` table mapping source ids to FTS rowids; its INTEGER
+PRIMARY KEY survives VACUUM, unlike the implicit rowids of the string-keyed
+source tables. Snippets are HTML-escaped, with matches wrapped in ``<mark>``.
+"""
+import html
+import re
+
+from sqlalchemy import text
+
+import database
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+SNIPPET_TOKENS = 12
+MAX_LIMIT = 100
+# snippet() markers; replaced by <mark> tags once the text around them is escaped
+MARK_START, MARK_END = "\x02", "\x03"
+
+SEARCH_KINDS = ("patients", "appointments", "triage")
+
+
+def _key(table: str, id_expr: str) -> str:
+    return f"(SELECT rowid FROM {table}_keys WHERE id = {id_expr})"
+
+
+_PATIENT_VALUES = """
+    new.id,
+    (SELECT name FROM users WHERE id = new.user_id),
+    (SELECT username FROM users WHERE id = new.user_id),
+    (SELECT email FROM users WHERE id = new.user_id),
+    new.contact_number, new.medical_history
+"""
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS search_patients_keys (rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS search_appointments_keys (rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS search_triage_keys (rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS search_patients USING fts5("
+    f"id UNINDEXED, name, username, email, contact_number, medical_history, tokenize='{TOKENIZER}')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS search_appointments USING fts5("
+    f"id UNINDEXED, condition, notes, doctor_remarks, tokenize='{TOKENIZER}')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS search_triage USING fts5("
+    f"id UNINDEXED, symptoms, tokenize='{TOKENIZER}')",
+
+    # patients
+    f"""CREATE TRIGGER IF NOT EXISTS search_patients_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO search_patients_keys(id) VALUES (new.id);
+        INSERT INTO search_patients(rowid, id, name, username, email, contact_number, medical_history)
+        VALUES ({_key('search_patients', 'new.id')}, {_PATIENT_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_patients_au AFTER UPDATE ON patients BEGIN
+        DELETE FROM search_patients WHERE rowid = {_key('search_patients', 'old.id')};
+        UPDATE search_patients_keys SET id = new.id WHERE id = old.id;
+        INSERT INTO search_patients(rowid, id, name, username, email, contact_number, medical_history)
+        VALUES ({_key('search_patients', 'new.id')}, {_PATIENT_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_patients_ad AFTER DELETE ON patients BEGIN
+        DELETE FROM search_patients WHERE rowid = {_key('search_patients', 'old.id')};
+        DELETE FROM search_patients_keys WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_users_au AFTER UPDATE OF name, username, email ON users BEGIN
+        DELETE FROM search_patients WHERE rowid IN (
+            SELECT k.rowid FROM patients p JOIN search_patients_keys k ON k.id = p.id WHERE p.user_id = new.id
+        );
+        INSERT INTO search_patients(rowid, id, name, username, email, contact_number, medical_history)
+        SELECT k.rowid, p.id, new.name, new.username, new.email, p.contact_number, p.medical_history
+        FROM patients p JOIN search_patients_keys k ON k.id = p.id WHERE p.user_id = new.id;
+    END""",
+
+    # appointments
+    f"""CREATE TRIGGER IF NOT EXISTS search_appointments_ai AFTER INSERT ON appointments BEGIN
+        INSERT INTO search_appointments_keys(id) VALUES (new.id);
+        INSERT INTO search_appointments(rowid, id, condition, notes, doctor_remarks)
+        VALUES ({_key('search_appointments', 'new.id')}, new.id, new.condition, new.notes, new.doctor_remarks);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_appointments_au
+    AFTER UPDATE OF id, condition, notes, doctor_remarks ON appointments BEGIN
+        DELETE FROM search_appointments WHERE rowid = {_key('search_appointments', 'old.id')};
+        UPDATE search_appointments_keys SET id = new.id WHERE id = old.id;
+        INSERT INTO search_appointments(rowid, id, condition, notes, doctor_remarks)
+        VALUES ({_key('search_appointments', 'new.id')}, new.id, new.condition, new.notes, new.doctor_remarks);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_appointments_ad AFTER DELETE ON appointments BEGIN
+        DELETE FROM search_appointments WHERE rowid = {_key('search_appointments', 'old.id')};
+        DELETE FROM search_appointments_keys WHERE id = old.id;
+    END""",
+
+    # triage records
+    f"""CREATE TRIGGER IF NOT EXISTS search_triage_ai AFTER INSERT ON triage_records BEGIN
+        INSERT INTO search_triage_keys(id) VALUES (new.id);
+        INSERT INTO search_triage(rowid, id, symptoms)
+        VALUES ({_key('search_triage', 'new.id')}, new.id, new.symptoms);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_triage_au AFTER UPDATE OF id, symptoms ON triage_records BEGIN
+        DELETE FROM search_triage WHERE rowid = {_key('search_triage', 'old.id')};
+        UPDATE search_triage_keys SET id = new.id WHERE id = old.id;
+        INSERT INTO search_triage(rowid, id, symptoms)
+        VALUES ({_key('search_triage', 'new.id')}, new.id, new.symptoms);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_triage_ad AFTER DELETE ON triage_records BEGIN
+        DELETE FROM search_triage WHERE rowid = {_key('search_triage', 'old.id')};
+        DELETE FROM search_triage_keys WHERE id = old.id;
+    END""",
+]
+
+BACKFILL = {
+    "search_patients": [
+        "INSERT INTO search_patients_keys(id) SELECT id FROM patients",
+        """INSERT INTO search_patients(rowid, id, name, username, email, contact_number, medical_history)
+        SELECT k.rowid, p.id, u.name, u.username, u.email, p.contact_number, p.medical_history
+        FROM patients p JOIN search_patients_keys k ON k.id = p.id LEFT JOIN users u ON u.id = p.user_id""",
+    ],
+    "search_appointments": [
+        "INSERT INTO search_appointments_keys(id) SELECT id FROM appointments",
+        """INSERT INTO search_appointments(rowid, id, condition, notes, doctor_remarks)
+        SELECT k.rowid, a.id, a.condition, a.notes, a.doctor_remarks
+        FROM appointments a JOIN search_appointments_keys k ON k.id = a.id""",
+    ],
+    "search_triage": [
+        "INSERT INTO search_triage_keys(id) SELECT id FROM triage_records",
+        """INSERT INTO search_triage(rowid, id, symptoms)
+        SELECT k.rowid, t.id, t.symptoms FROM triage_records t JOIN search_triage_keys k ON k.id = t.id""",
+    ],
+}
+
+
+def init_search_index():
+    """Create the FTS tables and triggers, backfilling any table created just now"""
+    with database.engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'search_%'"
+            ))
+        }
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        for table, backfill in BACKFILL.items():
+            if table not in existing:
+                conn.execute(text(f"DELETE FROM {table}_keys"))
+                for statement in backfill:
+                    conn.execute(text(statement))
+
+
+def rebuild_search_index():
+    """Repopulate every FTS table from its source table"""
+    with database.engine.begin() as conn:
+        for table, backfill in BACKFILL.items():
+            conn.execute(text(f"DELETE FROM {table}"))
+            conn.execute(text(f"DELETE FROM {table}_keys"))
+            for statement in backfill:
+                conn.execute(text(statement))
+
+
+def build_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    tokens = re.findall(r"\w+", q or "")
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _snippet(table: str) -> str:
+    return f"snippet({table}, -1, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS})"
+
+
+def highlight(snippet):
+    """HTML-escape a snippet's user text and turn the match markers into ``<mark>`` tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search_patients(db, match: str, limit: int):
+    rows = db.execute(text(f"""
+        SELECT p.id, p.user_id, u.name, {_snippet('search_patients')} AS snippet,
+               -bm25(search_patients, 10.0, 5.0, 5.0, 2.0, 1.0) AS score
+        FROM search_patients
+        JOIN patients p ON p.id = search_patients.id
+        LEFT JOIN users u ON u.id = p.user_id
+        WHERE search_patients MATCH :match
+        ORDER BY score DESC
+        LIMIT :limit
+    """), {"match": match, "limit": limit})
+    return [
+        {"kind": "patient", "id": row.id, "patient_id": row.id, "title": row.name or "Unknown",
+         "snippet": highlight(row.snippet), "score": row.score}
+        for row in rows
+    ]
+
+
+def search_appointments(db, match: str, limit: int, patient_user_id: str = None, doctor_id: str = None):
+    filters, params = "", {"match": match, "limit": limit}
+    if patient_user_id is not None:
+        filters += " AND a.patient_id = :patient_user_id"
+        params["patient_user_id"] = patient_user_id
+    if doctor_id is not None:
+        filters += " AND a.doctor_id = :doctor_id"
+        params["doctor_id"] = doctor_id
+    rows = db.execute(text(f"""
+        SELECT a.id, a.patient_id, a.date, a.time, a.status, {_snippet('search_appointments')} AS snippet,
+               -bm25(search_appointments) AS score
+        FROM search_appointments
+        JOIN appointments a ON a.id = search_appointments.id
+        WHERE search_appointments MATCH :match{filters}
+        ORDER BY score DESC
+        LIMIT :limit
+    """), params)
+    return [
+        {"kind": "appointment", "id": row.id, "patient_id": row.patient_id,
+         "title": f"Appointment {row.date} {row.time} ({row.status})",
+         "snippet": highlight(row.snippet), "score": row.score}
+        for row in rows
+    ]
+
+
+def search_triage(db, match: str, limit: int, patient_id: str = None):
+    filters, params = "", {"match": match, "limit": limit}
+    if patient_id is not None:
+        filters += " AND t.patient_id = :patient_id"
+        params["patient_id"] = patient_id
+    rows = db.execute(text(f"""
+        SELECT t.id, t.patient_id, t.priority, t.timestamp, {_snippet('search_triage')} AS snippet,
+               -bm25(search_triage) AS score
+        FROM search_triage
+        JOIN triage_records t ON t.id = search_triage.id
+        WHERE search_triage MATCH :match{filters}
+        ORDER BY score DESC
+        LIMIT :limit
+    """), params)
+    return [
+        {"kind": "triage", "id": row.id, "patient_id": row.patient_id,
+         "title": f"Triage ({row.priority or 'unknown'} priority) {row.timestamp or ''}".strip(),
+         "snippet": highlight(row.snippet), "score": row.score}
+        for row in rows
+    ]
+
+
+def search(db, q: str, user, kinds=None, limit: int = 20) -> dict:
+    """Ranked, role-filtered search; returns hits grouped by kind"""
+    import crud
+
+    match = build_match_query(q)
+    kinds = [kind for kind in (kinds or SEARCH_KINDS) if kind in SEARCH_KINDS]
+    limit = max(1, min(limit, MAX_LIMIT))
+    results = {kind: [] for kind in kinds}
+    if not match:
+        return results
+
+    role = str(user.role)
+    if role == "patient":
+        # Patients only see their own clinical records and never the patient directory
+        patient = crud.get_patient_by_user_id(db, user.id)
+        if "appointments" in kinds:
+            results["appointments"] = search_appointments(db, match, limit, patient_user_id=user.id)
+        if "triage" in kinds and patient:
+            results["triage"] = search_triage(db, match, limit, patient_id=patient.id)
+        results.pop("patients", None)
+        return results
+
+    if "patients" in kinds:
+        results["patients"] = search_patients(db, match, limit)
+    if "appointments" in kinds:
+        # Doctors see their own appointments, as on /appointments/
+        doctor_id = user.id if role == "doctor" else None
+        results["appointments"] = search_appointments(db, match, limit, doctor_id=doctor_id)
+    if "triage" in kinds:
+        results["triage"] = search_triage(db, match, limit)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--rebuild" in sys.argv:
+        init_search_index()
+        rebuild_search_index()
+        print("Search index rebuilt")
+    else:
+        print("Usage: python search.py --rebuild")
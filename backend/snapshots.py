@@ -0,0 +1,264 @@
+"""
+Columnar snapshots of the clinical tables for offline analytics.
+
+``appointments``, ``triage_records``, ``alerts`` and ``patients`` are dumped
+into ``SNAPSHOT_DIR/<table>/<YYYY-MM>/``, one file per column plus a small
+``_meta.json``. Integers, floats, booleans and timestamps are typed NumPy
+arrays (``int64``/``float64``/``bool``/``datetime64[us]``; ``float64`` with NaN
+or NaT when the month has NULLs) saved uncompressed so they can be memory
+mapped. Text is the bulk of every table and is always decoded in full, so it
+is stored as zlib-compressed UTF-8 plus an offsets array.
+
+Partitions are keyed on each table's timestamp column. Runs are incremental:
+``_state.json`` records the newest month written per table, and the next run
+rewrites that month (it may have been incomplete) and appends any later ones.
+A row whose timestamp changed would also leave a stale copy in its old month,
+so older months holding any of the ids just written are exported again. Other
+edits to rows in already-closed months are only picked up by ``--full``.
+
+``load_columns`` opens just the requested column files, numeric ones with
+``np.load(mmap_mode="r")``, so analysts never touch ``vitals_hub.db`` and a
+month's numeric columns are paged in from disk only as they are used.
+
+    python snapshots.py          # incremental
+    python snapshots.py --full   # rebuild every partition
+"""
+import hashlib
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+
+import database
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+BATCH_SIZE = 5000
+UNDATED = "undated"
+STATE_FILE = "_state.json"
+META_FILE = "_meta.json"
+# Hashes of each partition's row ids, used to find rows that moved to another month
+IDS_FILE = "_ids.npy"
+
+# table -> timestamp column used for month partitioning
+TABLES = {
+    "appointments": "created_at",
+    "triage_records": "timestamp",
+    "alerts": "timestamp",
+    "patients": "registration_date",
+}
+
+
+def _kind(column) -> str:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return "str"
+    return {int: "int64", float: "float64", bool: "bool", datetime: "datetime64[us]"}.get(python_type, "str")
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _id_hashes(ids) -> np.ndarray:
+    """Sorted 64-bit hashes of row ids (a collision only costs an extra re-export)"""
+    hashes = [int.from_bytes(hashlib.blake2b(str(i).encode(), digest_size=8).digest(), "little", signed=True)
+              for i in ids]
+    return np.sort(np.array(hashes, dtype=np.int64))
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _save_column(directory: str, name: str, kind: str, values: list) -> str:
+    """Write one column; returns the dtype it was stored as"""
+    path = os.path.join(directory, name)
+    if kind == "str":
+        encoded = [None if value is None else str(value).encode() for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value or b"") for value in encoded], out=offsets[1:])
+        np.save(f"{path}.npy", offsets)
+        with open(f"{path}.utf8.z", "wb") as f:
+            f.write(zlib.compress(b"".join(value or b"" for value in encoded), 6))
+        if any(value is None for value in encoded):
+            np.save(f"{path}.nulls.npy", np.array([value is None for value in encoded], dtype=bool))
+        return kind
+    if kind == "datetime64[us]":
+        values = [_naive_utc(value) for value in values]
+    elif None in values:
+        kind = "float64"
+    np.save(f"{path}.npy", np.array(values, dtype=kind))
+    return kind
+
+
+def _write_partition(table_dir: str, month: str, columns: dict, values: dict, ids: str):
+    """Write a partition next to its final path, then swap it in"""
+    final = os.path.join(table_dir, month)
+    staging = final + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    dtypes = {name: _save_column(staging, name, kind, values[name]) for name, kind in columns.items()}
+    np.save(os.path.join(staging, IDS_FILE), _id_hashes(values[ids]))
+    with open(os.path.join(staging, META_FILE), "w") as f:
+        json.dump({"rows": len(values[ids]), "columns": list(columns), "dtypes": dtypes}, f)
+    if os.path.exists(final):
+        retired = final + ".old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.replace(final, retired)
+        os.replace(staging, final)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, final)
+
+
+def _next_month(month: str) -> datetime:
+    start = datetime.strptime(month, "%Y-%m")
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def snapshot_table(conn, name: str, since_month: str = None, snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """Dump ``name`` from ``since_month`` (inclusive) onwards; returns rows written per partition"""
+    table = database.Base.metadata.tables[name]
+    ts = table.c[TABLES[name]]
+    columns = {column.name: _kind(column) for column in table.c}
+    ids = table.primary_key.columns.values()[0].name
+    table_dir = os.path.join(snapshot_dir, name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    written = {}
+    rewritten_ids = []
+
+    def flush(month, values):
+        _write_partition(table_dir, month, columns, values, ids)
+        written[month] = len(values[ids])
+        rewritten_ids.extend(values[ids])
+
+    def dump(query):
+        # Rows arrive in timestamp order, so only one month is buffered at a time
+        month, values = None, None
+        for row in conn.execution_options(yield_per=BATCH_SIZE).execute(query.order_by(ts)):
+            row_month = row._mapping[ts].strftime("%Y-%m")
+            if row_month != month:
+                if month:
+                    flush(month, values)
+                month, values = row_month, {column: [] for column in columns}
+            for column, value in zip(columns, row):
+                values[column].append(value)
+        if month:
+            flush(month, values)
+
+    query = select(*table.c).where(ts.is_not(None))
+    dump(query.where(ts >= datetime.strptime(since_month, "%Y-%m")) if since_month else query)
+
+    # Rows without a timestamp can't be placed in a month; they are small and rewritten every run
+    undated = {column: [] for column in columns}
+    for row in conn.execute(select(*table.c).where(ts.is_(None))):
+        for column, value in zip(columns, row):
+            undated[column].append(value)
+    if undated[ids] or os.path.exists(os.path.join(table_dir, UNDATED)):
+        flush(UNDATED, undated)
+
+    # Closed months still holding a copy of a row just written elsewhere lost it since their export
+    if since_month and rewritten_ids:
+        moved = _id_hashes(rewritten_ids)
+        for month in list_partitions(name, snapshot_dir):
+            if month == UNDATED or month >= since_month:
+                continue
+            if np.isin(np.load(os.path.join(table_dir, month, IDS_FILE), mmap_mode="r"), moved).any():
+                written[month] = 0
+                dump(query.where(ts >= datetime.strptime(month, "%Y-%m"), ts < _next_month(month)))
+                if not written[month]:
+                    shutil.rmtree(os.path.join(table_dir, month))
+    return written
+
+
+def run_snapshot(full: bool = False, snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """Snapshot every table, incrementally unless ``full``"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    state_path = os.path.join(snapshot_dir, STATE_FILE)
+    state = {} if full else _read_json(state_path, {})
+    report = {}
+    for name in TABLES:
+        if full:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+        # One read transaction per table gives a consistent view while writers carry on
+        with database.engine.connect() as conn:
+            written = snapshot_table(conn, name, state.get(name), snapshot_dir)
+        dated = [month for month in written if month != UNDATED]
+        if dated:
+            state[name] = max(dated)
+        report[name] = written
+    state["last_run"] = datetime.now().isoformat()
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+    return report
+
+
+def list_partitions(table: str, snapshot_dir: str = SNAPSHOT_DIR) -> list:
+    table_dir = os.path.join(snapshot_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(
+        entry for entry in os.listdir(table_dir)
+        if os.path.isfile(os.path.join(table_dir, entry, META_FILE))
+    )
+
+
+def _load_column(partition: str, name: str, dtype: str) -> np.ndarray:
+    path = os.path.join(partition, name)
+    if dtype != "str":
+        return np.load(f"{path}.npy", mmap_mode="r")
+    offsets = np.load(f"{path}.npy", mmap_mode="r").tolist()
+    with open(f"{path}.utf8.z", "rb") as f:
+        data = zlib.decompress(f.read())
+    values = np.array([data[start:end].decode() for start, end in zip(offsets, offsets[1:])], dtype=object)
+    if os.path.exists(f"{path}.nulls.npy"):
+        values[np.load(f"{path}.nulls.npy")] = None
+    return values
+
+
+def load_columns(table: str, columns: list, months: list = None, snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """Requested columns as arrays across partitions (all months by default)
+
+    A single month's numeric and timestamp columns are returned as read-only
+    memory maps; several months are concatenated into one array. Text columns
+    are decoded into object arrays with None for NULL.
+    """
+    parts = {column: [] for column in columns}
+    for month in months or list_partitions(table, snapshot_dir):
+        partition = os.path.join(snapshot_dir, table, month)
+        meta = _read_json(os.path.join(partition, META_FILE), None)
+        if meta is None:
+            continue
+        for column in columns:
+            if column not in meta["dtypes"]:
+                raise KeyError(f"Unknown column {table}.{column}")
+            parts[column].append(_load_column(partition, column, meta["dtypes"][column]))
+    result = {}
+    for column, arrays in parts.items():
+        if len(arrays) == 1:
+            result[column] = arrays[0]
+        else:
+            result[column] = np.concatenate(arrays) if arrays else np.empty(0, dtype=object)
+    return result
+
+if __name__ == "__main__":
+    import sys
+
+    report = run_snapshot(full="--full" in sys.argv)
+    for name, written in report.items():
+        summary = ", ".join(f"{month}: {rows}" for month, rows in sorted(written.items())) or "no new rows"
+        print(f"{name}: {summary}")
+    print(f"Snapshots written to {SNAPSHOT_DIR}")
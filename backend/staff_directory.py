@@ -0,0 +1,161 @@
+"""
+Server-side staff directory over doctors and nurses.
+
+Doctors and nurses are projected onto one row shape and queried separately.
+Pages are keyset cursors over ``(sort key, user_id)``: each kind seeks past the
+cursor on the raw sort column and reads at most one page, then the two pages
+are merged. The seeks walk ``(role, name, id)`` on users (``(role, is_active,
+name, id)`` when filtering on active status) or ``(department, user_id)`` /
+``(created_at, user_id)`` on doctors and nurses, so deep pages cost the same as
+the first. A department, shift or specialization filter is served by its own
+index when sorting on another column, at the cost of sorting its matches.
+Rows whose sort key is NULL (no department) come first, or last when
+descending.
+"""
+import heapq
+
+from sqlalchemy import select, literal, null, cast, tuple_, String
+
+from database import User, Doctor, Nurse
+from pagination import InvalidCursor, encode_cursor, decode_cursor
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+STAFF_KINDS = ("doctor", "nurse")
+SORT_FIELDS = ("name", "department", "created_at")
+
+
+def _doctor_rows(filters: dict):
+    query = select(
+        Doctor.id.label("id"),
+        Doctor.user_id.label("user_id"),
+        literal("doctor").label("kind"),
+        User.name.label("name"),
+        User.username.label("username"),
+        User.email.label("email"),
+        User.phone.label("phone"),
+        Doctor.department.label("department"),
+        null().label("shift"),
+        Doctor.specialization.label("specialization"),
+        Doctor.license_number.label("license_number"),
+        Doctor.is_available.label("is_available"),
+        User.is_active.label("is_active"),
+        Doctor.created_at.label("created_at"),
+    ).join(User, User.id == Doctor.user_id)
+    if filters.get("department") is not None:
+        query = query.where(Doctor.department == filters["department"])
+    if filters.get("specialization") is not None:
+        query = query.where(Doctor.specialization == filters["specialization"])
+    if filters.get("is_active") is not None:
+        query = query.where(User.is_active == filters["is_active"])
+    return query.where(User.role == "doctor")
+
+
+def _nurse_rows(filters: dict):
+    query = select(
+        Nurse.id.label("id"),
+        Nurse.user_id.label("user_id"),
+        literal("nurse").label("kind"),
+        User.name.label("name"),
+        User.username.label("username"),
+        User.email.label("email"),
+        User.phone.label("phone"),
+        Nurse.department.label("department"),
+        Nurse.shift.label("shift"),
+        null().label("specialization"),
+        Nurse.license_number.label("license_number"),
+        Nurse.is_available.label("is_available"),
+        User.is_active.label("is_active"),
+        Nurse.created_at.label("created_at"),
+    ).join(User, User.id == Nurse.user_id)
+    if filters.get("department") is not None:
+        query = query.where(Nurse.department == filters["department"])
+    if filters.get("shift") is not None:
+        query = query.where(Nurse.shift == filters["shift"])
+    if filters.get("is_active") is not None:
+        query = query.where(User.is_active == filters["is_active"])
+    return query.where(User.role == "nurse")
+
+
+def _sort_columns(kind: str, sort_field: str):
+    """Column a kind's rows are ordered by, and its tie-breaker, both covered by one index"""
+    if sort_field == "name":
+        return User.name, User.id
+    table = Doctor if kind == "doctor" else Nurse
+    return getattr(table, sort_field), table.user_id
+
+
+def _page_of(db, kind: str, filters: dict, sort_field: str, after, descending: bool, limit: int) -> list:
+    """Up to ``limit`` rows of one kind past the cursor ``after``, in page order"""
+    column, tiebreak = _sort_columns(kind, sort_field)
+    query = _doctor_rows(filters) if kind == "doctor" else _nurse_rows(filters)
+    query = query.add_columns(cast(column, String).label("sort_key"))
+    if descending:
+        query = query.order_by(column.desc(), tiebreak.desc())
+    else:
+        query = query.order_by(column, tiebreak)
+
+    # NULL keys sort first; each segment is read separately so both stay range scans on the index
+    segments = [(False, column.is_not(None))]
+    if column.nullable:
+        segments.insert(0, (True, column.is_(None)))
+    if descending:
+        segments.reverse()
+    current, bound = 0, None
+    if after is not None:
+        value, last_id = after
+        current = next((i for i, (nulls, _) in enumerate(segments) if nulls == (value is None)), None)
+        if current is None:
+            raise InvalidCursor("Malformed cursor")
+        if value is None:
+            bound = tiebreak < last_id if descending else tiebreak > last_id
+        else:
+            position, cursor_position = tuple_(column, tiebreak), tuple_(literal(value, String), literal(last_id))
+            bound = position < cursor_position if descending else position > cursor_position
+
+    rows = []
+    for i in range(current, len(segments)):
+        segment = query.where(segments[i][1])
+        if i == current and bound is not None:
+            segment = segment.where(bound)
+        rows += db.execute(segment.limit(limit - len(rows))).mappings().all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def _position(row) -> tuple:
+    return (row["sort_key"] is not None, row["sort_key"] or "", row["user_id"])
+
+
+def list_staff(db, filters: dict, kind: str = None, sort: str = "name", cursor: str = None,
+               limit: int = DEFAULT_LIMIT) -> dict:
+    """One page of the staff directory; ``sort`` may be prefixed with '-' for descending"""
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    # A shift only applies to nurses and a specialization only to doctors
+    kinds = [kind] if kind else list(STAFF_KINDS)
+    if filters.get("shift") is not None:
+        kinds = [k for k in kinds if k == "nurse"]
+    if filters.get("specialization") is not None:
+        kinds = [k for k in kinds if k == "doctor"]
+    if not kinds:
+        return {"items": [], "next_cursor": None}
+
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if len(after) != 2 or not isinstance(after[1], str):
+            raise InvalidCursor("Malformed cursor")
+
+    pages = [_page_of(db, k, filters, sort_field, after, descending, limit + 1) for k in kinds]
+    rows = list(heapq.merge(*pages, key=_position, reverse=descending))[:limit + 1]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1]["sort_key"], rows[-1]["user_id"]]) if has_more else None
+    return {
+        "items": [{key: value for key, value in row.items() if key != "sort_key"} for row in rows],
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,89 @@
+"""
+Alert coalescing and escalation tests against an in-memory database.
+
+    python -m pytest test_alerts.py -q
+"""
+import os
+import sys
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import alert_coalescing
+import crud
+import escalation
+import schemas
+import unread_counts
+from database import Base, User, Alert
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    for username, role in [("nurse_a", "nurse"), ("nurse_b", "nurse"), ("admin", "administrator")]:
+        db.add(User(id=username, username=username, email=f"{username}@example.com", name=username,
+                    role=role, hashed_password="x"))
+    db.commit()
+    db.close()
+    yield factory
+    alert_coalescing.coalescer.clear()
+    escalation.escalator.queue.clear()
+    unread_counts.counter.invalidate()
+    engine.dispose()
+
+
+def _emergency(user_id, title="Critical vitals"):
+    return schemas.AlertCreate(alert_type="emergency", title=title, message="SpO2 84%", user_id=user_id)
+
+
+def test_repeats_coalesce_onto_the_unread_alert(session_factory):
+    db = session_factory()
+    first = crud.create_alert(db, _emergency("nurse_a"), escalate=False)
+    db.query(Alert).filter(Alert.id == first.id).update({Alert.timestamp: datetime(2026, 1, 5, 9, 0)})
+    db.commit()
+    first = crud.get_alert(db, first.id)
+    assert first.last_seen_at is None
+    second = crud.create_alert(db, _emergency("nurse_a"), escalate=False)
+    assert second.id == first.id
+    assert second.occurrence_count == 2
+    assert second.timestamp == first.timestamp
+    assert second.last_seen_at is not None
+    assert db.query(Alert).count() == 1
+
+    # A repeat after ``before`` keeps the alert unread
+    assert crud.mark_alerts_read(db, "nurse_a", before=datetime(2026, 1, 6)) == []
+    db.close()
+
+
+def test_escalations_of_two_originals_to_one_recipient_stay_separate(session_factory):
+    db = session_factory()
+    originals = [crud.create_alert(db, _emergency(user_id)) for user_id in ("nurse_a", "nurse_b")]
+    payloads = {original.id: {"user_id": original.user_id, "title": original.title, "message": original.message}
+                for original in originals}
+    db.close()
+
+    engine = escalation.escalator
+    engine.session_factory = session_factory
+    level = escalation.ESCALATION_LEVELS.index("administrators")
+    for alert_id, payload in payloads.items():
+        engine._fire(alert_id, dict(payload, level=level))
+
+    db = session_factory()
+    copies = db.query(Alert).filter(Alert.user_id == "admin").all()
+    assert sorted(copy.escalated_from for copy in copies) == sorted(payloads)
+    assert all(copy.occurrence_count == 1 for copy in copies)
+
+    # Reading one copy stops only its own original's chain
+    crud.mark_alert_read(db, copies[0].id)
+    assert not engine.is_tracked(copies[0].escalated_from)
+    assert engine.is_tracked(copies[1].escalated_from)
+    db.close()
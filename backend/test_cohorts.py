@@ -0,0 +1,111 @@
+"""
+Cohort analytics tests: grouped statistics match a straightforward NumPy
+computation, refreshes are incremental, and free-text genders stay bounded.
+
+    python -m pytest test_cohorts.py -q
+"""
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import cohorts
+from database import Base, Patient, TriageRecord
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _add(engine, patients, triage):
+    db = sessionmaker(bind=engine)()
+    db.add_all(Patient(id=patient_id, age=age, gender=gender) for patient_id, age, gender in patients)
+    db.add_all(TriageRecord(patient_id=patient_id, heart_rate=heart_rate, priority=priority, symptoms=symptoms)
+               for patient_id, heart_rate, priority, symptoms in triage)
+    db.commit()
+    db.close()
+
+
+def _dataset(seed=7, patients=200, records=2000):
+    rng = np.random.default_rng(seed)
+    people = [(f"p{i}", int(rng.integers(1, 90)), str(rng.choice(["Male", "female", "FEMALE ", None])))
+              for i in range(patients)]
+    people = [(patient_id, age, None if gender == "None" else gender) for patient_id, age, gender in people]
+    triage = [(f"p{rng.integers(patients)}", int(rng.integers(50, 140)), str(rng.choice(cohorts.PRIORITIES)),
+               str(rng.choice(["chest pain", "fever and cough", "Severe chest pain", "headache"])))
+              for _ in range(records)]
+    return people, triage
+
+
+def _band(age):
+    return cohorts.AGE_BAND_LABELS[np.digitize(age, cohorts.AGE_BANDS) - 1]
+
+
+def _gender(gender):
+    return (gender or "unknown").strip().lower()
+
+
+def test_vitals_distribution_matches_numpy(engine):
+    people, triage = _dataset()
+    _add(engine, people, triage)
+    store = cohorts.CohortStore()
+    store.refresh(engine)
+
+    profile = {patient_id: (_band(age), _gender(gender)) for patient_id, age, gender in people}
+    expected = {}
+    for patient_id, heart_rate, _, _ in triage:
+        expected.setdefault(profile[patient_id], []).append(heart_rate)
+
+    rows = store.vitals_distribution("heart_rate")
+    assert {(row["age_band"], row["gender"]) for row in rows} == set(expected)
+    for row in rows:
+        values = expected[(row["age_band"], row["gender"])]
+        assert row["count"] == len(values)
+        assert row["mean"] == pytest.approx(np.mean(values), abs=0.01)
+        for q, value in row["percentiles"].items():
+            assert value == pytest.approx(np.percentile(values, float(q)), abs=0.01)
+
+
+def test_critical_rates_and_incremental_refresh(engine):
+    people, triage = _dataset(records=500)
+    _add(engine, people, triage)
+    store = cohorts.CohortStore()
+    store.refresh(engine)
+
+    def expected(rows):
+        matching = [priority for _, _, priority, symptoms in rows if "chest" in symptoms.lower()]
+        return len(matching), matching.count("critical")
+
+    [rate] = store.critical_rates(("Chest",))
+    assert (rate["records"], rate["critical"]) == expected(triage)
+
+    more = [("p0", 120, "critical", "chest pain")] * 3
+    _add(engine, [], more)
+    assert store.refresh(engine) == {"patients": 0, "triage_records": 3}
+    [rate] = store.critical_rates(("chest",))
+    assert (rate["records"], rate["critical"]) == expected(triage + more)
+
+
+def test_gender_labels_are_capped(engine):
+    count = cohorts.MAX_GENDERS + 200
+    _add(engine, [(f"p{i}", 30, f"gender {i}") for i in range(count)], [])
+    store = cohorts.CohortStore()
+    store.refresh(engine)
+
+    assert len(store.genders) == cohorts.MAX_GENDERS + 1
+    assert store.genders[-1] == cohorts.OTHER
+    summary = store.summary()
+    assert sum(cohort["count"] for cohort in summary["cohorts"]) == count
+    [other] = [cohort for cohort in summary["cohorts"] if cohort["gender"] == cohorts.OTHER]
+    assert other["count"] == count - (cohorts.MAX_GENDERS - 1)
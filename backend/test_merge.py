@@ -0,0 +1,85 @@
+"""
+Patient merge tests: everything linked to the duplicate moves to the primary.
+
+    python -m pytest test_merge.py -q
+"""
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import alert_coalescing
+import crud
+import duplicates
+import escalation
+import schemas
+import unread_counts
+from database import Base, User, Patient, PatientSummary, Appointment, TriageRecord, Alert
+from people_index import people
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    for patient_id, user_id in session.query(Patient.id, Patient.user_id):
+        duplicates.index.remove(patient_id)
+        people.remove(user_id)
+    session.close()
+    alert_coalescing.coalescer.clear()
+    escalation.escalator.queue.clear()
+    unread_counts.counter.invalidate()
+    engine.dispose()
+
+
+def _patient(db, key, name, **profile):
+    user = User(id=f"u-{key}", username=key, email=f"{key}@example.com", name=name, role="patient",
+                hashed_password="x")
+    db.add(user)
+    db.commit()
+    people.add(user)
+    return crud.create_patient(db, schemas.PatientCreate(user_id=user.id, **profile)).id
+
+
+def test_merge_moves_appointments_triage_and_alerts(db):
+    primary = _patient(db, "primary", "Jane Doe", age=41, medical_history="asthma")
+    duplicate = _patient(db, "duplicate", "Jane  Doe", contact_number="+1 555 0100", medical_history="penicillin")
+    for day in ("2026-03-01", "2026-03-08"):
+        db.add(Appointment(patient_id="u-duplicate", date=day, time="09:00", appointment_type="consultation"))
+    db.add(Appointment(patient_id="u-primary", date="2026-03-02", time="10:00", appointment_type="consultation"))
+    db.add(TriageRecord(patient_id=duplicate, priority="high", symptoms="fever"))
+    db.commit()
+    alert = crud.create_alert(db, schemas.AlertCreate(alert_type="emergency", title="Critical vitals",
+                                                      message="SpO2 84%", user_id="u-duplicate"))
+    alert_id = alert.id
+    assert crud.get_unread_alert_count(db, "u-duplicate") == 1
+
+    result = crud.merge_patients(db, primary, duplicate)
+
+    assert result["moved"] == {"appointments": 2, "triage_records": 1, "alerts": 1}
+    assert db.query(Appointment).filter(Appointment.patient_id == "u-primary").count() == 3
+    assert db.query(TriageRecord).filter(TriageRecord.patient_id == primary).count() == 1
+    assert db.query(Alert).filter(Alert.user_id == "u-primary").count() == 1
+    assert db.get(Patient, duplicate) is None and db.get(User, "u-duplicate") is None
+
+    merged = result["patient"]
+    assert (merged.age, merged.contact_number) == (41, "+1 555 0100")
+    assert merged.medical_history == "asthma\npenicillin"
+    summary = db.query(PatientSummary).filter(PatientSummary.patient_id == primary).one()
+    assert (summary.appointment_count, summary.triage_count) == (3, 1)
+
+    # In-memory state follows the move
+    assert crud.get_unread_alert_count(db, "u-primary") == 1
+    assert escalation.escalator.is_tracked(alert_id)
+    payload = next(payload for _, _, key, payload in escalation.escalator.queue._heap if key == alert_id)
+    assert payload["user_id"] == "u-primary"
+    assert [person["id"] for person in people.search("jane")] == ["u-primary"]
+    assert [match["patient_id"] for match in crud.find_duplicate_patients("Jane Doe")] == [primary]
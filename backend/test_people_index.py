@@ -0,0 +1,54 @@
+"""
+Typeahead index tests, including prefixes shared by more people than a single
+lookup scans (``MAX_SCAN``).
+
+    python -m pytest test_people_index.py -q
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import people_index
+
+
+def _user(user_id, name, role="patient", is_active=True):
+    username = name.lower().replace(" ", ".")
+    return SimpleNamespace(id=user_id, name=name, username=username, email=f"{username}@example.com",
+                           role=role, is_active=is_active)
+
+
+def _index(users):
+    index = people_index.PeopleIndex()
+    for user in users:
+        index.add(user)
+    return index
+
+
+def test_prefix_lookup_ranks_exact_terms_first():
+    index = _index([_user("1", "Ann Smithson"), _user("2", "Ann Smith"), _user("3", "Bob Smith", role="doctor")])
+    assert [person["id"] for person in index.search("smith")] == ["2", "3", "1"]
+    assert [person["id"] for person in index.search("smith", roles=["doctor"])] == ["3"]
+    assert index.search("smith ann")[0]["id"] == "2"
+
+
+def test_lookup_finds_rare_word_past_max_scan_of_a_common_one():
+    count = people_index.MAX_SCAN * 2
+    users = [_user(str(i), f"John Doe{i:05d}") for i in range(count)]
+    users.append(_user("target", "John Zebulon"))
+    index = _index(users)
+
+    assert [person["id"] for person in index.search("john zeb")] == ["target"]
+    assert [person["id"] for person in index.search("zeb john")] == ["target"]
+    assert len(index.search("john", limit=people_index.MAX_LIMIT)) == people_index.MAX_LIMIT
+
+
+def test_inactive_and_removed_people_are_not_returned():
+    index = _index([_user("1", "Ann Smith"), _user("2", "Ann Smyth")])
+    index.set_active("1", False)
+    index.remove("2")
+    assert index.search("ann") == []
+    index.set_active("1", True)
+    assert [person["id"] for person in index.search("ann")] == ["1"]
@@ -0,0 +1,136 @@
+"""
+Query-budget tests: hot API routes must stay within their statement budgets
+and must not repeat one statement per row (N+1).
+
+The app runs with ``QUERY_BUDGET_MODE=raise`` against a copy of the ``small``
+generated dataset, so any request that exceeds its ``@query_budget.limit`` (or
+``QUERY_BUDGET_DEFAULT``) or repeats a fingerprint ``QUERY_BUDGET_REPEATS``
+times fails here with the offending statement.
+
+    python -m pytest test_query_budgets.py -q
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+
+from bench_crud import dataset_path
+from bench_http import DEFAULT_PASSWORD
+
+ROLES = {"administrator": "admin_0", "doctor": "doctor_0", "nurse": "nurse_0", "patient": "patient_0"}
+
+
+def _book(ids):
+    return {"doctor_id": ids["doctor_user_id"], "date": str(date.today() + timedelta(days=3)), "time": "10:00",
+            "appointment_type": "consultation", "condition": "persistent cough"}
+
+
+def _triage(ids):
+    return {"patient_id": ids["patient_id"], "nurse_id": ids["nurse"], "blood_pressure": "130/85",
+            "heart_rate": 90, "temperature": 37.8, "oxygen_saturation": 96, "respiratory_rate": 18,
+            "symptoms": "fever and cough", "priority": "medium"}
+
+
+# (role, method, url, body); urls and bodies are formatted with ids from the dataset
+CASES = [
+    ("nurse", "GET", "/triage/", None),
+    ("nurse", "GET", "/triage/?status=pending", None),
+    ("nurse", "GET", "/triage/?priority=critical", None),
+    ("nurse", "POST", "/triage/", _triage),
+    ("nurse", "GET", "/patients/?limit=100", None),
+    ("nurse", "GET", "/patients/{patient_id}", None),
+    ("nurse", "GET", "/patients/{patient_id}/timeline?limit=50", None),
+    ("nurse", "GET", "/alerts/", None),
+    ("nurse", "GET", "/alerts/unread-count", None),
+    ("nurse", "GET", "/dashboard/stats", None),
+    ("doctor", "GET", "/appointments/", None),
+    ("doctor", "GET", "/appointments/search?limit=50", None),
+    ("doctor", "GET", "/dashboard/stats", None),
+    ("patient", "GET", "/appointments/", None),
+    ("patient", "GET", "/dashboard/stats", None),
+    ("patient", "GET", "/doctors/available", None),
+    ("patient", "POST", "/appointments/book", _book),
+    ("administrator", "GET", "/appointments/?limit=100", None),
+    ("administrator", "GET", "/users/", None),
+    ("administrator", "GET", "/admin/doctors/", None),
+    ("administrator", "GET", "/admin/nurses/", None),
+    ("administrator", "GET", "/admin/staff/?limit=50", None),
+    ("administrator", "GET", "/admin/users/", None),
+    ("administrator", "GET", "/doctors/", None),
+    ("administrator", "GET", "/search?q=pain&limit=20", None),
+    ("administrator", "GET", "/analytics/appointments?interval=month", None),
+    ("administrator", "GET", "/dashboard/stats", None),
+]
+
+
+def _use_database(path: str):
+    """Point the app at ``path``, whether or not ``database`` was imported already"""
+    url = f"sqlite:///{path}"
+    if "database" not in sys.modules:
+        os.environ["VITALS_DATABASE_URL"] = url
+    import database
+    if str(database.engine.url) != url:
+        database.engine = create_engine(url, connect_args={"check_same_thread": False})
+        database.SessionLocal.configure(bind=database.engine)
+
+
+@pytest.fixture(scope="module")
+def api():
+    source = dataset_path("small", os.path.join(tempfile.gettempdir(), "vitals_bench_data"), 7)
+    path = os.path.join(tempfile.mkdtemp(prefix="vitals_budget_"), "budget.db")
+    shutil.copyfile(source, path)
+    _use_database(path)
+
+    from fastapi.testclient import TestClient
+    import main
+    import query_budget
+    from database import SessionLocal, User, Patient
+
+    mode = query_budget.QUERY_BUDGET_MODE
+    query_budget.QUERY_BUDGET_MODE = "raise"
+    with TestClient(main.app) as client:
+        headers = {}
+        for role, username in ROLES.items():
+            response = client.post("/auth/login",
+                                   json={"username": username, "password": DEFAULT_PASSWORD, "role": role})
+            assert response.status_code == 200, response.text
+            headers[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        db = SessionLocal()
+        try:
+            users = {row.username: row.id for row in db.query(User.username, User.id).filter(
+                User.username.in_(ROLES.values()))}
+            ids = {
+                "patient_id": db.query(Patient.id).filter(Patient.user_id == users["patient_0"]).scalar(),
+                "doctor_user_id": users["doctor_0"],
+                "nurse": users["nurse_0"],
+            }
+        finally:
+            db.close()
+        yield client, headers, ids
+    query_budget.QUERY_BUDGET_MODE = mode
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+@pytest.mark.parametrize("role, method, url, body", CASES,
+                         ids=[f"{role}:{method} {url}" for role, method, url, _ in CASES])
+def test_route_within_query_budget(api, role, method, url, body):
+    client, headers, ids = api
+    response = client.request(method, url.format(**ids), json=body(ids) if body else None, headers=headers[role])
+    assert response.status_code < 400, response.text
+
+
+def test_n_plus_one_is_detected(api):
+    import query_budget
+
+    log = query_budget.QueryLog({"method": "GET", "path": "/example"})
+    with pytest.raises(query_budget.QueryBudgetExceeded, match="N\\+1"):
+        for i in range(query_budget.QUERY_BUDGET_REPEATS):
+            log.record(f"SELECT users.name FROM users WHERE users.id = '{random.random()}' AND 1 = {i}")
@@ -0,0 +1,161 @@
+"""
+Query-plan regression tests for the hot ``crud`` queries.
+
+Each case calls a crud function against a generated dataset, captures every
+statement it emits, and runs ``EXPLAIN QUERY PLAN`` on it with the same
+parameters. A case fails when a plan does a full table scan (``SCAN <table>``
+without an index) or builds a temp B-tree to sort, group or de-duplicate,
+unless that exact finding is listed in ``ALLOWED`` with the reason it is
+intentional.
+
+    VITALS_QUERY_PLANS=1 python -m pytest test_query_plans.py -q
+    python test_query_plans.py                      # print every plan
+
+Plans depend on table statistics, so the dataset is the ``medium`` bench_crud
+dataset (generated on first use, about 20 seconds): with only a handful of
+doctors SQLite rightly prefers scanning tiny tables. That is too slow for the
+default test run, so the module is skipped unless ``VITALS_QUERY_PLANS=1`` or
+``QUERY_PLAN_DB`` is set. ``QUERY_PLAN_DB`` checks plans against another
+SQLite file.
+"""
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import crud
+import patient_summaries
+from bench_crud import BENCHMARKS, Database, dataset_path, _pick
+from database import Appointment
+
+pytestmark = pytest.mark.skipif(
+    not (os.getenv("VITALS_QUERY_PLANS") or os.getenv("QUERY_PLAN_DB")),
+    reason="set VITALS_QUERY_PLANS=1 to check query plans against the medium dataset",
+)
+
+# Benchmarks whose queries are checked, plus cases only this module cares about
+CASES = dict(BENCHMARKS)
+CASES.update({
+    "get_user_by_username": lambda db, context, i: crud.get_user_by_username(db, "patient_1"),
+    "get_appointments_by_date": lambda db, context, i: crud.get_appointments_by_date(db, str(date.today())),
+    "get_triage_records_by_priority[critical]": lambda db, context, i: crud.get_triage_records_by_priority(
+        db, "critical"),
+    "get_patient_summary_by_user_id": lambda db, context, i: crud.get_patient_summary_by_user_id(
+        db, _pick(context, "patient_user_ids", i)),
+    "get_unread_alert_count": lambda db, context, i: crud.get_unread_alert_count(
+        db, _pick(context, "nurse_user_ids", i)),
+    "mark_alerts_read": lambda db, context, i: crud.mark_alerts_read(db, _pick(context, "nurse_user_ids", i)),
+    "attach_appointment_names": lambda db, context, i: crud.attach_appointment_names(
+        db, db.query(Appointment).limit(50).all()),
+    "patient_summaries.refresh": lambda db, context, i: patient_summaries.refresh(
+        db, user_id=_pick(context, "patient_user_ids", i)),
+})
+
+# case -> {finding: reason}; "*" applies to every case. Findings are the offending plan lines.
+ALLOWED = {
+    "*": {
+        "SCAN priorities": "three-row lookup table; keyword matching happens in Python",
+    },
+    "get_doctors_with_users": {
+        "SCAN doctors": "unfiltered, LIMITed directory page",
+    },
+    "get_patients_with_users": {
+        "SCAN patients": "unfiltered, LIMITed patient page",
+    },
+    "attach_appointment_names": {
+        "SCAN appointments": "the fixture's own unfiltered LIMIT 50 page",
+    },
+}
+
+_SCAN = re.compile(r"^SCAN (\w+)$")
+_TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR ")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH", "INSERT OR REPLACE INTO PATIENT_SUMMARIES")
+
+
+def plan_findings(plan_details) -> list:
+    """Full table scans and temp B-trees in an ``EXPLAIN QUERY PLAN``"""
+    findings = []
+    for detail in plan_details:
+        if _SCAN.match(detail) or _TEMP_BTREE.search(detail):
+            findings.append(detail)
+    return findings
+
+
+def capture(database: Database, fn, context: dict) -> list:
+    """Run one case in a rolled-back transaction; returns ``(statement, parameters)`` it executed"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+            statements.append((statement, parameters))
+
+    with database.engine.connect() as connection:
+        outer = connection.begin()
+        event.listen(database.engine, "before_cursor_execute", record)
+        try:
+            with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+                fn(db, context, 0)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", record)
+            outer.rollback()
+    return statements
+
+
+def explain(database: Database, statement: str, parameters) -> list:
+    with database.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in rows]
+
+
+def dataset() -> str:
+    return os.getenv("QUERY_PLAN_DB") or dataset_path(
+        "medium", os.path.join(tempfile.gettempdir(), "vitals_bench_data"), 7)
+
+
+@pytest.fixture(scope="module")
+def database():
+    database = Database(dataset())
+    yield database
+    database.engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def context(database):
+    import random
+    return database.context(random.Random(7))
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_query_plan(database, context, case):
+    statements = capture(database, CASES[case], context)
+    assert statements, f"{case} issued no queries"
+    allowed = {**ALLOWED["*"], **ALLOWED.get(case, {})}
+    problems = []
+    for statement, parameters in statements:
+        for finding in plan_findings(explain(database, statement, parameters)):
+            if finding not in allowed:
+                problems.append(f"{finding}\n    in: {' '.join(statement.split())[:300]}")
+    assert not problems, f"{case}:\n  " + "\n  ".join(problems)
+
+
+if __name__ == "__main__":
+    import random
+
+    database = Database(dataset())
+    context = database.context(random.Random(7))
+    for case in sorted(CASES):
+        print(f"== {case}")
+        for statement, parameters in capture(database, CASES[case], context):
+            print("   " + " ".join(statement.split())[:160])
+            for detail in explain(database, statement, parameters):
+                marker = "!!" if detail in plan_findings([detail]) else "  "
+                print(f"   {marker} {detail}")
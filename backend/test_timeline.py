@@ -0,0 +1,91 @@
+"""
+Patient timeline tests: paging with cursors visits every event exactly once, in
+order, in both directions, even when timestamps collide across sources and
+new events arrive between pages.
+
+    python -m pytest test_timeline.py -q
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import timeline
+from database import Base, Appointment, TriageRecord, Alert
+
+PATIENT = SimpleNamespace(id="p-1", user_id="u-1")
+START = datetime(2026, 2, 1, 8, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    # Three events per source share each minute, so most pages break inside a tie
+    for minute in range(12):
+        at = START + timedelta(minutes=minute)
+        for i in range(3):
+            session.add(Appointment(patient_id=PATIENT.user_id, date="2026-02-10", time="09:00",
+                                    appointment_type="consultation", status="pending", created_at=at))
+            session.add(TriageRecord(patient_id=PATIENT.id, priority="low", timestamp=at))
+            session.add(Alert(user_id=PATIENT.user_id, alert_type="info", title=f"Alert {minute}.{i}",
+                              message="m", timestamp=at))
+    # Another patient's events never show up
+    session.add(Alert(user_id="u-2", alert_type="info", title="Other", message="m", timestamp=START))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _pages(db, order, limit, between_pages=None):
+    events, cursor, pages = [], None, 0
+    while True:
+        page = timeline.patient_timeline(db, PATIENT, cursor=cursor, limit=limit, order=order)
+        events.extend((item["kind"], item["id"], item["timestamp"]) for item in page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return events, pages
+        if between_pages:
+            between_pages(pages)
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 5, 7, 200])
+def test_pages_cover_every_event_once_in_order(db, order, limit):
+    everything = timeline.patient_timeline(db, PATIENT, limit=timeline.MAX_LIMIT, order=order)["items"]
+    assert len(everything) == 108
+
+    events, pages = _pages(db, order, limit)
+    assert events == [(item["kind"], item["id"], item["timestamp"]) for item in everything]
+    assert pages == -(-108 // limit)
+    timestamps = [timestamp for _, _, timestamp in events]
+    assert timestamps == sorted(timestamps, reverse=order == "desc")
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_is_stable_when_events_arrive_between_pages(db, order):
+    expected, _ = _pages(db, order, 10)
+
+    def insert(page):
+        # Lands before the start of a DESC walk and after the end of an ASC one
+        newest = START + timedelta(hours=1, minutes=page)
+        db.add(Alert(user_id=PATIENT.user_id, alert_type="info", title=f"New {page}", message="m",
+                     timestamp=newest))
+        db.commit()
+
+    events, _ = _pages(db, order, 10, between_pages=insert)
+    if order == "desc":
+        assert events == expected
+    else:
+        assert events[:len(expected)] == expected
+        assert [kind for kind, _, _ in events[len(expected):]] == ["alert"] * (len(events) - len(expected))
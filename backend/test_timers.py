@@ -0,0 +1,125 @@
+"""
+Timer queue and reminder scheduler tests: cancelled and rescheduled timers must
+fire exactly once, at their latest deadline, or not at all.
+
+    python -m pytest test_timers.py -q
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from reminders import ReminderScheduler
+from timers import TimerQueue
+
+
+def _queue(**kwargs):
+    return TimerQueue("test", lambda key, payload: None, **kwargs)
+
+
+def test_cancelled_timer_never_fires():
+    queue = _queue()
+    queue.schedule("a", 10)
+    queue.schedule("b", 20)
+    assert queue.cancel("a")
+    assert not queue.cancel("a")
+    assert not queue.contains("a")
+    assert queue.pop_due(now=100) == [("b", None)]
+    assert len(queue) == 0
+
+
+def test_reschedule_replaces_the_earlier_deadline():
+    queue = _queue()
+    queue.schedule("a", 10, "first")
+    queue.schedule("a", 50, "second")
+    assert len(queue) == 1
+    assert queue.pop_due(now=20) == []
+    assert queue.pop_due(now=60) == [("a", "second")]
+    assert queue.pop_due(now=1000) == []
+
+
+def test_reschedule_earlier_fires_once():
+    queue = _queue()
+    queue.schedule("a", 50)
+    queue.schedule("a", 10)
+    assert queue.pop_due(now=20) == [("a", None)]
+    assert queue.pop_due(now=60) == []
+
+
+def test_due_entries_pop_in_deadline_order():
+    queue = _queue()
+    for key, deadline in [("c", 30), ("a", 10), ("b", 20), ("d", 40)]:
+        queue.schedule(key, deadline)
+    assert [key for key, _ in queue.pop_due(now=30)] == ["a", "b", "c"]
+    assert queue.contains("d")
+
+
+def test_churn_keeps_heap_bounded():
+    queue = _queue()
+    for i in range(10000):
+        queue.schedule("a", i)
+    assert len(queue) == 1
+    assert len(queue._heap) <= 64 + 3
+
+
+def test_full_queue_drops_new_keys_but_accepts_reschedules():
+    queue = _queue(max_entries=2)
+    assert queue.schedule("a", 10)
+    assert queue.schedule("b", 20)
+    assert not queue.schedule("c", 30)
+    assert queue.schedule("a", 40)
+    assert queue.cancel("b")
+    assert queue.schedule("c", 30)
+
+
+def test_worker_fires_rescheduled_timer_once_and_skips_cancelled():
+    fired = []
+    done = threading.Event()
+
+    def callback(key, payload):
+        fired.append(key)
+        if key == "last":
+            done.set()
+
+    queue = TimerQueue("test", callback)
+    queue.start()
+    try:
+        now = time.time()
+        queue.schedule("moved", now + 5)
+        queue.schedule("cancelled", now + 0.05)
+        queue.schedule("moved", now + 0.1)
+        queue.cancel("cancelled")
+        queue.schedule("last", now + 0.2)
+        assert done.wait(5)
+    finally:
+        queue.stop()
+    assert fired == ["moved", "last"]
+
+
+def _appointment(start: datetime, status="pending"):
+    return SimpleNamespace(id="appt-1", patient_id="patient-1", status=status,
+                           date=start.strftime("%Y-%m-%d"), time=start.strftime("%H:%M"))
+
+
+def test_reminders_follow_reschedule_and_cancel():
+    now = datetime(2026, 3, 2, 8, 0)
+    scheduler = ReminderScheduler(offsets=[60, 1440], horizon_hours=48, notifier=lambda reminder: None)
+    appointment = _appointment(now + timedelta(hours=30))
+    scheduler.schedule(appointment, now=now.timestamp())
+    assert len(scheduler.queue) == 2
+
+    # Moving the appointment replaces both reminders rather than adding to them
+    appointment = _appointment(now + timedelta(hours=3))
+    scheduler.schedule(appointment, now=now.timestamp())
+    assert len(scheduler.queue) == 1
+    due = scheduler.queue.pop_due(now=(now + timedelta(hours=2)).timestamp())
+    assert due == [(("appt-1", 60), {"appointment_id": "appt-1", "patient_id": "patient-1", "offset_minutes": 60})]
+
+    scheduler.schedule(_appointment(now + timedelta(hours=30)), now=now.timestamp())
+    scheduler.schedule(_appointment(now + timedelta(hours=30), status="cancelled"), now=now.timestamp())
+    assert len(scheduler.queue) == 0
@@ -0,0 +1,72 @@
+"""
+Wait-time estimation tests: P² sketch accuracy against exact percentiles, and
+startup seeding from completed appointments.
+
+    python -m pytest test_wait_times.py -q
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import wait_times
+from database import Base, User, Doctor, Appointment
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "exponential", "lognormal"])
+@pytest.mark.parametrize("p", [0.5, 0.9])
+def test_p2_quantile_tracks_numpy_percentile(distribution, p):
+    rng = np.random.default_rng(7)
+    samples = {
+        "uniform": lambda: rng.uniform(0, 120, 20000),
+        "exponential": lambda: rng.exponential(30, 20000),
+        "lognormal": lambda: rng.lognormal(3, 0.6, 20000),
+    }[distribution]()
+    sketch = wait_times.P2Quantile(p)
+    for value in samples:
+        sketch.add(float(value))
+
+    exact = np.percentile(samples, p * 100)
+    assert sketch.count == len(samples)
+    assert sketch.value() == pytest.approx(exact, rel=0.03)
+
+
+def test_p2_quantile_is_exact_for_the_first_five_samples():
+    sketch = wait_times.P2Quantile(0.5)
+    assert sketch.value() is None
+    for value in [40, 10, 30]:
+        sketch.add(value)
+    assert sketch.value() == np.percentile([40, 10, 30], 50)
+
+
+def test_warm_start_resolves_departments_for_both_doctor_id_forms():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        User(id="u-doctor", username="doctor", email="doctor@example.com", name="Doctor",
+             role="doctor", hashed_password="x"),
+        Doctor(id="d-doctor", user_id="u-doctor", department="Cardiology", license_number="L1"),
+    ])
+    created = datetime(2026, 1, 5, 9, 0)
+    for i, doctor_id in enumerate(["u-doctor", "d-doctor"] * 3):
+        db.add(Appointment(doctor_id=doctor_id, date="2026-01-05", time="09:00", appointment_type="consultation",
+                           status="completed", created_at=created, updated_at=created + timedelta(minutes=10 + i)))
+    db.commit()
+
+    try:
+        wait_times.warm_start(db)
+        department = wait_times.estimator.estimate(("appointment", "department", "Cardiology"))
+        assert department["samples"] == 6
+        assert wait_times.estimator.estimate(("appointment", "doctor", "d-doctor"))["samples"] == 3
+    finally:
+        wait_times.estimator.clear()
+        db.close()
+        engine.dispose()
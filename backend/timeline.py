@@ -0,0 +1,118 @@
+"""
+Chronological patient timeline across appointments, triage records and alerts.
+
+Each source is read with one keyset query that walks a ``(patient, timestamp)``
+index in order and stops after ``limit + 1`` rows, so a page never touches
+more than three small index ranges. ``heapq.merge`` interleaves the three
+already-sorted streams lazily, and the page ends as soon as enough events have
+been taken. Cursors are ``(timestamp, kind, rowid)`` of the last event, which
+totally orders events even when timestamps collide across sources.
+
+Timestamps are compared exactly as stored, so the cursor carries the raw
+column text rather than a parsed datetime.
+"""
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import text
+
+from pagination import InvalidCursor, encode_cursor, decode_cursor
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+ORDERS = {"desc": "DESC", "asc": "ASC"}
+
+# kind -> (table, owner column, owner key, timestamp column, extra columns); see ``_owner_keys``
+SOURCES = {
+    "alert": ("alerts", "user_id", "user_id", "timestamp", "alert_type, title, message, is_read"),
+    "appointment": ("appointments", "patient_id", "user_id", "created_at",
+                    "date, time, status, appointment_type, condition"),
+    "triage": ("triage_records", "patient_id", "patient_id", "timestamp",
+               "priority, status, symptoms, blood_pressure, heart_rate, temperature, "
+               "oxygen_saturation, respiratory_rate"),
+}
+
+
+def _title(kind: str, row: dict) -> str:
+    if kind == "appointment":
+        return f"Appointment {row['date']} {row['time']} ({row['status']})"
+    if kind == "triage":
+        return f"Triage ({row['priority'] or 'unknown'} priority)"
+    return row["title"]
+
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _source(db, kind: str, owner: str, direction: str, cursor, limit: int):
+    """Rows of one source in timeline order, starting after ``cursor``"""
+    table, owner_column, _, ts_column, columns = SOURCES[kind]
+    params = {"owner": owner, "limit": limit}
+    keyset = ""
+    if cursor:
+        cursor_ts, cursor_kind, cursor_rowid = cursor
+        after = "<" if direction == "DESC" else ">"
+        params["cursor_ts"] = cursor_ts
+        # Ties on timestamp are broken by kind, then rowid (the index's own order)
+        if kind == cursor_kind:
+            keyset = f"AND ({ts_column}, rowid) {after} (:cursor_ts, :cursor_rowid)"
+            params["cursor_rowid"] = cursor_rowid
+        elif (kind < cursor_kind) == (direction == "DESC"):
+            keyset = f"AND {ts_column} {after}= :cursor_ts"
+        else:
+            keyset = f"AND {ts_column} {after} :cursor_ts"
+    rows = db.execute(text(f"""
+        SELECT rowid AS row_position, id, CAST({ts_column} AS TEXT) AS ts, {columns}
+        FROM {table}
+        WHERE {owner_column} = :owner AND {ts_column} IS NOT NULL {keyset}
+        ORDER BY {ts_column} {direction}, rowid {direction}
+        LIMIT :limit
+    """), params)
+    for row in rows:
+        yield (row.ts, kind, row.row_position), dict(row._mapping)
+
+
+def _owner_keys(patient) -> dict:
+    # Appointments and alerts are keyed by the patient's user id, triage records by the patient id
+    return {"user_id": patient.user_id, "patient_id": patient.id}
+
+
+def patient_timeline(db, patient, cursor: str = None, limit: int = DEFAULT_LIMIT, order: str = "desc",
+                     kinds=None) -> dict:
+    """One page of the patient's events, newest first unless ``order == "asc"``"""
+    direction = ORDERS[order]
+    limit = max(1, min(limit, MAX_LIMIT))
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 3 or position[1] not in SOURCES:
+            raise InvalidCursor("Malformed cursor")
+
+    owners = _owner_keys(patient)
+    streams = [
+        _source(db, kind, owners[SOURCES[kind][2]], direction, position, limit + 1)
+        for kind in sorted(kinds or SOURCES)
+    ]
+    merged = heapq.merge(*streams, key=lambda event: event[0], reverse=direction == "DESC")
+    events = list(islice(merged, limit + 1))
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    items = []
+    for (ts, kind, _), row in events:
+        details = {key: value for key, value in row.items() if key not in ("row_position", "id", "ts")}
+        items.append({
+            "kind": kind,
+            "id": row["id"],
+            "timestamp": _parse_timestamp(ts),
+            "title": _title(kind, row),
+            "details": details,
+        })
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(events[-1][0]) if has_more else None,
+    }
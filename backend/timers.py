@@ -0,0 +1,120 @@
+"""
+In-process deadline scheduling.
+
+A ``TimerQueue`` keeps keyed deadlines in a binary heap and drains them from a
+single daemon thread that sleeps until the earliest deadline (or until an
+earlier one is scheduled). Scheduling and cancelling are O(log n) and O(1)
+respectively; cancelled entries are dropped lazily and the heap is compacted
+once they outnumber live entries, so memory stays proportional to the number
+of pending timers.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TimerQueue:
+    def __init__(self, name: str, callback, max_entries: int = None):
+        self.name = name
+        self.callback = callback
+        self.max_entries = max_entries
+        self._heap = []  # (deadline, seq, key, payload)
+        self._live = {}  # key -> seq of the entry currently in force
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._live)
+
+    def schedule(self, key, deadline: float, payload=None) -> bool:
+        """Schedule (or reschedule) ``key`` to fire at epoch time ``deadline``"""
+        with self._cond:
+            if key not in self._live and self.max_entries and len(self._live) >= self.max_entries:
+                logger.warning("%s timer queue full, dropping %r", self.name, key)
+                return False
+            seq = next(self._seq)
+            self._live[key] = seq
+            heapq.heappush(self._heap, (deadline, seq, key, payload))
+            self._maybe_compact()
+            # Wake the worker if this is now the earliest deadline
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+            return True
+
+    def cancel(self, key) -> bool:
+        with self._cond:
+            return self._live.pop(key, None) is not None
+
+    def contains(self, key) -> bool:
+        with self._cond:
+            return key in self._live
+
+    def update_payloads(self, update) -> int:
+        """Let ``update(key, payload)`` edit live payloads in place; returns how many it changed"""
+        with self._cond:
+            return sum(1 for _, seq, key, payload in self._heap
+                       if self._live.get(key) == seq and update(key, payload))
+
+    def clear(self):
+        with self._cond:
+            self._heap.clear()
+            self._live.clear()
+
+    def pop_due(self, now: float = None) -> list:
+        """Remove and return ``(key, payload)`` for every live entry due by ``now``"""
+        now = time.time() if now is None else now
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key, payload = heapq.heappop(self._heap)
+                if self._live.get(key) == seq:
+                    del self._live[key]
+                    due.append((key, payload))
+        return due
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [entry for entry in self._heap if self._live.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def _next_deadline(self):
+        while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-timers", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                deadline = self._next_deadline()
+                timeout = None if deadline is None else max(deadline - time.time(), 0)
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+            for key, payload in self.pop_due():
+                try:
+                    self.callback(key, payload)
+                except Exception:
+                    logger.exception("%s timer callback failed for %r", self.name, key)
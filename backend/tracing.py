@@ -0,0 +1,285 @@
+"""
+Lightweight request tracing.
+
+A sampled request gets a trace: a root span for the whole request plus child
+spans for each phase, so a slow call shows where its time went.
+
+* ``auth.*`` spans wrap token verification and the user lookup
+  (``get_current_user`` in ``main``);
+* ``endpoint`` covers the route function (business logic, including its DB
+  work), and ``serialize`` is everything FastAPI does after it returns, which
+  is response-model validation and JSON encoding (``TracedRoute``);
+* ``db`` spans are recorded for every SQL statement by engine-wide cursor
+  events, parented to whichever span was open at the time;
+* any code can add its own phase with ``with tracing.span("name"):``.
+
+Trace ids are propagated with the W3C ``traceparent`` header: an incoming
+sampled ``traceparent`` continues the caller's trace (and forces sampling),
+otherwise ``TRACE_SAMPLE_RATE`` decides. Every response carries ``X-Trace-Id``
+so logs and client reports can be matched to traces. Finished traces are kept
+in a ring buffer of ``TRACE_BUFFER_SIZE`` (served by ``/admin/traces``) and,
+when ``TRACE_FILE`` is set, appended to it as NDJSON. Unsampled requests only
+pay for one context-variable lookup per span.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent_id: str = None, attributes: dict = None):
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attributes = attributes or {}
+
+    def finish(self, end: float = None):
+        self.end = end or time.perf_counter()
+
+    def as_dict(self, origin: float) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(((self.end or self.start) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    def __init__(self, trace_id: str, name: str, parent_id: str = None):
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.root = Span(name, parent_id=parent_id)
+        self.spans = [self.root]
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+    def as_dict(self) -> dict:
+        origin = self.root.start
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": round(((self.root.end or origin) - origin) * 1000, 3),
+            "attributes": self.root.attributes,
+            "dropped_spans": self.dropped,
+            "spans": [span.as_dict(origin) for span in self.spans],
+        }
+
+
+# (trace, current span) of the request being served, or None when unsampled
+current = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record ``name`` as a child of the current span (no-op when the request is not sampled)"""
+    state = current.get()
+    if state is None:
+        yield None
+        return
+    trace, parent = state
+    child = Span(name, parent_id=parent.span_id, attributes=attributes)
+    if not trace.add(child):
+        yield None
+        return
+    token = current.set((trace, child))
+    try:
+        yield child
+    finally:
+        child.finish()
+        current.reset(token)
+
+
+class TraceStore:
+    def __init__(self, size: int = TRACE_BUFFER_SIZE, path: str = TRACE_FILE):
+        self.traces = deque(maxlen=size)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        record = trace.as_dict()
+        with self._lock:
+            self.traces.append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def slowest(self, limit: int = 20, name: str = None) -> list:
+        with self._lock:
+            records = [r for r in self.traces if name is None or r["name"] == name]
+        records.sort(key=lambda r: r["duration_ms"], reverse=True)
+        return [{key: value for key, value in r.items() if key != "spans"} | {"span_count": len(r["spans"])}
+                for r in records[:limit]]
+
+    def get(self, trace_id: str):
+        with self._lock:
+            for record in reversed(self.traces):
+                if record["trace_id"] == trace_id:
+                    return record
+        return None
+
+
+store = TraceStore()
+
+
+def _incoming(scope):
+    """(trace id, parent span id, sampled) from a W3C traceparent header"""
+    for name, value in scope.get("headers", ()):
+        if name == b"traceparent":
+            match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+            if match:
+                return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+    return None, None, False
+
+
+class TracingMiddleware:
+    def __init__(self, app, sample_rate: float = None):
+        self.app = app
+        self.sample_rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled = _incoming(scope)
+        trace_id = trace_id or _new_id(128)
+        sampled = sampled or random.random() < self.sample_rate
+        trace = Trace(trace_id, f"{scope['method']} {scope['path']}", parent_id=parent_id) if sampled else None
+        token = current.set((trace, trace.root) if trace else None)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                span_id = trace.root.span_id if trace else _new_id(64)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-trace-id", trace_id.encode()),
+                    (b"traceparent", f"00-{trace_id}-{span_id}-{'01' if trace else '00'}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current.reset(token)
+            if trace:
+                route = scope.get("route")
+                if getattr(route, "path", None):
+                    trace.root.name = f"{scope['method']} {route.path}"
+                trace.root.attributes.update({"path": scope["path"], "status": status})
+                trace.root.finish()
+                store.add(trace)
+
+
+def _traced_endpoint(endpoint):
+    """Wrap a route function in an ``endpoint`` span"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with span("endpoint", function=endpoint.__name__):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            with span("endpoint", function=endpoint.__name__):
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that records ``endpoint`` and ``serialize`` spans"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            response = await handler(request)
+            state = current.get()
+            if state is not None:
+                # After the endpoint returns FastAPI only validates and encodes the response
+                trace, parent = state
+                endpoint = next((s for s in reversed(trace.spans) if s.name == "endpoint"), None)
+                if endpoint is not None and endpoint.end is not None:
+                    serialize = Span("serialize", parent_id=parent.span_id)
+                    serialize.start = endpoint.end
+                    serialize.finish()
+                    trace.add(serialize)
+            return response
+
+        return traced_handler
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    state = current.get()
+    if state is None:
+        return
+    trace, parent = state
+    query = Span("db", parent_id=parent.span_id, attributes={"statement": " ".join(statement.split())[:300]})
+    # Dropped spans still push a placeholder so the after hook pops the right entry
+    conn.info.setdefault("trace_spans", []).append(query if trace.add(query) else None)
+
+
+def _pop_query_span(conn):
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    if current.get() is not None and spans:
+        return spans.pop()
+    return None
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    query = _pop_query_span(conn)
+    if query is not None:
+        query.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_error(context):
+    query = _pop_query_span(context.connection)
+    if query is not None:
+        query.attributes["error"] = type(context.original_exception).__name__
+        query.finish()
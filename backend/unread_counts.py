@@ -0,0 +1,109 @@
+"""
+Per-user unread alert counters.
+
+Counts are loaded lazily with one indexed COUNT the first time a user asks and
+are then maintained by the alert write paths in ``crud``, so the badge endpoint
+never re-reads the alert list. The cache is an LRU bounded by
+``UNREAD_COUNT_MAX_USERS``; evicted users are simply recounted on next access.
+
+Writers wrap their commit and ``adjust`` in ``counter.writing(user_id)``. A
+fill (the COUNT of a cache miss) is only cached if no write for that user was
+in progress or happened while it ran; otherwise the count is returned but not
+kept, so a write that lands between the COUNT and the cache insert is never
+lost. Counters are per process and only see this process's writes, so entries
+also expire after ``UNREAD_COUNT_TTL_SECONDS``: with several workers a badge
+can lag another worker's write by at most that long.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+UNREAD_COUNT_MAX_USERS = int(os.getenv("UNREAD_COUNT_MAX_USERS", "50000"))
+UNREAD_COUNT_TTL_SECONDS = float(os.getenv("UNREAD_COUNT_TTL_SECONDS", "30"))
+
+
+class UnreadCounter:
+    def __init__(self, max_users: int = UNREAD_COUNT_MAX_USERS, ttl: float = UNREAD_COUNT_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._counts = OrderedDict()  # user_id -> [count, loaded_at]
+        # user_id -> [fills running, writes running, version] while either is non-zero
+        self._activity = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, user_id: str):
+        entry = self._counts.get(user_id)
+        if entry is None:
+            return None
+        if self.ttl and time.monotonic() - entry[1] > self.ttl:
+            del self._counts[user_id]
+            return None
+        self._counts.move_to_end(user_id)
+        return entry[0]
+
+    def _touch(self, user_id: str, fills: int = 0, writes: int = 0) -> list:
+        activity = self._activity.setdefault(user_id, [0, 0, 0])
+        activity[0] += fills
+        activity[1] += writes
+        if writes:
+            activity[2] += 1
+        if not activity[0] and not activity[1]:
+            del self._activity[user_id]
+        return activity
+
+    def get(self, db, user_id: str) -> int:
+        with self._lock:
+            count = self._cached(user_id)
+            if count is not None:
+                return count
+            version = self._touch(user_id, fills=1)[2]
+        from database import Alert
+
+        count = None
+        try:
+            count = db.query(Alert).filter(Alert.user_id == user_id, Alert.is_read == False).count()
+        finally:
+            with self._lock:
+                activity = self._activity[user_id]
+                quiet = activity[1] == 0 and activity[2] == version
+                self._touch(user_id, fills=-1)
+                if quiet and count is not None:
+                    self._counts[user_id] = [count, time.monotonic()]
+                    self._counts.move_to_end(user_id)
+                    while len(self._counts) > self.max_users:
+                        self._counts.popitem(last=False)
+        return count
+
+    @contextmanager
+    def writing(self, user_id: str):
+        """Mark a write to ``user_id``'s alerts as in progress (wrap the commit and ``adjust``)"""
+        with self._lock:
+            self._touch(user_id, writes=1)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._touch(user_id, writes=-1)
+
+    def adjust(self, user_id: str, delta: int):
+        """Apply a committed write to a cached counter; uncached users are counted on demand"""
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry is not None:
+                entry[0] += delta
+
+    def invalidate(self, user_id: str = None):
+        with self._lock:
+            if user_id is None:
+                self._counts.clear()
+                for activity in self._activity.values():
+                    activity[2] += 1
+            else:
+                self._counts.pop(user_id, None)
+                if user_id in self._activity:
+                    self._activity[user_id][2] += 1
+
+
+counter = UnreadCounter()
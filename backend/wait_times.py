@@ -0,0 +1,251 @@
+"""
+Streaming wait-time estimation.
+
+Tracks the interval between a record's creation and its completion in
+constant-memory P² quantile sketches (Jain & Chlamtac), keyed per doctor,
+department and priority. Each completed appointment or triage record is a
+single O(1) update, so estimates never require re-scanning history.
+"""
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+# Minimum number of observations before a scope is trusted over its fallback
+MIN_SAMPLES = 5
+
+
+class P2Quantile:
+    """Constant-memory streaming estimate of a single quantile (P² algorithm)"""
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        heights = self._heights
+
+        # Collect the first five observations verbatim
+        if self.count <= 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        # Find the cell containing x, extending the extremes if needed
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self._positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Nudge the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self._desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = self._linear(i, step)
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self) -> float:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self._heights[round(self.p * (self.count - 1))]
+        return self._heights[2]
+
+
+class WaitTimeSketch:
+    """p50/p90 sketch pair for one scope"""
+
+    def __init__(self):
+        self.p50 = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+
+    @property
+    def count(self) -> int:
+        return self.p50.count
+
+    def add(self, minutes: float):
+        self.p50.add(minutes)
+        self.p90.add(minutes)
+
+    def snapshot(self) -> dict:
+        return {
+            "p50": round(self.p50.value(), 1),
+            "p90": round(self.p90.value(), 1),
+            "samples": self.count,
+        }
+
+
+class WaitTimeEstimator:
+    """Registry of wait-time sketches keyed by (kind, scope, value)"""
+
+    def __init__(self):
+        self._sketches = {}
+        self._lock = threading.Lock()
+
+    def observe(self, keys, minutes: float):
+        with self._lock:
+            for key in keys:
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = WaitTimeSketch()
+                sketch.add(minutes)
+
+    def estimate(self, *candidates):
+        """Return the snapshot of the first candidate key with enough samples"""
+        with self._lock:
+            fallback = None
+            for key in candidates:
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    continue
+                if sketch.count >= MIN_SAMPLES:
+                    return sketch.snapshot()
+                if fallback is None:
+                    fallback = sketch
+            return fallback.snapshot() if fallback else None
+
+    def clear(self):
+        with self._lock:
+            self._sketches.clear()
+
+
+estimator = WaitTimeEstimator()
+
+
+def _minutes_between(start: datetime, end: datetime) -> float:
+    if start is None or end is None:
+        return None
+    if start.tzinfo is not None:
+        start = start.replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.replace(tzinfo=None)
+    return max((end - start).total_seconds() / 60.0, 0.0)
+
+
+def _appointment_keys(doctor_id, department, priority_name):
+    keys = [("appointment", "all", None)]
+    if doctor_id:
+        keys.append(("appointment", "doctor", doctor_id))
+    if department:
+        keys.append(("appointment", "department", department))
+    if priority_name:
+        keys.append(("appointment", "priority", priority_name))
+    return keys
+
+
+def record_appointment(appointment, department: str = None, priority_name: str = None,
+                       completed_at: datetime = None):
+    """Feed a completed appointment's created_at -> completion interval"""
+    minutes = _minutes_between(appointment.created_at, completed_at or datetime.now(timezone.utc))
+    if minutes is not None:
+        estimator.observe(
+            _appointment_keys(appointment.doctor_id, department, priority_name), minutes
+        )
+
+
+def record_triage(record, completed_at: datetime = None):
+    """Feed a completed triage record's timestamp -> completion interval"""
+    minutes = _minutes_between(record.timestamp, completed_at or datetime.now(timezone.utc))
+    if minutes is not None:
+        keys = [("triage", "all", None)]
+        if record.priority:
+            keys.append(("triage", "priority", record.priority))
+        estimator.observe(keys, minutes)
+
+
+def estimate_appointment(doctor_id=None, department: str = None, priority_name: str = None):
+    """Most specific appointment estimate: doctor, then department, priority, overall"""
+    return estimator.estimate(
+        ("appointment", "doctor", doctor_id),
+        ("appointment", "department", department),
+        ("appointment", "priority", priority_name),
+        ("appointment", "all", None),
+    )
+
+
+def estimate_triage(priority: str = None):
+    return estimator.estimate(
+        ("triage", "priority", priority),
+        ("triage", "all", None),
+    )
+
+
+def format_minutes(minutes: float) -> str:
+    """Render minutes the way the dashboards display durations ("15m", "2h 5m")"""
+    if minutes is None:
+        return "N/A"
+    minutes = int(round(minutes))
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h" if hours else f"{days}d"
+
+
+def warm_start(db):
+    """Seed the sketches once at startup from already-completed appointments.
+
+    Appointments have no completion timestamp, so ``updated_at`` (set when the
+    doctor marks the consultation) stands in for it. Departments come from
+    ``crud.get_doctor_departments`` so appointments keyed by either doctor id
+    form are attributed. Rows are streamed so memory stays bounded by the number
+    of doctors rather than the size of history.
+    """
+    import crud
+    from database import Appointment, Priority
+
+    estimator.clear()
+    completed = (Appointment.status == "completed", Appointment.updated_at.isnot(None))
+    doctor_ids = db.execute(select(Appointment.doctor_id).where(*completed).distinct()).scalars().all()
+    departments = crud.get_doctor_departments(db, doctor_ids)
+    query = (
+        select(
+            Appointment.doctor_id,
+            Appointment.created_at,
+            Appointment.updated_at,
+            Priority.name,
+        )
+        .outerjoin(Priority, Priority.id == Appointment.priority_id)
+        .where(*completed)
+        .execution_options(yield_per=1000)
+    )
+    for doctor_id, created_at, updated_at, priority_name in db.execute(query):
+        minutes = _minutes_between(created_at, updated_at)
+        if minutes is not None:
+            department = departments.get(doctor_id)
+            estimator.observe(_appointment_keys(doctor_id, department, priority_name), minutes)